@@ -15,6 +15,27 @@ from stagehand import Stagehand, StagehandConfig
 load_dotenv()
 
 
+async def wait_for_login_result(page, timeout: int = 10_000):
+    """等待登录结果：离开登录页或出现错误提示，以先发生者为准"""
+    waiters = {
+        asyncio.ensure_future(
+            page.wait_for_url(lambda url: "login" not in url.lower(), timeout=timeout)
+        ),
+        asyncio.ensure_future(
+            page.wait_for_selector(
+                ".el-message--error, .el-form-item__error", timeout=timeout
+            )
+        ),
+    }
+    done, pending = await asyncio.wait(waiters, return_when=asyncio.FIRST_COMPLETED)
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
+    # 超时不视为错误，调用方随后根据URL判断是否登录成功
+    for task in done:
+        task.exception()
+
+
 async def main():
     # Create configuration with custom API base
     config = StagehandConfig(
@@ -59,9 +80,37 @@ async def main():
         print("导航到后台管理登录页面...")
         await page.goto("https://vue.ruoyi.vip/login?redirect=%2Findex")
 
-        # 等待页面加载完成
-        await page.wait_for_timeout(8000)
+        # 等待登录表单出现，并等验证码图片等资源加载完成
         print("等待页面资源加载完成...")
+        await page.wait_for_load_state("domcontentloaded")
+        await page.wait_for_selector("input[type='text']", timeout=10_000)
+        await page.wait_for_load_state("networkidle")
+
+        # 创建验证码处理Agent（只创建一次，重试时复用同一个实例）
+        captcha_agent = stagehand.agent(
+            provider="openai",
+            model="glm-4.5v",
+            instructions="""你是一个验证码处理专家。你需要：
+1. 仔细观察页面中的验证码图片，识别数学表达式（如 3+5、8-2、4*3、9/3 等）
+2. 计算出正确的数字结果
+3. 找到验证码输入框并直接在其中输入结果
+
+操作指令格式：
+- 直接在输入框输入：TYPE: x=坐标X, y=坐标Y, text=数字结果
+- 或者分步操作：
+  第一步：CLICK: x=坐标X, y=坐标Y (点击输入框)
+  第二步：TYPE: text=数字结果 (输入结果)
+
+重要提示：
+- 乘号用*表示，除号用/表示  
+- 只输入最终的数字结果，不要输入表达式
+- 推荐使用带坐标的TYPE指令，一步完成点击和输入
+- TYPE指令会自动清空输入框的旧内容，确保输入干净的新值""",
+            options={
+                "apiKey": stagehand.config.model_api_key,
+                "baseURL": stagehand.config.model_api_base,
+            },
+        )
 
         # 登录重试循环
         max_attempts = 5  # 减少重试次数，因为缓存会提高成功率
@@ -71,6 +120,7 @@ async def main():
         while attempt < max_attempts and not login_successful:
             attempt += 1
             print(f"\n第 {attempt} 次登录尝试...")
+            captcha_agent.reset()
             current_url = page.url
             if "login" not in current_url.lower():
                 print("登录成功！已进入后台管理系统")
@@ -81,14 +131,26 @@ async def main():
                 # 每次重试前清空输入框并重新输入
                 print("清空并重新填写登录信息...")
 
-                # 输入用户名 - 新方法：observe + locator.fill()
-                print("输入用户名: admin")
+                # 用户名框、密码框、登录按钮互不依赖，并发定位
+                print("并发定位用户名框、密码框和登录按钮...")
                 start_time = time.time()
-
-                # 使用缓存观察用户名输入框
-                username_elements = await page.observe(
-                    "找到用户名输入框", use_cache=True, cache_ttl=7200
+                username_elements, password_elements, login_elements = (
+                    await asyncio.gather(
+                        page.observe(
+                            "找到用户名输入框", use_cache=True, cache_ttl=7200
+                        ),
+                        page.observe(
+                            "找到密码输入框", use_cache=True, cache_ttl=7200
+                        ),
+                        page.observe("找到登录按钮", use_cache=True, cache_ttl=7200),
+                    )
                 )
+                observe_time = time.time() - start_time
+                print(f"  元素定位耗时: {observe_time:.2f}秒")
+
+                # 输入用户名 - observe + locator.fill()
+                print("输入用户名: admin")
+                start_time = time.time()
                 if username_elements:
                     username_selector = username_elements[0].selector
                     print(f"  用户名框定位: {username_selector}")
@@ -101,16 +163,9 @@ async def main():
                 username_time = time.time() - start_time
                 print(f"  用户名输入耗时: {username_time:.2f}秒")
 
-                # await page.wait_for_timeout(1000)
-
-                # 输入密码 - 新方法：observe + locator.fill()
+                # 输入密码 - observe + locator.fill()
                 print("输入密码: admin123")
                 start_time = time.time()
-
-                # 使用缓存观察密码输入框
-                password_elements = await page.observe(
-                    "找到密码输入框", use_cache=True, cache_ttl=7200
-                )
                 if password_elements:
                     password_selector = password_elements[0].selector
                     print(f"  密码框定位: {password_selector}")
@@ -127,32 +182,6 @@ async def main():
                 print("使用Agent一体化处理验证码...")
                 start_time = time.time()
 
-                # 创建验证码处理Agent
-                captcha_agent = stagehand.agent(
-                    provider="openai",
-                    model="glm-4.5v",
-                    instructions="""你是一个验证码处理专家。你需要：
-1. 仔细观察页面中的验证码图片，识别数学表达式（如 3+5、8-2、4*3、9/3 等）
-2. 计算出正确的数字结果
-3. 找到验证码输入框并直接在其中输入结果
-
-操作指令格式：
-- 直接在输入框输入：TYPE: x=坐标X, y=坐标Y, text=数字结果
-- 或者分步操作：
-  第一步：CLICK: x=坐标X, y=坐标Y (点击输入框)
-  第二步：TYPE: text=数字结果 (输入结果)
-
-重要提示：
-- 乘号用*表示，除号用/表示  
-- 只输入最终的数字结果，不要输入表达式
-- 推荐使用带坐标的TYPE指令，一步完成点击和输入
-- TYPE指令会自动清空输入框的旧内容，确保输入干净的新值""",
-                    options={
-                        "apiKey": stagehand.config.model_api_key,
-                        "baseURL": stagehand.config.model_api_base,
-                    },
-                )
-
                 # 执行验证码识别和填写的一体化操作
                 captcha_result = await captcha_agent.execute(
                     instruction="请识别页面上验证码图片中的数学表达式并计算结果，然后点击验证码输入框并输入计算结果。例如：看到'3+5'就输入'8'，看到'4*2'就输入'8'。",
@@ -168,14 +197,9 @@ async def main():
                 if captcha_success:
                     print("Agent验证码处理成功，继续提交登录")
 
-                    # 提交登录表单 - 新方法：observe + locator.click()
+                    # 提交登录表单 - 使用开头并发定位到的登录按钮
                     print("提交登录表单...")
                     login_start_time = time.time()
-
-                    # 使用缓存观察登录按钮
-                    login_elements = await page.observe(
-                        "找到登录按钮", use_cache=True, cache_ttl=7200
-                    )
                     if login_elements:
                         login_selector = login_elements[0].selector
                         print(f"  登录按钮定位: {login_selector}")
@@ -188,8 +212,8 @@ async def main():
                     login_time = time.time() - login_start_time
                     print(f"  登录按钮点击耗时: {login_time:.2f}秒")
 
-                    # 等待登录结果
-                    await page.wait_for_timeout(1500)
+                    # 等待登录结果：跳转或出现错误提示
+                    await wait_for_login_result(page)
 
                     # 检查登录是否成功
                     current_url = page.url
@@ -201,9 +225,14 @@ async def main():
 
                         # 显示性能统计
                         total_time = (
-                            username_time + password_time + captcha_time + login_time
+                            observe_time
+                            + username_time
+                            + password_time
+                            + captcha_time
+                            + login_time
                         )
                         print("\n本次登录性能统计:")
+                        print(f"  元素定位(并发): {observe_time:.2f}秒")
                         print(f"  用户名输入: {username_time:.2f}秒")
                         print(f"  密码输入: {password_time:.2f}秒")
                         print(f"  验证码处理(Agent): {captcha_time:.2f}秒")
@@ -224,40 +253,39 @@ async def main():
                         print(f"第 {attempt} 次登录失败，仍在登录页面")
                         if attempt < max_attempts:
                             print(f"准备进行第 {attempt + 1} 次尝试...")
-                            await page.wait_for_timeout(1000)
+                            # 等待刷新后的验证码图片加载完成
+                            await page.wait_for_load_state("networkidle")
                 else:
                     print(f"第 {attempt} 次Agent验证码处理失败")
                     if attempt < max_attempts:
                         print(f"准备进行第 {attempt + 1} 次尝试...")
-                        await page.wait_for_timeout(1000)
 
             except Exception as e:
                 print(f"第 {attempt} 次登录尝试出现异常: {e}")
                 if attempt < max_attempts:
                     print(f"准备进行第 {attempt + 1} 次尝试...")
-                    await page.wait_for_timeout(1000)  # 等待2秒后重试
 
         if not login_successful:
             print(f"经过 {max_attempts} 次尝试后登录仍然失败")
         else:
             print(f"登录成功！总共尝试了 {attempt} 次")
 
-            # 基础操作：导航到用户管理
-            await page.act("点击系统管理", use_cache=True, cache_ttl=7200)
-
-            await page.act("点击用户管理", use_cache=True, cache_ttl=7200)
-
-            await page.act("点击新增按钮", use_cache=True, cache_ttl=7200)
-
-            # 基础信息填写
+            # 基础操作：导航到用户管理并填写基础信息，按顺序执行，命中缓存的步骤不调用LLM
             try:
-                await page.act(
-                    "在用户昵称输入框中输入张三", use_cache=True, cache_ttl=7200
-                )
-                # 优化用户名输入指令
-                await page.act(
-                    "在用户名输入框中输入zhangsan", use_cache=True, cache_ttl=7200
+                results = await page.act_script(
+                    [
+                        "点击系统管理",
+                        "点击用户管理",
+                        "点击新增按钮",
+                        "在用户昵称输入框中输入张三",
+                        # 优化用户名输入指令
+                        "在用户名输入框中输入zhangsan",
+                    ],
+                    cache_ttl=7200,
                 )
+                for result in results:
+                    if not result.success:
+                        print(f"基础信息填写遇到问题: {result.message}")
 
             except Exception as e:
                 print(f"基础信息填写遇到问题: {e}")
@@ -282,56 +310,38 @@ async def main():
                         "baseURL": stagehand.config.model_api_base,
                     },
                 )
-                # 执行Agent分析
+                # 一次Agent调用完成部门树的全部操作，复用同一会话上下文
                 dept_result = await ui_agent.execute(
-                    instruction="找到'归属部门'或'请选择归属部门'旁边的下拉箭头，返回点击指令。必须回答格式：CLICK: x=坐标X, y=坐标Y",
-                    max_steps=3,
-                    auto_screenshot=True,
-                )
-                print(f"  部门下拉框操作结果: {dept_result}")
-                expand_result = await ui_agent.execute(
-                    instruction="在添加用户对话框区域，找到'归属部门'下拉框中的'若依科技'左边的三角展开图标(▷)的中间位置，返回点击指令。必须回答格式：CLICK: x=坐标X, y=坐标Y",
-                    max_steps=4,
-                    auto_screenshot=True,
-                )
-                print(f"  节点展开操作结果: {expand_result}")
-                select_dept_result = await ui_agent.execute(
-                    instruction="在添加用户对话框区域，找到'归属部门'下拉框中的'深圳总公司'左边的三角展开图标(▷)的中间位置，返回点击指令。必须回答格式：CLICK: x=坐标X, y=坐标Y",
-                    max_steps=2,
+                    instructions=[
+                        "找到'归属部门'或'请选择归属部门'旁边的下拉箭头，返回点击指令。必须回答格式：CLICK: x=坐标X, y=坐标Y",
+                        "在添加用户对话框区域，找到'归属部门'下拉框中的'若依科技'左边的三角展开图标(▷)的中间位置，返回点击指令。必须回答格式：CLICK: x=坐标X, y=坐标Y",
+                        "在添加用户对话框区域，找到'归属部门'下拉框中的'深圳总公司'左边的三角展开图标(▷)的中间位置，返回点击指令。必须回答格式：CLICK: x=坐标X, y=坐标Y",
+                        "在添加用户对话框区域，找到'归属部门'下拉框中的'深圳总公司'下属的研发部门，返回点击指令。必须回答格式：CLICK: x=坐标X, y=坐标Y",
+                    ],
+                    max_steps=8,
                     auto_screenshot=True,
                 )
-                print(f"  部门选择操作结果: {select_dept_result}")
-
-                select_dept_result = await ui_agent.execute(
-                    instruction="在添加用户对话框区域，找到'归属部门'下拉框中的'深圳总公司'下属的研发部门，返回点击指令。必须回答格式：CLICK: x=坐标X, y=坐标Y",
-                    max_steps=2,
-                    auto_screenshot=True,
-                )
-                print(f"  部门选择操作结果: {select_dept_result}")
+                print(f"  部门选择操作结果: {dept_result}")
 
             except Exception as e:
                 print(f"Agent部门操作遇到问题: {e}")
                 print(" 尝试简化的部门选择...")
 
-            # 角色选择
-            print("\n步骤4: 选择用户角色")
-            try:
-                await page.act("点击角色下拉框", use_cache=True, cache_ttl=7200)
-                await page.act("选择普通角色", use_cache=True, cache_ttl=7200)
-                print("角色选择成功")
-
-            except Exception as e:
-                print(f"角色选择遇到问题: {e}")
-
-            # 提交表单
-            print("\n步骤5: 提交新增用户表单")
+            # 角色选择并提交表单
+            print("\n步骤4: 选择用户角色并提交新增用户表单")
             try:
-                await page.act(
-                    "点击确定按钮提交用户信息", use_cache=True, cache_ttl=7200
+                results = await page.act_script(
+                    ["点击角色下拉框", "选择普通角色", "点击确定按钮提交用户信息"],
+                    cache_ttl=7200,
                 )
+                failed = [result for result in results if not result.success]
+                if failed:
+                    print(f"角色选择/提交表单遇到问题: {failed[0].message}")
+                else:
+                    print("角色选择并提交成功")
 
             except Exception as e:
-                print(f"提交表单遇到问题: {e}")
+                print(f"角色选择/提交表单遇到问题: {e}")
 
             print("\n用户管理操作流程完成！")
 
@@ -4,11 +4,11 @@ Stagehand 缓存管理工具
 """
 
 import argparse
-import json
 import os
+import sys
 from datetime import datetime
 
-from stagehand.cache import StagehandCache
+from stagehand.cache import StagehandCache, json_dumps, json_loads
 
 
 def display_cache_stats(cache_manager: StagehandCache):
@@ -33,18 +33,34 @@ def display_cache_details(cache_manager: StagehandCache):
         print("📭 暂无缓存记录")
         return
 
-    print(f"📋 缓存详细信息 (共 {len(caches)} 条):")
-    print("=" * 80)
+    write = sys.stdout.write
+    write(f"📋 缓存详细信息 (共 {len(caches)} 条):\n")
+    write("=" * 80 + "\n")
 
+    def format_time(value):
+        # 缓存中的时间为时间戳（秒），仅在展示时转换为可读格式
+        if isinstance(value, (int, float)):
+            return datetime.fromtimestamp(value).isoformat(timespec="seconds")
+        return value or "N/A"
+
+    # 逐条格式化并写出，避免先拼出全部记录
     for i, (cache_key, cache_item) in enumerate(caches.items(), 1):
-        print(f"\n[{i}] 缓存记录:")
-        print(f"  🔑 Key: {cache_key[:16]}...")
-        print(f"  📝 指令: {cache_item.get('instruction', 'N/A')[:60]}...")
-        print(f"  🌐 页面: {cache_item.get('page_url', 'N/A')}")
-        print(f"  🎯 XPath: {cache_item.get('result', {}).get('selector', 'N/A')}")
-        print(f"  📅 创建时间: {cache_item.get('created_at', 'N/A')}")
-        print(f"  🔥 命中次数: {cache_item.get('hit_count', 0)}")
-        print(f"  ⏰ 最后使用: {cache_item.get('last_used', 'N/A')}")
+        write(
+            "\n".join(
+                (
+                    f"\n[{i}] 缓存记录:",
+                    f"  🔑 Key: {cache_key[:16]}...",
+                    f"  📝 指令: {cache_item.get('instruction', 'N/A')[:60]}...",
+                    f"  🌐 页面: {cache_item.get('page_url', 'N/A')}",
+                    f"  🎯 XPath: {cache_item.get('result', {}).get('selector', 'N/A')}",
+                    f"  📅 创建时间: {format_time(cache_item.get('created_at'))}",
+                    f"  🔥 命中次数: {cache_item.get('hit_count', 0)}",
+                    f"  ⏰ 最后使用: {format_time(cache_item.get('last_used'))}",
+                    "",
+                )
+            )
+        )
+    sys.stdout.flush()
 
 
 def clear_cache(cache_manager: StagehandCache, expired_only: bool = False):
@@ -60,8 +76,8 @@ def clear_cache(cache_manager: StagehandCache, expired_only: bool = False):
 def export_cache(cache_manager: StagehandCache, export_file: str):
     """导出缓存到文件"""
     try:
-        with open(export_file, "w", encoding="utf-8") as f:
-            json.dump(cache_manager.cache_data, f, ensure_ascii=False, indent=2)
+        with open(export_file, "wb") as f:
+            f.write(json_dumps(cache_manager.cache_data, indent=True))
         print(f"📤 缓存已导出到: {export_file}")
     except Exception as e:
         print(f"❌ 导出失败: {e}")
@@ -74,56 +90,60 @@ def import_cache(cache_manager: StagehandCache, import_file: str):
             print(f"❌ 文件不存在: {import_file}")
             return
 
-        with open(import_file, "r", encoding="utf-8") as f:
-            imported_data = json.load(f)
-
-        # 合并缓存数据
-        current_caches = cache_manager.cache_data.get("caches", {})
-        imported_caches = imported_data.get("caches", {})
+        with open(import_file, "rb") as f:
+            imported_data = json_loads(f.read())
 
-        merged_count = 0
-        for key, value in imported_caches.items():
-            if key not in current_caches:
-                current_caches[key] = value
-                merged_count += 1
-
-        cache_manager._save_cache()
+        # 合并缓存数据：只写入本地不存在的key，批量追加到WAL
+        merged_count = cache_manager.merge_entries(imported_data.get("caches", {}))
         print(f"📥 已导入 {merged_count} 条新缓存记录")
 
     except Exception as e:
         print(f"❌ 导入失败: {e}")
 
 
-def search_cache(cache_manager: StagehandCache, keyword: str):
-    """搜索缓存"""
-    caches = cache_manager.cache_data.get("caches", {})
-    matched_caches = []
-
-    for cache_key, cache_item in caches.items():
-        instruction = cache_item.get("instruction", "").lower()
-        page_url = cache_item.get("page_url", "").lower()
-        description = cache_item.get("result", {}).get("description", "").lower()
-
-        if (
-            keyword.lower() in instruction
-            or keyword.lower() in page_url
-            or keyword.lower() in description
-        ):
-            matched_caches.append((cache_key, cache_item))
-
-    if not matched_caches:
-        print(f"🔍 未找到包含 '{keyword}' 的缓存记录")
+def semantic_search_cache(cache_manager: StagehandCache, query: str):
+    """按语义相似度搜索缓存"""
+    matches = cache_manager.semantic_search(query, top_k=10)
+    if not matches:
+        print(f"🔍 未找到与 '{query}' 语义相近的缓存记录（需安装 stagehand[semantic-cache]）")
         return
 
-    print(f"🔍 找到 {len(matched_caches)} 条匹配记录:")
+    print(f"🔍 与 '{query}' 语义最相近的 {len(matches)} 条记录:")
     print("=" * 60)
-
-    for i, (cache_key, cache_item) in enumerate(matched_caches, 1):
-        print(f"\n[{i}] 匹配记录:")
+    for i, (cache_key, cache_item, similarity) in enumerate(matches, 1):
+        print(f"\n[{i}] 相似度 {similarity:.3f}")
         print(f"  📝 指令: {cache_item.get('instruction', 'N/A')}")
         print(f"  🌐 页面: {cache_item.get('page_url', 'N/A')}")
-        print(f"  🎯 描述: {cache_item.get('result', {}).get('description', 'N/A')}")
-        print(f"  🔥 命中次数: {cache_item.get('hit_count', 0)}")
+
+
+def search_cache(cache_manager: StagehandCache, keyword: str):
+    """搜索缓存"""
+    # 使用缓存管理器预建的倒排索引，边查边输出匹配记录
+    write = sys.stdout.write
+    count = 0
+    for count, (cache_key, cache_item) in enumerate(
+        cache_manager.iter_search(keyword), 1
+    ):
+        if count == 1:
+            write(f"🔍 '{keyword}' 的匹配记录:\n")
+            write("=" * 60 + "\n")
+        write(
+            "\n".join(
+                (
+                    f"\n[{count}] 匹配记录:",
+                    f"  📝 指令: {cache_item.get('instruction', 'N/A')}",
+                    f"  🌐 页面: {cache_item.get('page_url', 'N/A')}",
+                    f"  🎯 描述: {cache_item.get('result', {}).get('description', 'N/A')}",
+                    f"  🔥 命中次数: {cache_item.get('hit_count', 0)}",
+                    "",
+                )
+            )
+        )
+
+    if count == 0:
+        print(f"🔍 未找到包含 '{keyword}' 的缓存记录")
+        return
+    print(f"\n🔍 共找到 {count} 条匹配记录")
 
 
 def main():
@@ -131,6 +151,9 @@ def main():
     parser.add_argument(
         "--cache-file", default="stagehand_cache.json", help="缓存文件路径"
     )
+    parser.add_argument(
+        "--max-entries", type=int, default=2000, help="最大缓存条数，超出时自动淘汰"
+    )
 
     subparsers = parser.add_subparsers(dest="command", help="可用命令")
 
@@ -157,11 +180,16 @@ def main():
     # 搜索缓存
     search_parser = subparsers.add_parser("search", help="搜索缓存")
     search_parser.add_argument("keyword", help="搜索关键词")
+    search_parser.add_argument(
+        "--semantic", action="store_true", help="按语义相似度搜索"
+    )
 
     args = parser.parse_args()
 
     # 创建缓存管理器
-    cache_manager = StagehandCache(cache_file=args.cache_file)
+    cache_manager = StagehandCache(
+        cache_file=args.cache_file, max_entries=args.max_entries
+    )
 
     if args.command == "stats":
         display_cache_stats(cache_manager)
@@ -174,7 +202,10 @@ def main():
     elif args.command == "import":
         import_cache(cache_manager, args.file)
     elif args.command == "search":
-        search_cache(cache_manager, args.keyword)
+        if args.semantic:
+            semantic_search_cache(cache_manager, args.keyword)
+        else:
+            search_cache(cache_manager, args.keyword)
     else:
         parser.print_help()
 
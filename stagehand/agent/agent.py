@@ -1,5 +1,8 @@
 import asyncio
-from typing import Optional, Union
+import contextlib
+import functools
+import threading
+from typing import Final, Optional, Union
 
 from ..handlers.cua_handler import CUAHandler
 from ..schemas import (
@@ -7,32 +10,51 @@ from ..schemas import (
     AgentProvider,
 )
 from ..types.agent import (
+    AgentAction,
+    AgentActionType,
     AgentConfig,
     AgentExecuteOptions,
     AgentResult,
     AgentUsage,
+    ClickAction,
+    DoubleClickAction,
+    DragAction,
+    FunctionAction,
+    KeyAction,
+    KeyPressAction,
+    MoveAction,
+    ScreenshotAction,
+    ScrollAction,
+    TypeAction,
+    WaitAction,
 )
 from .anthropic_cua import AnthropicCUAClient
 from .client import AgentClient
 from .openai_cua import OpenAICUAClient
 
-# 尝试导入Agent缓存功能（可选依赖）
-try:
-    from ..agent_cache import AgentCache
 
-    AGENT_CACHE_AVAILABLE = True
-except ImportError:
-    AgentCache = None
-    AGENT_CACHE_AVAILABLE = False
+@functools.cache
+def _load_agent_cache_cls() -> Optional[type]:
+    """
+    按需导入Agent缓存（可选依赖，依赖 opencv-python / scikit-image），
+    只有启用缓存时才导入，避免未启用时也加载这些原生库。不可用时返回None。
+    """
+    try:
+        from ..agent_cache import AgentCache
+    except ImportError:
+        return None
+    return AgentCache
+
 
 MODEL_TO_CLIENT_CLASS_MAP: dict[str, type[AgentClient]] = {
+    # 常用模型放在前面；查找结果由 _resolve_client_cls 缓存，顺序不影响性能
+    "glm-4.5v": OpenAICUAClient,
+    "glm-4v": OpenAICUAClient,
     "computer-use-preview": OpenAICUAClient,
     "claude-3-5-sonnet-latest": AnthropicCUAClient,
     "claude-3-7-sonnet-latest": AnthropicCUAClient,
     "claude-sonnet-4-20250514": AnthropicCUAClient,
     # 支持更多OpenAI兼容的模型
-    "glm-4v": OpenAICUAClient,
-    "glm-4.5v": OpenAICUAClient,
     "qwen-vl-max": OpenAICUAClient,
     "qwen-vl-plus": OpenAICUAClient,
 }
@@ -47,6 +69,114 @@ MODEL_TO_PROVIDER_MAP: dict[str, AgentProvider] = {
 AGENT_METRIC_FUNCTION_NAME = "AGENT_EXECUTE_TASK"
 
 
+@functools.lru_cache(maxsize=64)
+def _resolve_client_cls(model: str, has_base_url: bool) -> Optional[type[AgentClient]]:
+    """
+    根据模型名解析客户端类，每个 (model, has_base_url) 组合只计算一次。
+    MODEL_TO_CLIENT_CLASS_MAP 仍是唯一数据源；运行时修改映射表后需调用
+    _resolve_client_cls.cache_clear()。
+    """
+    client_cls = MODEL_TO_CLIENT_CLASS_MAP.get(model)
+    # 如果模型不在映射表中，但提供了自定义baseURL，则假设是OpenAI兼容的
+    if client_cls is None and has_base_url:
+        return OpenAICUAClient
+    return client_cls
+
+
+# Agent缓存查询（截图 + 标题 + 缓存匹配）的默认时间预算，单位秒
+_DEFAULT_CACHE_LOOKUP_TIMEOUT_S = 1.0
+# 缓存查询超过该时长（秒）仍未返回时，才开始对冲的LLM推理
+_CACHE_HEDGE_DELAY_S = 0.2
+
+# 缓存中的操作类型到具体操作模型的映射，用于回放时恢复 AgentAction
+_ACTION_CLASSES: dict[str, type] = {
+    "click": ClickAction,
+    "double_click": DoubleClickAction,
+    "type": TypeAction,
+    "keypress": KeyPressAction,
+    "key_press": KeyPressAction,
+    "scroll": ScrollAction,
+    "drag": DragAction,
+    "move": MoveAction,
+    "wait": WaitAction,
+    "screenshot": ScreenshotAction,
+    "function": FunctionAction,
+    "key": KeyAction,
+}
+
+
+class _FrozenDict(tuple):
+    """字典冻结后的形式（排序后的键值对元组），与冻结后的列表区分开"""
+
+
+def _freeze(value):
+    """将操作字典递归转换为可哈希的形式，用作 _build_cached_action 的缓存key"""
+    if isinstance(value, dict):
+        return _FrozenDict(sorted((key, _freeze(item)) for key, item in value.items()))
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def _thaw(value):
+    if isinstance(value, _FrozenDict):
+        return {key: _thaw(item) for key, item in value}
+    if isinstance(value, tuple):
+        return [_thaw(item) for item in value]
+    return value
+
+
+@functools.lru_cache(maxsize=1024)
+def _build_cached_action(frozen_action: _FrozenDict) -> AgentAction:
+    """
+    根据冻结的操作字典构建 AgentAction，相同的缓存操作只校验构建一次。
+    返回的对象在多次回放间共享，调用方不能修改。
+    """
+    action_dict = _thaw(frozen_action)
+    action_type = action_dict["type"]
+    return AgentAction(
+        action_type=action_type,
+        action=AgentActionType(root=_ACTION_CLASSES[action_type](**action_dict)),
+        reasoning="从缓存恢复的操作",
+    )
+
+
+# 回放缓存操作时不会修改页面的操作类型：这类操作之后不需要等待页面稳定，
+# 其余操作（点击、输入、按键、滚动、拖拽、函数调用等）执行后等待页面稳定
+_NON_MUTATING_ACTIONS = frozenset({"wait", "screenshot"})
+
+# 可以并发执行的操作类型：只有截图。wait 虽然不修改页面，但它的作用就是
+# 占用时间，连续的多个 wait 并发执行会互相重叠，必须按顺序执行
+_CONCURRENT_ACTIONS = frozenset({"screenshot"})
+
+
+def _is_mutating(action_type: str) -> bool:
+    return action_type not in _NON_MUTATING_ACTIONS
+
+
+# 默认的CUA系统提示词。作为模块级常量只构建一次，保证每次请求的前缀完全一致，
+# 便于服务端的前缀缓存（prefix cache / KV cache）命中
+_DEFAULT_CUA_SYSTEM_PROMPT: Final = """你是一个网页操作代理，必须通过精确的操作指令与网页交互。
+
+【重要】：你必须分析截图并返回具体的操作指令，不能只是描述要做什么！
+
+【强制要求】：你的回答必须严格按照以下格式：
+- 点击操作：CLICK: x=像素X坐标, y=像素Y坐标
+- 输入文字：TYPE: text=要输入的内容 (在当前焦点输入)
+- 定位输入：TYPE: x=像素X坐标, y=像素Y坐标, text=要输入的内容 (先点击再输入)
+- 滚动页面：SCROLL: x=500, y=300, scroll_y=-100
+- 等待时间：WAIT: milliseconds=2000
+
+【示例】：
+用户说"点击登录按钮"，你必须回答："CLICK: x=350, y=200"
+用户说"在输入框输入admin"，你必须回答："TYPE: x=350, y=200, text=admin"
+用户说"输入用户名admin"，你必须回答："TYPE: text=admin"
+
+【禁止】：不要返回描述性文字如"点击右侧的下拉框"，必须返回具体的操作指令！
+
+现在分析截图，找到目标元素的精确像素坐标，返回操作指令。"""
+
+
 class Agent:
     def __init__(self, stagehand_client, **kwargs):
         self.stagehand = stagehand_client
@@ -59,7 +189,8 @@ class Agent:
         cache_ttl = kwargs.get("cache_ttl", 3600 * 24 * 365)
 
         if cache_enabled and not self.stagehand.use_api:
-            if not AGENT_CACHE_AVAILABLE:
+            agent_cache_cls = _load_agent_cache_cls()
+            if agent_cache_cls is None:
                 # 使用info方法替代warning，因为StagehandLogger可能没有warning方法
                 self.logger.info(
                     "Agent缓存功能不可用，缺少依赖包。请安装：\n"
@@ -69,7 +200,7 @@ class Agent:
                 self.cache_enabled = False
             else:
                 try:
-                    self.cache = AgentCache(
+                    self.cache = agent_cache_cls(
                         cache_file="agent_cache.json",
                         validation_strategy=cache_strategy,
                         default_ttl=cache_ttl,
@@ -87,20 +218,31 @@ class Agent:
         else:
             self.cache = None
             self.cache_enabled = False
-
-        # 调试输出
-        self.logger.info(f"Agent initialized with kwargs: {kwargs}")
-        self.logger.info(f"Agent config: {self.config}")
-        if self.config.options:
-            self.logger.info(f"Agent options: {self.config.options}")
+        # 后台缓存写入任务，保存引用以免被GC回收，aclose() 时统一等待
+        self._pending_cache_writes: set[asyncio.Task] = set()
+        # AgentCache 不是线程安全的：后台写入在线程中执行，
+        # _cache_lock 保护线程中的写入与事件循环上的同步访问（统计、清空、设置策略），
+        # _cache_io_lock 让异步查询与后台写入串行，避免查询时读到写了一半的缓存
+        self._cache_lock = threading.Lock()
+        self._cache_io_lock = asyncio.Lock()
+
+        # 调试输出（只在debug级别构建，避免每次创建Agent都格式化完整配置）
+        if self.logger.is_enabled(2):
+            self.logger.debug(f"Agent initialized with kwargs: {kwargs}")
+            self.logger.debug(f"Agent config: {self.config}")
+            if self.config.options:
+                self.logger.debug(f"Agent options: {self.config.options}")
         if self.stagehand.use_api:
-            if self.config.model in MODEL_TO_PROVIDER_MAP:
-                self.provider = MODEL_TO_PROVIDER_MAP[self.config.model]
-            else:
-                self.provider = None
+            self.provider = MODEL_TO_PROVIDER_MAP.get(self.config.model)
+            if self.provider is None:
                 self.logger.error(
                     f"Could not infer provider for model: {self.config.model}"
                 )
+            # 配置在 Agent 生命周期内不变，序列化一次供每次 API 调用复用
+            self._agent_config_payload = self.config.model_dump(
+                exclude_none=True, by_alias=True, exclude={"cache_lookup_timeout_s"}
+            )
+            self._agent_config_payload["provider"] = self.provider
         else:
             if not hasattr(self.stagehand, "page") or not hasattr(
                 self.stagehand.page, "_page"
@@ -121,14 +263,17 @@ class Agent:
             self.client: AgentClient = self._get_client()
 
     def _get_client(self) -> AgentClient:
-        ClientClass = MODEL_TO_CLIENT_CLASS_MAP.get(self.config.model)  # noqa: N806
+        ClientClass = _resolve_client_cls(  # noqa: N806
+            self.config.model, bool(self.config.options.get("baseURL"))
+        )
 
-        # 如果模型不在映射表中，但提供了自定义baseURL，则假设是OpenAI兼容的
-        if not ClientClass and self.config.options.get("baseURL"):
+        if (
+            ClientClass is not None
+            and self.config.model not in MODEL_TO_CLIENT_CLASS_MAP
+        ):
             self.logger.info(
                 f"Using OpenAI-compatible client for custom model: {self.config.model}"
             )
-            ClientClass = OpenAICUAClient
 
         if not ClientClass:
             self.logger.error(
@@ -140,29 +285,7 @@ class Agent:
 
         return ClientClass(
             model=self.config.model,
-            instructions=(
-                self.config.instructions
-                if self.config.instructions
-                else """你是一个网页操作代理，必须通过精确的操作指令与网页交互。
-
-【重要】：你必须分析截图并返回具体的操作指令，不能只是描述要做什么！
-
-【强制要求】：你的回答必须严格按照以下格式：
-- 点击操作：CLICK: x=像素X坐标, y=像素Y坐标
-- 输入文字：TYPE: text=要输入的内容 (在当前焦点输入)
-- 定位输入：TYPE: x=像素X坐标, y=像素Y坐标, text=要输入的内容 (先点击再输入)
-- 滚动页面：SCROLL: x=500, y=300, scroll_y=-100
-- 等待时间：WAIT: milliseconds=2000
-
-【示例】：
-用户说"点击登录按钮"，你必须回答："CLICK: x=350, y=200"
-用户说"在输入框输入admin"，你必须回答："TYPE: x=350, y=200, text=admin"
-用户说"输入用户名admin"，你必须回答："TYPE: text=admin"
-
-【禁止】：不要返回描述性文字如"点击右侧的下拉框"，必须返回具体的操作指令！
-
-现在分析截图，找到目标元素的精确像素坐标，返回操作指令。"""
-            ),
+            instructions=self.config.instructions or _DEFAULT_CUA_SYSTEM_PROMPT,
             config=self.config,
             logger=self.logger,
             handler=self.cua_handler,
@@ -178,20 +301,36 @@ class Agent:
         options: Optional[AgentExecuteOptions] = None
         options_dict = {}
 
-        if isinstance(options_or_instruction, AgentExecuteOptions):
-            options_dict = options_or_instruction.model_dump()
+        # 按调用频率排序：字符串指令最常见，其次是字典
+        if isinstance(options_or_instruction, str):
+            options_dict = {"instruction": options_or_instruction, **kwargs}
         elif isinstance(options_or_instruction, dict):
-            options_dict = options_or_instruction.copy()
-        elif isinstance(options_or_instruction, str):
-            options_dict["instruction"] = options_or_instruction
+            # 合并时顺带复制，后续写入计划指令不会修改调用方的字典
+            options_dict = {**options_or_instruction, **kwargs}
+        elif isinstance(options_or_instruction, AgentExecuteOptions):
+            if kwargs or not options_or_instruction.instruction:
+                options_dict = {**options_or_instruction.model_dump(), **kwargs}
+            else:
+                # 已校验的实例且无额外参数，直接复用，避免 model_dump 再重新校验
+                options = options_or_instruction
+        else:
+            options_dict = dict(kwargs)
 
-        options_dict.update(kwargs)
+        if options is None:
+            # 多步计划：将步骤列表合并为一次多轮请求的指令
+            plan = options_dict.get("instructions")
+            if plan and not options_dict.get("instruction"):
+                options_dict["instruction"] = self._format_plan_instruction(plan)
 
-        try:
-            options = AgentExecuteOptions(**options_dict)
-        except Exception as e:
-            self.logger.error(f"Invalid agent execute options: {e}")
-            raise
+            if isinstance(options_or_instruction, str):
+                # 字符串指令 + 关键字参数来自调用方代码，跳过 pydantic 校验直接构造
+                options = AgentExecuteOptions.model_construct(**options_dict)
+            else:
+                try:
+                    options = AgentExecuteOptions(**options_dict)
+                except Exception as e:
+                    self.logger.error(f"Invalid agent execute options: {e}")
+                    raise
 
         if not options.instruction:
             self.logger.error("No instruction provided for agent execution.")
@@ -205,179 +344,21 @@ class Agent:
         instruction = options.instruction
 
         if not self.stagehand.use_api:
-            # 尝试从缓存获取结果
-            cached_actions = None
-            if self.cache_enabled and self.cache:
-                try:
-                    # 获取当前页面截图
-                    current_screenshot = await self.cua_handler.get_screenshot_base64()
-
-                    # 构建页面上下文
-                    page_context = {
-                        "url": self.stagehand.page._page.url,
-                        "title": await self.stagehand.page._page.title(),
-                        "viewport": self.viewport,
-                    }
-
-                    # 检查缓存
-                    cached_actions = await self.cache.get_cached_actions(
-                        instruction=instruction,
-                        current_screenshot=current_screenshot,
-                        page_context=page_context,
-                        ttl=options_dict.get("cache_ttl"),
-                    )
-
-                    if cached_actions:
-                        # 缓存命中，执行缓存的操作
-                        self.logger.info("🚀 Agent缓存命中，执行缓存的操作")
-
-                        try:
-                            # 将缓存的操作转换为可执行的格式
-                            executable_actions = []
-                            for action_dict in cached_actions:
-                                agent_action = self._create_agent_action_from_dict(
-                                    action_dict
-                                )
-                                if agent_action:
-                                    executable_actions.append(agent_action)
-
-                            # 执行缓存的操作
-                            for i, agent_action in enumerate(executable_actions):
-                                self.logger.info(
-                                    f"执行缓存操作 {i + 1}/{len(executable_actions)}: {agent_action.action_type}"
-                                )
-
-                                # 执行操作
-                                action_result = await self.cua_handler.perform_action(
-                                    agent_action
-                                )
-
-                                # 添加操作间的延迟，让页面有时间响应
-                                if i < len(executable_actions) - 1:  # 不是最后一个操作
-                                    await asyncio.sleep(0.5)  # 500ms延迟
-
-                                # 检查操作结果
-                                if not action_result.get("success", True):
-                                    self.logger.info(
-                                        f"缓存操作执行失败: {action_result.get('error', '未知错误')}"
-                                    )
-                                    # 如果操作失败，跳出循环，让系统重新调用LLM
-                                    raise Exception(
-                                        f"缓存操作执行失败: {action_result.get('error', '未知错误')}"
-                                    )
-
-                                self.logger.info(f"缓存操作 {i + 1} 执行成功")
-
-                            return AgentResult(
-                                message="成功执行缓存的操作序列",
-                                completed=True,
-                                actions=cached_actions,
-                                usage={
-                                    "input_tokens": 0,
-                                    "output_tokens": 0,
-                                    "inference_time_ms": 0,
-                                },
-                            )
-
-                        except Exception as e:
-                            self.logger.info(f"执行缓存操作失败: {e}，将重新调用LLM")
-                            # 如果执行失败，继续正常的LLM调用流程
-                            cached_actions = None
-
-                except Exception as e:
-                    # 使用info方法替代warning
-                    self.logger.info(f"缓存检查失败: {e}")
-                    cached_actions = None
-            self.logger.info(
-                f"Agent starting execution for instruction: '{instruction}'",
-                category="agent",
-            )
-
-            try:
-                agent_result = await self.client.run_task(
-                    instruction=instruction,
-                    max_steps=self.config.max_steps,
-                    options=options,
-                )
-            except Exception as e:
-                self.logger.error(
-                    f"Exception during client.run_task: {e}", category="agent"
-                )
-                empty_usage = AgentUsage(
-                    input_tokens=0, output_tokens=0, inference_time_ms=0
-                )
-                return AgentResult(
-                    message=f"Error: {str(e)}",
-                    completed=True,
-                    actions=[],
-                    usage=empty_usage,
-                )
-
-            # Update metrics if usage data is available in the result
-            if agent_result.usage:
-                # self.stagehand.update_metrics(
-                #     AGENT_METRIC_FUNCTION_NAME,
-                #     agent_result.usage.get("input_tokens", 0),
-                #     agent_result.usage.get("output_tokens", 0),
-                #     agent_result.usage.get("inference_time_ms", 0),
-                # )
-                pass  # Placeholder if metrics are to be handled differently or not at all
-
-            self.logger.info(
-                f"Agent execution finished. Success: {agent_result.completed}. Message: {agent_result.message}",
-                category="agent",
-            )
-            # To clean up pydantic model output
-            actions_repr = [action.root for action in agent_result.actions]
-            self.logger.debug(
-                f"Agent actions: {actions_repr}",
-                category="agent",
-            )
-            agent_result.actions = actions_repr
-
-            # 保存成功的结果到缓存
-            if (
-                self.cache_enabled
-                and self.cache
-                and agent_result.completed
-                and agent_result.actions
-                and not options_dict.get("disable_cache_save", False)
-            ):
-                try:
-                    # 获取执行后的截图
-                    final_screenshot = await self.cua_handler.get_screenshot_base64()
-
-                    # 构建页面上下文
-                    page_context = {
-                        "url": self.stagehand.page._page.url,
-                        "title": await self.stagehand.page._page.title(),
-                        "viewport": self.viewport,
-                    }
-
-                    # 保存到缓存
-                    self.cache.set_cached_actions(
-                        instruction=instruction,
-                        actions=actions_repr,
-                        screenshot=final_screenshot,
-                        page_context=page_context,
-                    )
-
-                except Exception as e:
-                    # 使用info方法替代warning
-                    self.logger.info(f"保存Agent缓存失败: {e}")
-
-            return agent_result
+            if not (self.cache_enabled and self.cache):
+                return await self._run_uncached(instruction, options)
+            return await self._run_cached(instruction, options, options_dict)
         else:
-            agent_config_payload = self.config.model_dump(
-                exclude_none=True, by_alias=True
-            )
-            agent_config_payload["provider"] = self.provider
             payload = {
-                # Use the stored config
-                "agentConfig": agent_config_payload,
-                "executeOptions": options.model_dump(exclude_none=True, by_alias=True),
+                # Precomputed in __init__; _execute builds a new camelCased copy,
+                # so the shared dict is never mutated
+                "agentConfig": self._agent_config_payload,
+                "executeOptions": options.model_dump(
+                    exclude_none=True, by_alias=True, exclude={"instructions"}
+                ),
             }
 
+            # 负载在锁外构建；锁只包住请求本身。_execute 本身无共享状态，但服务端
+            # 在该会话唯一的浏览器页面上执行操作，同一会话的并发请求会互相干扰
             lock = self.stagehand._get_lock_for_session()
             async with lock:
                 result = await self.stagehand._execute("agentExecute", payload)
@@ -409,16 +390,271 @@ class Agent:
                 # If the result is not a dict and not None, it's unexpected
                 raise TypeError(f"Unexpected result type from server: {type(result)}")
 
+    async def _run_cached(
+        self, instruction: str, options: AgentExecuteOptions, options_dict: dict
+    ) -> AgentResult:
+        """本地执行一次任务：先查询Agent缓存（与LLM推理对冲），未命中时走LLM并保存结果"""
+        cached_actions = None
+        # 执行前的页面上下文，保存缓存时URL未变化则复用其中的标题
+        lookup_context = None
+        # 对冲请求：缓存查询超过宽限期仍未返回时才开始LLM推理，页面操作要等闸门
+        # 打开（缓存未命中）后才执行；缓存命中时取消LLM任务。查询通常在宽限期内
+        # 完成，此时不会启动推理，缓存命中不消耗 token
+        action_gate = asyncio.Event()
+        self.client.action_gate = action_gate
+        llm_task = None
+        lookup_task = asyncio.create_task(self._try_cached(instruction, options_dict))
+        try:
+            # 缓存查询限时，超时直接走LLM，避免慢缓存拖慢回退
+            timeout = (
+                self.config.cache_lookup_timeout_s or _DEFAULT_CACHE_LOOKUP_TIMEOUT_S
+            )
+            grace = min(_CACHE_HEDGE_DELAY_S, timeout)
+            done, _ = await asyncio.wait({lookup_task}, timeout=grace)
+            if not done:
+                llm_task = asyncio.create_task(
+                    self.client.run_task(
+                        instruction=instruction,
+                        max_steps=self.config.max_steps,
+                        options=options,
+                    )
+                )
+            try:
+                cached_actions, lookup_context = await asyncio.wait_for(
+                    lookup_task, timeout=timeout - grace
+                )
+            except asyncio.TimeoutError:
+                self.logger.info(f"Agent缓存查询超过 {timeout}s，直接调用LLM")
+                cached_actions = None
+
+            if cached_actions:
+                # 缓存命中，执行缓存的操作
+                self.logger.info("🚀 Agent缓存命中，执行缓存的操作")
+                if llm_task is not None:
+                    llm_task.cancel()
+                    with contextlib.suppress(asyncio.CancelledError, Exception):
+                        await llm_task
+                    llm_task = None
+
+                try:
+                    # 将缓存的操作转换为可执行的格式
+                    executable_actions = []
+                    for action_dict in cached_actions:
+                        agent_action = self._create_agent_action_from_dict(action_dict)
+                        if agent_action:
+                            executable_actions.append(agent_action)
+
+                    # 执行缓存的操作
+                    await self._replay_cached_actions(executable_actions)
+
+                    return AgentResult(
+                        message="成功执行缓存的操作序列",
+                        completed=True,
+                        actions=cached_actions,
+                        usage={
+                            "input_tokens": 0,
+                            "output_tokens": 0,
+                            "inference_time_ms": 0,
+                        },
+                    )
+
+                except Exception as e:
+                    self.logger.info(f"执行缓存操作失败: {e}，将重新调用LLM")
+                    # 如果执行失败，继续正常的LLM调用流程
+                    cached_actions = None
+
+        except Exception as e:
+            # 使用info方法替代warning
+            self.logger.info(f"缓存检查失败: {e}")
+            cached_actions = None
+        finally:
+            lookup_task.cancel()
+            # 缓存未命中或回放失败：放行已在推理中的LLM任务
+            self.client.action_gate = None
+            action_gate.set()
+
+        agent_result = await self._run_uncached(instruction, options, llm_task)
+
+        # 保存成功的结果到缓存
+        if (
+            agent_result.completed
+            and agent_result.actions
+            and not options_dict.get("disable_cache_save", False)
+        ):
+            try:
+                # 获取执行后的截图和页面上下文
+                final_screenshot, page_context = await self._capture_page_context(
+                    lookup_context
+                )
+
+                # 在后台线程保存到缓存，不阻塞结果返回
+                self._schedule_cache_write(
+                    instruction=instruction,
+                    actions=agent_result.actions,
+                    screenshot=final_screenshot,
+                    page_context=page_context,
+                )
+
+            except Exception as e:
+                # 使用info方法替代warning
+                self.logger.info(f"保存Agent缓存失败: {e}")
+
+        return agent_result
+
+    async def _run_uncached(
+        self,
+        instruction: str,
+        options: AgentExecuteOptions,
+        llm_task: Optional[asyncio.Task] = None,
+    ) -> AgentResult:
+        """
+        本地执行一次任务（不查缓存）
+
+        llm_task 为已经开始的 run_task 任务（对冲查询时由 _run_cached 创建），为空时新建。
+        """
+        self.logger.info(
+            f"Agent starting execution for instruction: '{instruction}'",
+            category="agent",
+        )
+
+        try:
+            if llm_task is not None:
+                agent_result = await llm_task
+            else:
+                agent_result = await self.client.run_task(
+                    instruction=instruction,
+                    max_steps=self.config.max_steps,
+                    options=options,
+                )
+        except Exception as e:
+            self.logger.error(
+                f"Exception during client.run_task: {e}", category="agent"
+            )
+            empty_usage = AgentUsage(
+                input_tokens=0, output_tokens=0, inference_time_ms=0
+            )
+            return AgentResult(
+                message=f"Error: {str(e)}",
+                completed=True,
+                actions=[],
+                usage=empty_usage,
+            )
+
+        # Update metrics if usage data is available in the result
+        if agent_result.usage:
+            # self.stagehand.update_metrics(
+            #     AGENT_METRIC_FUNCTION_NAME,
+            #     agent_result.usage.get("input_tokens", 0),
+            #     agent_result.usage.get("output_tokens", 0),
+            #     agent_result.usage.get("inference_time_ms", 0),
+            # )
+            pass  # Placeholder if metrics are to be handled differently or not at all
+
+        self.logger.info(
+            f"Agent execution finished. Success: {agent_result.completed}. Message: {agent_result.message}",
+            category="agent",
+        )
+        # To clean up pydantic model output; unwrap in place to reuse the list
+        actions = agent_result.actions
+        for i, action in enumerate(actions):
+            actions[i] = action.root
+        if self.logger.is_enabled(2):
+            self.logger.debug(
+                f"Agent actions: {actions}",
+                category="agent",
+            )
+
+        return agent_result
+
+    async def execute_batch(
+        self, options_list: list[Union[AgentExecuteOptions, str, dict]]
+    ) -> list[AgentResult]:
+        """
+        按顺序逐条执行多条指令
+
+        本地模式下所有指令共用同一个页面，API模式下同一会话的 agentExecute 请求
+        也由会话锁串行发送，因此这里不做并发。结果与输入按位置一一对应；
+        单条执行抛出的异常会转换为 AgentResult(message="Error: ...", completed=True)，
+        与 execute 的错误约定一致，不会中断后续指令。
+        需要并发时请为每条指令使用独立页面（见 AgentClient.run_many）。
+        """
+        results = []
+        for options in options_list:
+            try:
+                results.append(await self.execute(options))
+            except Exception as e:
+                results.append(
+                    AgentResult(
+                        message=f"Error: {str(e)}",
+                        completed=True,
+                        actions=[],
+                        usage=AgentUsage(
+                            input_tokens=0, output_tokens=0, inference_time_ms=0
+                        ),
+                    )
+                )
+        return results
+
+    def _schedule_cache_write(self, **kwargs) -> None:
+        """将 set_cached_actions 调度为后台任务（在线程中执行同步的序列化和写盘）"""
+
+        def _write():
+            with self._cache_lock:
+                self.cache.set_cached_actions(**kwargs)
+
+        async def _save():
+            try:
+                async with self._cache_io_lock:
+                    await asyncio.to_thread(_write)
+            except Exception as e:
+                self.logger.info(f"保存Agent缓存失败: {e}")
+
+        task = asyncio.create_task(_save())
+        self._pending_cache_writes.add(task)
+        task.add_done_callback(self._pending_cache_writes.discard)
+
+    async def aclose(self) -> None:
+        """等待所有未完成的后台缓存写入，并释放客户端持有的连接（Stagehand.close() 时调用）"""
+        if self._pending_cache_writes:
+            await asyncio.gather(*self._pending_cache_writes)
+        client = getattr(self, "client", None)
+        if client is not None:
+            await client.aclose()
+
+    def reset(self) -> None:
+        """
+        重置Agent的单次任务状态，以便在重试时复用同一个实例而不是重新创建
+
+        会将CUA处理器重新绑定到当前活动页面并刷新视口尺寸
+        """
+        if self.stagehand.use_api:
+            return
+
+        self.cua_handler.page = self.stagehand.page._page
+        self.viewport = self.cua_handler.page.viewport_size
+        self.client.reset()
+
+    @staticmethod
+    def _format_plan_instruction(plan: list[str]) -> str:
+        """将步骤列表格式化为一条编号的指令"""
+        steps = "\n".join(f"{i}) {step}" for i, step in enumerate(plan, 1))
+        return (
+            "按顺序完成以下步骤，每次只返回当前步骤的一条操作指令，"
+            f"从第1步开始：\n{steps}"
+        )
+
     def get_cache_stats(self) -> Optional[dict]:
         """获取Agent缓存统计信息"""
         if self.cache_enabled and self.cache:
-            return self.cache.get_cache_stats()
+            with self._cache_lock:
+                return self.cache.get_cache_stats()
         return None
 
     def clear_cache(self):
         """清空Agent缓存"""
         if self.cache_enabled and self.cache:
-            self.cache.clear_cache()
+            with self._cache_lock:
+                self.cache.clear_cache()
             self.logger.info("Agent缓存已清空")
         else:
             # 使用info方法替代warning
@@ -427,83 +663,120 @@ class Agent:
     def set_cache_strategy(self, strategy: str):
         """设置缓存验证策略"""
         if self.cache_enabled and self.cache:
-            self.cache.validator.strategy = strategy
+            with self._cache_lock:
+                self.cache.validator.strategy = strategy
             self.logger.info(f"Agent缓存策略已更新为: {strategy}")
         else:
             # 使用info方法替代warning
             self.logger.info("Agent缓存未启用，无法设置策略")
 
+    async def _try_cached(
+        self, instruction: str, options_dict: dict
+    ) -> tuple[Optional[list], dict]:
+        """获取当前页面截图和上下文并查询Agent缓存，返回缓存的操作列表和页面上下文"""
+        current_screenshot, page_context = await self._capture_page_context()
+        async with self._cache_io_lock:
+            cached_actions = await self.cache.get_cached_actions(
+                instruction=instruction,
+                current_screenshot=current_screenshot,
+                page_context=page_context,
+                ttl=options_dict.get("cache_ttl"),
+            )
+        return cached_actions, page_context
+
+    async def _capture_page_context(
+        self, previous: Optional[dict] = None
+    ) -> tuple[str, dict]:
+        """
+        获取截图和页面上下文
+
+        如果传入之前的页面上下文且URL没有变化，直接复用其中的标题，只重新截图；
+        否则并发获取截图和页面标题（两次独立的浏览器往返）。
+        """
+        page = self.stagehand.page._page
+        url = page.url
+        if previous is not None and previous.get("url") == url:
+            screenshot = await self.cua_handler.get_screenshot_base64()
+            title = previous.get("title")
+        else:
+            screenshot, title = await asyncio.gather(
+                self.cua_handler.get_screenshot_base64(), page.title()
+            )
+        page_context = {
+            "url": url,
+            "title": title,
+            "viewport": self.viewport,
+        }
+        return screenshot, page_context
+
+    async def _replay_cached_actions(self, actions: list[AgentAction]) -> None:
+        """
+        回放缓存的操作序列，任一操作失败时抛出异常
+
+        连续的截图操作通过 asyncio.gather 并发执行，其余操作（包括 wait）
+        按顺序执行；修改型操作之后用有上限的 networkidle 等待代替固定的 500ms 延迟。
+        """
+        total = len(actions)
+        index = 0
+        while index < total:
+            if actions[index].action_type not in _CONCURRENT_ACTIONS:
+                group = [actions[index]]
+            else:
+                end = index
+                while end < total and actions[end].action_type in _CONCURRENT_ACTIONS:
+                    end += 1
+                group = actions[index:end]
+
+            self.logger.info(
+                f"执行缓存操作 {index + 1}-{index + len(group)}/{total}: "
+                f"{', '.join(action.action_type for action in group)}"
+            )
+            if len(group) == 1:
+                results = [await self.cua_handler.perform_action(group[0])]
+            else:
+                results = await asyncio.gather(
+                    *(self.cua_handler.perform_action(action) for action in group)
+                )
+
+            # 检查操作结果，失败时让调用方重新调用LLM
+            for result in results:
+                if not result.get("success", True):
+                    error = result.get("error", "未知错误")
+                    self.logger.info(f"缓存操作执行失败: {error}")
+                    raise Exception(f"缓存操作执行失败: {error}")
+
+            index += len(group)
+            # 修改型操作之后等待页面响应（有上限），最后一个操作之后不再等待
+            if index < total and _is_mutating(group[-1].action_type):
+                try:
+                    await self.stagehand.page._page.wait_for_load_state(
+                        "networkidle", timeout=1500
+                    )
+                except Exception:
+                    pass
+
     def _create_agent_action_from_dict(self, action_dict: dict):
         """从字典创建AgentAction对象"""
         try:
             action_type = action_dict.get("type")
 
             # 创建具体的操作对象
-            specific_action = None
-            if action_type == "click":
-                from ..types.agent import ClickAction
-
-                specific_action = ClickAction(**action_dict)
-            elif action_type == "double_click":
-                from ..types.agent import DoubleClickAction
-
-                specific_action = DoubleClickAction(**action_dict)
-            elif action_type == "type":
-                from ..types.agent import TypeAction
-
-                specific_action = TypeAction(**action_dict)
-            elif action_type == "key_press":
-                from ..types.agent import KeyPressAction
-
-                specific_action = KeyPressAction(**action_dict)
-            elif action_type == "scroll":
-                from ..types.agent import ScrollAction
-
-                specific_action = ScrollAction(**action_dict)
-            elif action_type == "drag":
-                from ..types.agent import DragAction
-
-                specific_action = DragAction(**action_dict)
-            elif action_type == "move":
-                from ..types.agent import MoveAction
-
-                specific_action = MoveAction(**action_dict)
-            elif action_type == "wait":
-                from ..types.agent import WaitAction
-
-                specific_action = WaitAction(**action_dict)
-            elif action_type == "screenshot":
-                from ..types.agent import ScreenshotAction
-
-                specific_action = ScreenshotAction(**action_dict)
-            elif action_type == "function":
-                from ..types.agent import FunctionAction
-
-                specific_action = FunctionAction(**action_dict)
-            elif action_type == "key":
-                from ..types.agent import KeyAction
-
-                specific_action = KeyAction(**action_dict)
-            else:
+            action_cls = _ACTION_CLASSES.get(action_type)
+            if action_cls is None:
                 self.logger.info(f"未知的操作类型: {action_type}")
                 return None
 
-            if specific_action:
-                # 创建AgentActionType (RootModel)
-                from ..types.agent import AgentAction, AgentActionType
-
-                action_root_model = AgentActionType(root=specific_action)
-
-                # 创建AgentAction对象
-                agent_action = AgentAction(
+            try:
+                frozen_action = _freeze(action_dict)
+                hash(frozen_action)
+            except TypeError:
+                # 含有不可哈希的值，跳过缓存直接构建
+                return AgentAction(
                     action_type=action_type,
-                    action=action_root_model,
+                    action=AgentActionType(root=action_cls(**action_dict)),
                     reasoning="从缓存恢复的操作",
                 )
-
-                return agent_action
-
-            return None
+            return _build_cached_action(frozen_action)
 
         except Exception as e:
             self.logger.info(f"创建AgentAction对象失败: {e}")
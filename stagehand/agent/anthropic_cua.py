@@ -1,5 +1,6 @@
 import asyncio
 import os
+import time
 from typing import Any, Optional
 
 from anthropic import Anthropic, AnthropicError
@@ -163,12 +164,14 @@ class AnthropicCUAClient(AgentClient):
                 category=StagehandFunctionName.AGENT,
             )
 
-            start_time = asyncio.get_event_loop().time()
+            start_time = time.perf_counter()
             try:
                 if self.experimental:
                     compress_conversation_images(current_messages)
 
-                response = self.anthropic_sdk_client.beta.messages.create(
+                # The SDK client is synchronous; run it off the event loop
+                response = await asyncio.to_thread(
+                    self.anthropic_sdk_client.beta.messages.create,
                     model=self.model,
                     max_tokens=self.max_tokens,
                     system=self.instructions
@@ -177,7 +180,7 @@ class AnthropicCUAClient(AgentClient):
                     tools=self.tools,
                     betas=self.beta_flag,
                 )
-                end_time = asyncio.get_event_loop().time()
+                end_time = time.perf_counter()
                 total_inference_time_ms += int((end_time - start_time) * 1000)
                 if response.usage:
                     total_input_tokens += response.usage.input_tokens or 0
@@ -220,6 +223,7 @@ class AnthropicCUAClient(AgentClient):
 
             if agent_action:
                 actions_taken.append(agent_action)
+                await self._wait_for_action_gate()
                 action_result: ActionExecutionResult = (
                     await self.handler.perform_action(agent_action)
                 )
@@ -271,6 +275,10 @@ class AnthropicCUAClient(AgentClient):
             usage=usage_obj,
         )
 
+    def reset(self) -> None:
+        """Clears the tool_use ids remembered from the previous task."""
+        self.last_tool_use_ids = None
+
     def _format_initial_messages(
         self, instruction: str, screenshot_base64: Optional[str]
     ) -> list[dict[str, Any]]:
@@ -1,3 +1,4 @@
+import asyncio
 from abc import ABC, abstractmethod
 from typing import Any, Optional
 
@@ -21,6 +22,9 @@ class AgentClient(ABC):
         self.config = config if config else AgentConfig()  # Ensure config is never None
         self.logger = logger
         self.handler: CUAHandler = handler  # Client holds a reference to the handler
+        # Set by Agent while a speculative run overlaps the cache lookup: page actions
+        # wait until the gate opens (cache miss), so only inference runs ahead.
+        self.action_gate: Optional[asyncio.Event] = None
 
     @abstractmethod
     async def run_task(
@@ -39,6 +43,75 @@ class AgentClient(ABC):
         """
         pass
 
+    @classmethod
+    async def run_many(
+        cls,
+        tasks: list[tuple[str, CUAHandler]],
+        *,
+        max_steps: int = 20,
+        concurrency: int = 32,
+        timeout: Optional[float] = None,
+        options: Optional[AgentExecuteOptions] = None,
+        **client_kwargs,
+    ) -> list[AgentResult]:
+        """
+        Run independent tasks concurrently, one client per (instruction, handler) pair.
+
+        Each handler must drive its own page (e.g. one per tab); clients built from the
+        same endpoint share its pooled HTTP connection. At most ``concurrency`` tasks run
+        at once. Results are positional; a task that raises or exceeds ``timeout``
+        seconds yields AgentResult(message="Error: ...", completed=True), matching
+        Agent.execute_batch.
+        """
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def _one(instruction: str, handler: CUAHandler) -> AgentResult:
+            client = cls(handler=handler, **client_kwargs)
+            async with semaphore:
+                return await asyncio.wait_for(
+                    client.run_task(instruction, max_steps=max_steps, options=options),
+                    timeout,
+                )
+
+        results = await asyncio.gather(
+            *(_one(instruction, handler) for instruction, handler in tasks),
+            return_exceptions=True,
+        )
+        return [
+            (
+                AgentResult(
+                    message=f"Error: {str(result) or type(result).__name__}",
+                    completed=True,
+                    actions=[],
+                    usage={
+                        "input_tokens": 0,
+                        "output_tokens": 0,
+                        "inference_time_ms": 0,
+                    },
+                )
+                if isinstance(result, Exception)
+                else result
+            )
+            for result in results
+        ]
+
+    async def _wait_for_action_gate(self) -> None:
+        """Block before performing a page action while a hedged cache lookup is pending."""
+        gate = self.action_gate
+        if gate is not None:
+            await gate.wait()
+
+    async def aclose(self) -> None:  # noqa: B027 - optional hook, no-op by default
+        """Releases resources (e.g. pooled connections) held by the client."""
+
+    def reset(self) -> None:  # noqa: B027 - optional hook, no-op by default
+        """
+        Clears any per-task state kept by the client so the same instance can be reused
+        for a new task. Clients that keep conversation history between tasks should override this.
+        """
+
     @abstractmethod
     def _format_initial_messages(
         self, instruction: str, screenshot_base64: Optional[str]
@@ -1,11 +1,15 @@
 import asyncio
+import base64
+import hashlib
 import json
 import os
 import re
-from typing import Any, Optional
+import time
+from typing import Any, Optional, Union
 
+import httpx
 from dotenv import load_dotenv
-from openai import OpenAI as OpenAISDK
+from openai import AsyncOpenAI, BadRequestError
 
 from ..handlers.cua_handler import CUAHandler
 from ..types.agent import (
@@ -15,14 +19,169 @@ from ..types.agent import (
     AgentConfig,
     AgentExecuteOptions,
     AgentResult,
+    ClickAction,
     FunctionAction,
+    KeyPressAction,
+    ScrollAction,
+    TypeAction,
+    WaitAction,
 )
+from ..utils import json_dumps, json_loads
 from .client import AgentClient
+from .utils import (
+    Image,
+    ParsedAction,
+    changed_tile_box,
+    decode_screenshot,
+    encode_screenshot_region,
+    hash_screenshot_tiles,
+    iter_actions,
+)
+
+try:
+    import h2  # noqa: F401
+
+    _HTTP2_AVAILABLE = True
+except ImportError:
+    _HTTP2_AVAILABLE = False
 
 load_dotenv()
 
+# One pooled HTTP client per (event loop, endpoint), shared by the OpenAICUAClients
+# running on that loop so repeated Agent instances reuse the same TCP/TLS connection
+# (and, with HTTP/2, multiplex concurrent requests over it). Auth headers are set per
+# request by the SDK, so the URL is enough to tell endpoints apart. Connections are
+# bound to the loop that opened them, hence the loop in the key. Entries are
+# reference-counted: each client acquires one on construction and releases it in
+# aclose(); the last release closes the pooled client.
+_PoolKey = tuple[Optional[asyncio.AbstractEventLoop], Optional[str]]
+
+
+class _PoolEntry:
+    __slots__ = ("client", "refs")
+
+    def __init__(self, client: httpx.AsyncClient):
+        self.client = client
+        self.refs = 0
+
+
+_SHARED_HTTP_CLIENTS: dict[_PoolKey, _PoolEntry] = {}
+
+
+def _new_http_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        http2=_HTTP2_AVAILABLE,
+        # httpx drops idle connections after 5s by default; one agent step
+        # (action + settle + screenshot) often takes longer than that
+        limits=httpx.Limits(
+            max_keepalive_connections=20,
+            max_connections=100,
+            keepalive_expiry=30.0,
+        ),
+        timeout=httpx.Timeout(600.0, connect=5.0),
+        follow_redirects=True,
+    )
+
+
+def _acquire_http_client(base_url: Optional[str]) -> tuple[_PoolKey, httpx.AsyncClient]:
+    """Take a reference to the pooled HTTP client for base_url on the running loop."""
+    try:
+        loop: Optional[asyncio.AbstractEventLoop] = asyncio.get_running_loop()
+    except RuntimeError:
+        loop = None
+    # Clients of a finished loop (e.g. an earlier asyncio.run) can't be reused
+    for stale in [
+        k for k in _SHARED_HTTP_CLIENTS if k[0] is not None and k[0].is_closed()
+    ]:
+        del _SHARED_HTTP_CLIENTS[stale]
+
+    key = (loop, base_url)
+    entry = _SHARED_HTTP_CLIENTS.get(key)
+    if entry is None or entry.client.is_closed:
+        entry = _SHARED_HTTP_CLIENTS[key] = _PoolEntry(_new_http_client())
+    entry.refs += 1
+    return key, entry.client
+
+
+async def _release_http_client(key: _PoolKey, client: httpx.AsyncClient) -> None:
+    """Drop a reference taken by _acquire_http_client; the last one closes the client."""
+    entry = _SHARED_HTTP_CLIENTS.get(key)
+    if entry is None or entry.client is not client:
+        # Already replaced (its loop finished or it was closed); nothing to release
+        return
+    entry.refs -= 1
+    if entry.refs <= 0:
+        del _SHARED_HTTP_CLIENTS[key]
+        await client.aclose()
+
+
+# Fallback patterns for models that answer in prose instead of the action grammar
+_NL_COORD_PATTERNS = [
+    re.compile(p, re.IGNORECASE)
+    for p in (
+        r"(?:点击|click).*?(?:坐标|coordinates?).*?[(\[]?\s*(\d+)\s*[,，]\s*(\d+)\s*[)\]]?",
+        r"[(\[]?\s*(\d+)\s*[,，]\s*(\d+)\s*[)\]]?.*?(?:点击|click)",
+        r"x\s*[:=]\s*(\d+).*?y\s*[:=]\s*(\d+)",
+        r"位置\s*[(\[]?\s*(\d+)\s*[,，]\s*(\d+)\s*[)\]]?",
+    )
+]
+# One scan tells which intents (click / input) a prose answer mentions
+_NL_INTENT_RE = re.compile(
+    r"(?P<click>点击|click)|(?P<input>输入|input|type)", re.IGNORECASE
+)
+_NL_INPUT_PATTERNS = [
+    re.compile(p, re.IGNORECASE)
+    for p in (
+        r"输入[\"']([^\"']+)[\"']",
+        r"输入\s*[:：]\s*([^\n]+)",
+        r"type\s*[:：]\s*([^\n]+)",
+    )
+]
+_LEADING_INT_RE = re.compile(r"[+-]?\d+")
+# GLM special tokens such as <|begin_of_box|> / <|end_of_box|> leaking into arguments
+_GLM_MARKER_RE = re.compile(r"<\|.*?\|>")
+
+
+def _usage_tokens(usage: Any) -> tuple[int, int]:
+    """
+    Read (input, output) token counts from a completion's usage block.
+
+    Chat Completions names (prompt_tokens / completion_tokens) are tried first since
+    that is what the SDK model defines; Responses-style names are the fallback.
+    """
+    return (
+        getattr(usage, "prompt_tokens", None)
+        or getattr(usage, "input_tokens", None)
+        or 0,
+        getattr(usage, "completion_tokens", None)
+        or getattr(usage, "output_tokens", None)
+        or 0,
+    )
+
+
+def _int_arg(args: dict[str, str], key: str) -> Optional[int]:
+    """Read the leading integer of an action argument, e.g. "200 (button)" -> 200."""
+    match = _LEADING_INT_RE.match(args.get(key, ""))
+    return int(match.group()) if match else None
+
+
+def _is_openai_endpoint(base_url: Optional[str]) -> bool:
+    """Whether requests go to the official OpenAI API (the SDK default when unset)."""
+    return base_url is None or httpx.URL(base_url).host == "api.openai.com"
+
 
 class OpenAICUAClient(AgentClient):
+    # Screenshots sent to the model: JPEG and at most 1280x720. GLM answers in
+    # per-mille coordinates, so downscaling needs no inverse coordinate scaling.
+    SCREENSHOT_FORMAT = "jpeg"
+    SCREENSHOT_QUALITY = 85
+    SCREENSHOT_MAX_SIZE = (1280, 720)
+    # Follow-up screenshots within one conversation only carry the changed
+    # region (16x16 tile diff); too many changed tiles falls back to a full frame.
+    SCREENSHOT_TILE_SIZE = 16
+    SCREENSHOT_DELTA_MAX_RATIO = 0.5
+    OMITTED_SCREENSHOT_TEXT = "[screenshot from earlier step omitted]"
+
     def __init__(
         self,
         model: str = "gpt-4o",
@@ -41,14 +200,55 @@ class OpenAICUAClient(AgentClient):
             else os.getenv("OPENAI_API_KEY")
         )
         base_url = None
+        # Raw provider output items are only attached to actions when requested
+        self.store_step_trace = False
+        # None: decide from the endpoint (see the prompt_cache_key setup below)
+        send_prompt_cache_key = None
         if config and config.options:
             base_url = config.options.get("baseURL") or config.options.get("api_base")
+            self.store_step_trace = bool(config.options.get("storeStepTrace"))
+            send_prompt_cache_key = config.options.get("promptCacheKey")
 
         self.logger.info(
             f"OpenAI client config - api_key: {api_key[:10] if api_key else None}..., base_url: {base_url}"
         )
 
-        self.openai_sdk_client = OpenAISDK(api_key=api_key, base_url=base_url)
+        self._http_pool_key: Optional[_PoolKey]
+        self._http_pool_key, self._http_client = _acquire_http_client(base_url)
+        self.openai_sdk_client = AsyncOpenAI(
+            api_key=api_key,
+            base_url=base_url,
+            http_client=self._http_client,
+        )
+
+        # 系统提示词在客户端生命周期内不变，预先计算前缀缓存标记：
+        # Anthropic兼容模型使用 cache_control；prompt_cache_key 并非所有 OpenAI 兼容后端
+        # 都接受，默认只发给官方 OpenAI 端点，vLLM/GLM 等后端通过 options.promptCacheKey 开启
+        self._use_cache_control = (model or "").startswith(("claude", "anthropic/"))
+        if send_prompt_cache_key is None:
+            send_prompt_cache_key = not self._use_cache_control and _is_openai_endpoint(
+                base_url
+            )
+        self._prompt_cache_key = (
+            hashlib.sha1(self.instructions.encode("utf-8")).hexdigest()[:16]
+            if self.instructions and send_prompt_cache_key
+            else None
+        )
+        # 系统消息（来自 AgentConfig.instructions）同样只构建一次，各次任务共享且不修改
+        self._system_message: Optional[dict] = None
+        if self.instructions:
+            self._system_message = {"role": "system", "content": self.instructions}
+            if self._use_cache_control:
+                self._system_message["cache_control"] = {"type": "ephemeral"}
+
+        # Tile hashes and URL of the last screenshot sent to the model
+        self._last_screenshot_tiles = None
+        self._last_screenshot_url: Optional[str] = None
+        self._image_url_prefix = f"data:image/{self.SCREENSHOT_FORMAT};base64,"
+        # Indices of conversation messages that still carry a screenshot image
+        self._image_message_indices: list[int] = []
+        # Viewport (width, height), read once per run_task
+        self._viewport: Optional[tuple[int, int]] = None
 
         self.tools = [
             {
@@ -70,24 +270,136 @@ class OpenAICUAClient(AgentClient):
             },
         ]
 
+    async def aclose(self) -> None:
+        """Release this client's share of the pooled HTTP client."""
+        key, self._http_pool_key = self._http_pool_key, None
+        if key is not None:
+            await _release_http_client(key, self._http_client)
+
+    async def _get_screenshot(self) -> bytes:
+        # Raw bytes: tile hashing reads them directly, and only images that are
+        # actually sent get base64-encoded
+        return await self.handler.get_screenshot_bytes(
+            image_format=self.SCREENSHOT_FORMAT,
+            quality=self.SCREENSHOT_QUALITY,
+            max_size=self.SCREENSHOT_MAX_SIZE,
+        )
+
     def format_screenshot(self, screenshot_base64: str) -> dict:
-        """Formats a screenshot for the OpenAI CUA model."""
+        """Formats a screenshot as a Chat Completions image content part."""
         return {
-            "type": "input_image",
-            "image_url": f"data:image/png;base64,{screenshot_base64}",
+            "type": "image_url",
+            "image_url": {"url": self._image_url_prefix + screenshot_base64},
         }
 
+    def _full_frame(self, screenshot: Union[bytes, str]) -> dict:
+        """Format raw screenshot bytes (or an already encoded string) as an image part."""
+        if isinstance(screenshot, bytes):
+            screenshot = base64.b64encode(screenshot).decode()
+        return self.format_screenshot(screenshot)
+
+    def _screenshot_content(
+        self, screenshot: Union[bytes, str], allow_delta: bool = False
+    ) -> tuple[list[dict], bool]:
+        """
+        Format a screenshot as user content parts, plus whether they hold a full frame.
+
+        With allow_delta the previous screenshot must still be in the conversation;
+        then only the changed region is sent (or a note that nothing changed).
+        """
+        try:
+            url = self.handler.page.url if self.handler else None
+        except Exception:
+            url = None
+        if Image is None:
+            return [self._full_frame(screenshot)], True
+
+        image = decode_screenshot(screenshot)
+        tiles = hash_screenshot_tiles(image, self.SCREENSHOT_TILE_SIZE)
+        box = None
+        if allow_delta and url == self._last_screenshot_url:
+            box = changed_tile_box(
+                self._last_screenshot_tiles, tiles, self.SCREENSHOT_DELTA_MAX_RATIO
+            )
+        self._last_screenshot_tiles = tiles
+        self._last_screenshot_url = url
+
+        if box is None:
+            return [self._full_frame(screenshot)], True
+        if box == (0, 0, 0, 0):
+            return [
+                {
+                    "type": "text",
+                    "text": "The screen is unchanged since the previous screenshot.",
+                }
+            ], False
+
+        # Region is reported in the same per-mille coordinates the model answers in
+        width, height = tiles.size
+        left, top, right, bottom = box
+        region = (
+            left * 1000 // width,
+            top * 1000 // height,
+            right * 1000 // width,
+            bottom * 1000 // height,
+        )
+        self.logger.debug(
+            f"Sending screenshot delta {box} of {width}x{height}", category="agent"
+        )
+        patch = encode_screenshot_region(
+            image, box, self.SCREENSHOT_FORMAT, self.SCREENSHOT_QUALITY
+        )
+        return [
+            {
+                "type": "text",
+                "text": (
+                    "The screen is unchanged since the previous screenshot except for "
+                    f"the region from ({region[0]}, {region[1]}) to ({region[2]}, {region[3]}) "
+                    "(per-mille coordinates of the full screen), shown in the attached patch."
+                ),
+            },
+            self.format_screenshot(patch),
+        ], False
+
+    def _append_user_message(
+        self,
+        messages: list[dict],
+        text: str,
+        screenshot: Optional[Union[bytes, str]] = None,
+        allow_delta: bool = False,
+    ) -> None:
+        """
+        Append a user turn in Chat Completions format.
+
+        Only the most recent full-frame screenshot (and the delta patches sent after
+        it) stays attached as an image; when a new full frame is appended, the images
+        of earlier turns are replaced by a short text note.
+        """
+        content: list[dict] = [{"type": "text", "text": text}]
+        if screenshot:
+            parts, full_frame = self._screenshot_content(screenshot, allow_delta)
+            content.extend(parts)
+            if full_frame:
+                for index in self._image_message_indices:
+                    messages[index]["content"] = [
+                        (
+                            {"type": "text", "text": self.OMITTED_SCREENSHOT_TEXT}
+                            if part["type"] == "image_url"
+                            else part
+                        )
+                        for part in messages[index]["content"]
+                    ]
+                self._image_message_indices = []
+            self._image_message_indices.append(len(messages))
+        messages.append({"role": "user", "content": content})
+
     def _format_initial_messages(
-        self, instruction: str, screenshot_base64: Optional[str]
+        self, instruction: str, screenshot: Optional[Union[bytes, str]]
     ) -> list[Any]:
-        messages: list[Any] = []
-        if self.instructions:  # System prompt from AgentConfig.instructions
-            messages.append({"role": "system", "content": self.instructions})
-
-        user_content: list[Any] = [{"type": "input_text", "text": instruction}]
-        if screenshot_base64:
-            user_content.append(self.format_screenshot(screenshot_base64))
-        messages.append({"role": "user", "content": user_content})
+        messages: list[Any] = [self._system_message] if self._system_message else []
+
+        self._image_message_indices = []
+        self._append_user_message(messages, instruction, screenshot)
         return messages
 
     def _process_provider_response(
@@ -106,15 +418,13 @@ class OpenAICUAClient(AgentClient):
 
         output_items = response.output
 
-        function_call_item = next(
-            (item for item in output_items if item.type == "function_call"), None
-        )
-        reasoning_item = next(
-            (item for item in output_items if item.type == "reasoning"), None
-        )
-        message_item = next(
-            (item for item in output_items if item.type == "message"), None
-        )
+        # First item of each type, collected in a single pass
+        first_items: dict[str, Any] = {}
+        for item in output_items:
+            first_items.setdefault(item.type, item)
+        function_call_item = first_items.get("function_call")
+        reasoning_item = first_items.get("reasoning")
+        message_item = first_items.get("message")
 
         reasoning_text = None
         if (
@@ -144,7 +454,7 @@ class OpenAICUAClient(AgentClient):
         if function_call_item:
             try:
                 arguments = (
-                    json.loads(function_call_item.arguments)
+                    json_loads(function_call_item.arguments)
                     if isinstance(function_call_item.arguments, str)
                     else function_call_item.arguments
                 )
@@ -168,7 +478,11 @@ class OpenAICUAClient(AgentClient):
                         if hasattr(function_call_item, "status")
                         else "in_progress"
                     ),  # function_call might not have status
-                    step=[item.model_dump() for item in output_items],
+                    step=(
+                        [item.model_dump() for item in output_items]
+                        if self.store_step_trace
+                        else None
+                    ),
                 )
                 return agent_action, reasoning_text, False, final_model_message
             except json.JSONDecodeError as e_json:
@@ -238,19 +552,21 @@ class OpenAICUAClient(AgentClient):
         output_payload: Any
         if action_result["success"]:
             # Function results are often simple strings or JSON strings.
-            output_payload = json.dumps(
+            output_payload = json_dumps(
                 {
                     "status": "success",
                     "detail": f"Function {action_type_performed} executed.",
                 }
-            )
+            ).decode("utf-8")
         else:
             error_message = f"Action {action_type_performed} failed: {action_result.get('error', 'Unknown error')}"
             self.logger.info(
                 f"Formatting failed action feedback for OpenAI: {error_message}",
                 category="agent",
             )
-            output_payload = json.dumps({"status": "error", "detail": error_message})
+            output_payload = json_dumps(
+                {"status": "error", "detail": error_message}
+            ).decode("utf-8")
 
         return [
             {
@@ -260,6 +576,29 @@ class OpenAICUAClient(AgentClient):
             }
         ]
 
+    async def _create_completion(self, messages: list[dict]) -> Any:
+        """Request the next step, dropping prompt_cache_key if the backend rejects it."""
+        request = {
+            "model": self.model,
+            "messages": messages,
+            "temperature": 0.7,
+            "max_tokens": 1000,
+        }
+        if not self._prompt_cache_key:
+            return await self.openai_sdk_client.chat.completions.create(**request)
+        try:
+            return await self.openai_sdk_client.chat.completions.create(
+                **request, extra_body={"prompt_cache_key": self._prompt_cache_key}
+            )
+        except BadRequestError as e:
+            self.logger.info(
+                f"Retrying without prompt_cache_key after a 400: {e}", category="agent"
+            )
+        response = await self.openai_sdk_client.chat.completions.create(**request)
+        # The retry succeeded, so the backend does not accept the key; stop sending it
+        self._prompt_cache_key = None
+        return response
+
     async def run_task(
         self,
         instruction: str,
@@ -282,17 +621,21 @@ class OpenAICUAClient(AgentClient):
                 usage={"input_tokens": 0, "output_tokens": 0, "inference_time_ms": 0},
             )
 
-        await self.handler.inject_cursor()
-        current_screenshot_b64 = await self.handler.get_screenshot_base64()
-
-        current_input_items: list[Any] = self._format_initial_messages(
-            instruction, current_screenshot_b64
+        self._viewport = None
+        # 光标注入与首张截图互不依赖，并发执行
+        _, current_screenshot = await asyncio.gather(
+            self.handler.inject_cursor(), self._get_screenshot()
         )
 
+        # 会话以Chat Completions格式维护，每步只追加新的消息
+        messages = self._format_initial_messages(instruction, current_screenshot)
+
+        # 多步计划：每完成一步，在同一会话中继续下一步
+        plan = options.instructions if options and options.instructions else None
+        plan_index = 0
+
         actions_taken: list[AgentAction] = []
-        total_input_tokens = 0
-        total_output_tokens = 0
-        total_inference_time_ms = 0  # Placeholder
+        usage = {"input_tokens": 0, "output_tokens": 0, "inference_time_ms": 0}
 
         for step_count in range(max_steps):
             self.logger.info(
@@ -300,89 +643,27 @@ class OpenAICUAClient(AgentClient):
                 category="agent",
             )
 
-            start_time = asyncio.get_event_loop().time()
+            start_time = time.perf_counter()
             try:
-                # 使用标准的 Chat Completions API 而不是 Computer Use API
-                # 将消息格式转换为标准格式
-
-                messages = []
-                for item in current_input_items:
-                    if isinstance(item, dict):
-                        if item.get("role") == "system":
-                            messages.append(
-                                {"role": "system", "content": item.get("content", "")}
-                            )
-                        elif item.get("role") == "user":
-                            content = item.get("content", [])
-                            if isinstance(content, list):
-                                # 处理多模态内容
-                                user_content = []
-                                for c in content:
-                                    if c.get("type") == "input_text":
-                                        user_content.append(
-                                            {"type": "text", "text": c.get("text", "")}
-                                        )
-                                    elif c.get("type") == "input_image":
-                                        # 从 format_screenshot 方法返回的格式中提取 image_url
-                                        image_url = c.get("image_url", "")
-                                        user_content.append(
-                                            {
-                                                "type": "image_url",
-                                                "image_url": {"url": image_url},
-                                            }
-                                        )
-
-                                messages.append(
-                                    {"role": "user", "content": user_content}
-                                )
-                            else:
-                                messages.append({"role": "user", "content": content})
-
-                # 如果没有消息，添加一个默认消息
-                if not messages:
-                    messages = [
-                        {"role": "user", "content": "请分析当前页面并执行指定任务"}
-                    ]
-
-                response = self.openai_sdk_client.chat.completions.create(
-                    model=self.model,
-                    messages=messages,
-                    temperature=0.7,
-                    max_tokens=1000,
-                )
-                print("--------------------------------")
-                print(response)
-                end_time = asyncio.get_event_loop().time()
-                total_inference_time_ms += int((end_time - start_time) * 1000)
+                response = await self._create_completion(messages)
+                end_time = time.perf_counter()
+                usage["inference_time_ms"] += int((end_time - start_time) * 1000)
+                if self.logger.is_enabled(2):
+                    self.logger.debug(f"Raw GLM response: {response}", category="agent")
 
                 # 处理智谱AI的usage字段差异
-                if hasattr(response, "usage") and response.usage:
-                    # 智谱AI可能使用不同的字段名
-                    input_tokens = getattr(
-                        response.usage, "input_tokens", None
-                    ) or getattr(response.usage, "prompt_tokens", 0)
-                    output_tokens = getattr(
-                        response.usage, "output_tokens", None
-                    ) or getattr(response.usage, "completion_tokens", 0)
-                    total_input_tokens += input_tokens
-                    total_output_tokens += output_tokens
+                if getattr(response, "usage", None):
+                    input_tokens, output_tokens = _usage_tokens(response.usage)
+                    usage["input_tokens"] += input_tokens
+                    usage["output_tokens"] += output_tokens
                     self.logger.info(
                         f"Token usage - input: {input_tokens}, output: {output_tokens}"
                     )
 
             except Exception as e:
                 self.logger.error(f"OpenAI API call failed: {e}", category="agent")
-                # Ensure usage is a valid AgentUsage object or None
-                usage_obj = {
-                    "input_tokens": total_input_tokens,
-                    "output_tokens": total_output_tokens,
-                    "inference_time_ms": total_inference_time_ms,
-                }
-                return AgentResult(
-                    actions=[act.action for act in actions_taken if act.action],
-                    message=f"OpenAI API error: {e}",
-                    completed=True,
-                    usage=usage_obj,
+                return self._finalize(
+                    actions_taken, f"OpenAI API error: {e}", True, usage
                 )
 
             # 处理标准 Chat Completions 响应
@@ -405,119 +686,162 @@ class OpenAICUAClient(AgentClient):
                         and hasattr(agent_action.action.root, "x")
                         and hasattr(agent_action.action.root, "y")
                     ):
-                        # 获取视口尺寸
-                        viewport = self.handler.page.viewport_size
-                        viewport_width = viewport["width"]
-                        viewport_height = viewport["height"]
-
                         # GLM-4.5V返回的是千分比坐标，需要转换为实际像素
                         glm_x = agent_action.action.root.x
                         glm_y = agent_action.action.root.y
-
-                        # 转换公式：千分比 → 实际像素坐标
-                        actual_x = int((glm_x / 1000) * viewport_width)
-                        actual_y = int((glm_y / 1000) * viewport_height)
+                        actual_x, actual_y = self._to_viewport_pixels(glm_x, glm_y)
 
                         self.logger.info(
                             f"GLM-4.5V坐标转换: 千分比({glm_x}, {glm_y}) → 像素({actual_x}, {actual_y})"
                         )
-                        self.logger.info(
-                            f"视口尺寸: {viewport_width}x{viewport_height}"
-                        )
 
                         # 更新坐标
                         agent_action.action.root.x = actual_x
                         agent_action.action.root.y = actual_y
 
+                    await self._wait_for_action_gate()
                     action_result = await self.handler.perform_action(agent_action)
                     actions_taken.append(agent_action)
 
-                    # 获取执行后的新截图
-                    new_screenshot_b64 = await self.handler.get_screenshot_base64()
-
-                    # 检查是否需要继续
+                    # 检查是否需要继续；只有继续执行时才需要执行后的新截图
                     if action_result.get("success", False):
+                        if plan and plan_index < len(plan) - 1:
+                            # 保留对话历史，继续执行计划中的下一步
+                            new_screenshot = await self._get_screenshot()
+                            plan_index += 1
+                            messages.append(
+                                {"role": "assistant", "content": message_content}
+                            )
+                            self._append_user_message(
+                                messages,
+                                f"Step {plan_index + 1}/{len(plan)}: {plan[plan_index]}",
+                                new_screenshot,
+                                allow_delta=True,
+                            )
+                            continue
                         # 如果操作成功且只有一步，可以标记为完成
                         task_completed = True
                     else:
                         # 操作失败，继续尝试
-                        current_input_items = [
-                            {
-                                "role": "user",
-                                "content": [
-                                    {
-                                        "type": "input_text",
-                                        "text": f"Previous action failed: {action_result.get('error', 'Unknown error')}. Please try a different approach.",
-                                    },
-                                    self.format_screenshot(new_screenshot_b64),
-                                ],
-                            }
-                        ]
+                        new_screenshot = await self._get_screenshot()
+                        # 失败后会话被重置，必须发送完整截图
+                        messages = []
+                        self._image_message_indices = []
+                        self._append_user_message(
+                            messages,
+                            f"Previous action failed: {action_result.get('error', 'Unknown error')}. Please try a different approach.",
+                            new_screenshot,
+                        )
                         continue
                 else:
                     # 没有解析到操作，标记为完成
                     task_completed = True
 
                 if task_completed:
-                    return AgentResult(
-                        actions=[act.action for act in actions_taken if act.action],
-                        message=message_content or "Task completed successfully",
-                        completed=True,
-                        usage={
-                            "input_tokens": total_input_tokens,
-                            "output_tokens": total_output_tokens,
-                            "inference_time_ms": total_inference_time_ms,
-                        },
+                    return self._finalize(
+                        actions_taken,
+                        message_content or "Task completed successfully",
+                        True,
+                        usage,
                     )
             else:
                 self.logger.error("No response from GLM API")
-                return AgentResult(
-                    actions=[],
-                    message="No response from GLM API",
-                    completed=True,
-                    usage={
-                        "input_tokens": total_input_tokens,
-                        "output_tokens": total_output_tokens,
-                        "inference_time_ms": total_inference_time_ms,
-                    },
-                )
+                return self._finalize([], "No response from GLM API", True, usage)
 
         self.logger.info("Max steps reached for OpenAI CUA task.", category="agent")
-        usage_obj = {
-            "input_tokens": total_input_tokens,
-            "output_tokens": total_output_tokens,
-            "inference_time_ms": total_inference_time_ms,
-        }
+        return self._finalize(actions_taken, "Max steps reached.", False, usage)
+
+    @staticmethod
+    def _finalize(
+        actions_taken: list[AgentAction],
+        message: str,
+        completed: bool,
+        usage: dict[str, int],
+    ) -> AgentResult:
+        """Build the terminal AgentResult of a run_task call."""
         return AgentResult(
             actions=[act.action for act in actions_taken if act.action],
-            message="Max steps reached.",
-            completed=False,
-            usage=usage_obj,
+            message=message,
+            completed=completed,
+            usage=usage,
         )
 
+    def _to_viewport_pixels(self, x: int, y: int) -> tuple[int, int]:
+        """Convert per-mille model coordinates to viewport pixels."""
+        if self._viewport is None:
+            viewport = self.handler.page.viewport_size
+            self._viewport = (viewport["width"], viewport["height"])
+        width, height = self._viewport
+        return x * width // 1000, y * height // 1000
+
     def _parse_action_from_response(
         self, message_content: str
     ) -> Optional[AgentAction]:
         """解析GLM响应中的操作指令"""
-        import re
-        from ..types.agent import (
-            ClickAction,
-            TypeAction,
-            ScrollAction,
-            WaitAction,
-            AgentActionType,
-        )
-
         if not message_content:
             return None
 
         message_content = message_content.strip()
 
-        # 解析点击指令: "CLICK: x=150, y=200"
-        click_pattern = r"CLICK:\s*x\s*=\s*(\d+)\s*,\s*y\s*=\s*(\d+)"
-        click_match = re.search(click_pattern, message_content, re.IGNORECASE)
-        if click_match:
-            x, y = int(click_match.group(1)), int(click_match.group(2))
+        # 标准指令格式: 单个预编译的交替模式一次扫描，按出现顺序取第一个有效指令后即停止
+        for parsed in iter_actions(message_content):
+            agent_action = self._build_action(parsed)
+            if agent_action:
+                return agent_action
+
+        # 增强解析：处理GLM-4.5V可能的各种响应格式
+
+        # 1. 从自然语言中提取点击坐标
+        for pattern in _NL_COORD_PATTERNS:
+            coord_match = pattern.search(message_content)
+            if coord_match:
+                x, y = int(coord_match.group(1)), int(coord_match.group(2))
+                click_action = ClickAction(type="click", x=x, y=y, button="left")
+                return AgentAction(
+                    action_type="click",
+                    action=AgentActionType(root=click_action),
+                    reasoning=f"Extracted click coordinates from natural language: ({x}, {y})",
+                )
+
+        # 2. 如果GLM返回了描述性文字，尝试智能推断操作
+        # 一次扫描同时判断是否提到了点击和输入操作
+        intents = {m.lastgroup for m in _NL_INTENT_RE.finditer(message_content)}
+        # 检查是否提到了点击操作
+        if "click" in intents:
+            # 这里可以添加更智能的坐标推断逻辑
+            # 暂时返回None，让系统提示GLM返回正确格式
+            self.logger.warning(
+                f"GLM returned descriptive text instead of action command: {message_content}"
+            )
+            self.logger.warning(
+                "Please check if the system prompt is correctly instructing GLM to return action commands"
+            )
+
+        # 3. 检查是否提到了输入操作
+        if "input" in intents:
+            # 尝试提取要输入的文本
+            for pattern in _NL_INPUT_PATTERNS:
+                input_match = pattern.search(message_content)
+                if input_match:
+                    text = input_match.group(1).strip()
+                    type_action = TypeAction(type="type", text=text)
+                    return AgentAction(
+                        action_type="type",
+                        action=AgentActionType(root=type_action),
+                        reasoning=f"Extracted text input from natural language: {text}",
+                    )
+
+        return None
+
+    def _build_action(self, parsed: ParsedAction) -> Optional[AgentAction]:
+        """将解析出的指令转换为AgentAction，参数缺失或非法时返回None"""
+        args = parsed.args
+
+        # 点击指令: "CLICK: x=150, y=200"
+        if parsed.verb == "CLICK":
+            x, y = _int_arg(args, "x"), _int_arg(args, "y")
+            if x is None or y is None:
+                return None
             click_action = ClickAction(type="click", x=x, y=y, button="left")
             return AgentAction(
                 action_type="click",
@@ -525,36 +849,27 @@ class OpenAICUAClient(AgentClient):
                 reasoning=f"Clicking at coordinates ({x}, {y})",
             )
 
-        # 解析输入指令: "TYPE: text=hello world" 或 "TYPE: x=100, y=200, text=hello world"
-        type_pattern_with_coords = (
-            r"TYPE:\s*x\s*=\s*(\d+)\s*,\s*y\s*=\s*(\d+)\s*,\s*text\s*=\s*(.+?)(?:\n|$)"
-        )
-        type_match_with_coords = re.search(
-            type_pattern_with_coords, message_content, re.IGNORECASE
-        )
-        if type_match_with_coords:
-            x, y, text = (
-                int(type_match_with_coords.group(1)),
-                int(type_match_with_coords.group(2)),
-                type_match_with_coords.group(3).strip(),
-            )
+        # 输入指令: "TYPE: text=hello world" 或 "TYPE: x=100, y=200, text=hello world"
+        if parsed.verb == "TYPE":
+            if "text" not in args:
+                return None
+            # 🧹 清理GLM-4.5V响应中的特殊标记
+            clean_text = self._clean_glm_response_text(args["text"])
+            x, y = _int_arg(args, "x"), _int_arg(args, "y")
+            if x is None or y is None:
+                type_action = TypeAction(type="type", text=clean_text)
+                return AgentAction(
+                    action_type="type",
+                    action=AgentActionType(root=type_action),
+                    reasoning=f"Typing text: {clean_text}",
+                )
 
             # 🔧 GLM-4.5V坐标转换：千分比 → 像素坐标
-            viewport = self.handler.page.viewport_size
-            viewport_width = viewport["width"]
-            viewport_height = viewport["height"]
-
-            # GLM-4.5V返回的是千分比坐标，需要转换为实际像素
-            actual_x = int((x / 1000) * viewport_width)
-            actual_y = int((y / 1000) * viewport_height)
-
+            actual_x, actual_y = self._to_viewport_pixels(x, y)
             self.logger.info(
                 f"GLM-4.5V TYPE坐标转换: 千分比({x}, {y}) → 像素({actual_x}, {actual_y})"
             )
 
-            # 🧹 清理GLM-4.5V响应中的特殊标记
-            clean_text = self._clean_glm_response_text(text)
-
             type_action = TypeAction(
                 type="type", text=clean_text, x=actual_x, y=actual_y
             )
@@ -564,28 +879,13 @@ class OpenAICUAClient(AgentClient):
                 reasoning=f"Typing text '{clean_text}' at coordinates ({actual_x}, {actual_y})",
             )
 
-        # 解析简单输入指令: "TYPE: text=hello world" (不带坐标)
-        type_pattern = r"TYPE:\s*text\s*=\s*(.+?)(?:\n|$)"
-        type_match = re.search(type_pattern, message_content, re.IGNORECASE)
-        if type_match:
-            text = type_match.group(1).strip()
-            # 🧹 清理GLM-4.5V响应中的特殊标记
-            clean_text = self._clean_glm_response_text(text)
-
-            type_action = TypeAction(type="type", text=clean_text)
-            return AgentAction(
-                action_type="type",
-                action=AgentActionType(root=type_action),
-                reasoning=f"Typing text: {clean_text}",
-            )
-
-        # 解析滚动指令: "SCROLL: x=500, y=300, scroll_y=-100"
-        scroll_pattern = r"SCROLL:\s*x\s*=\s*(\d+)\s*,\s*y\s*=\s*(\d+)(?:\s*,\s*scroll_x\s*=\s*([+-]?\d+))?\s*(?:\s*,\s*scroll_y\s*=\s*([+-]?\d+))?"
-        scroll_match = re.search(scroll_pattern, message_content, re.IGNORECASE)
-        if scroll_match:
-            x, y = int(scroll_match.group(1)), int(scroll_match.group(2))
-            scroll_x = int(scroll_match.group(3)) if scroll_match.group(3) else 0
-            scroll_y = int(scroll_match.group(4)) if scroll_match.group(4) else 0
+        # 滚动指令: "SCROLL: x=500, y=300, scroll_y=-100"
+        if parsed.verb == "SCROLL":
+            x, y = _int_arg(args, "x"), _int_arg(args, "y")
+            if x is None or y is None:
+                return None
+            scroll_x = _int_arg(args, "scroll_x") or 0
+            scroll_y = _int_arg(args, "scroll_y") or 0
             scroll_action = ScrollAction(
                 type="scroll", x=x, y=y, scroll_x=scroll_x, scroll_y=scroll_y
             )
@@ -595,11 +895,11 @@ class OpenAICUAClient(AgentClient):
                 reasoning=f"Scrolling at ({x}, {y}) with scroll_x={scroll_x}, scroll_y={scroll_y}",
             )
 
-        # 解析等待指令: "WAIT: milliseconds=2000"
-        wait_pattern = r"WAIT:\s*milliseconds\s*=\s*(\d+)"
-        wait_match = re.search(wait_pattern, message_content, re.IGNORECASE)
-        if wait_match:
-            milliseconds = int(wait_match.group(1))
+        # 等待指令: "WAIT: milliseconds=2000"
+        if parsed.verb == "WAIT":
+            milliseconds = _int_arg(args, "milliseconds")
+            if milliseconds is None:
+                return None
             wait_action = WaitAction(type="wait", miliseconds=milliseconds)
             return AgentAction(
                 action_type="wait",
@@ -607,59 +907,19 @@ class OpenAICUAClient(AgentClient):
                 reasoning=f"Waiting for {milliseconds} milliseconds",
             )
 
-        # 增强解析：处理GLM-4.5V可能的各种响应格式
-
-        # 1. 从自然语言中提取点击坐标
-        coord_patterns = [
-            r"(?:点击|click).*?(?:坐标|coordinates?).*?[(\[]?\s*(\d+)\s*[,，]\s*(\d+)\s*[)\]]?",
-            r"[(\[]?\s*(\d+)\s*[,，]\s*(\d+)\s*[)\]]?.*?(?:点击|click)",
-            r"x\s*[:=]\s*(\d+).*?y\s*[:=]\s*(\d+)",
-            r"位置\s*[(\[]?\s*(\d+)\s*[,，]\s*(\d+)\s*[)\]]?",
-        ]
-
-        for pattern in coord_patterns:
-            coord_match = re.search(pattern, message_content, re.IGNORECASE)
-            if coord_match:
-                x, y = int(coord_match.group(1)), int(coord_match.group(2))
-                click_action = ClickAction(type="click", x=x, y=y, button="left")
-                return AgentAction(
-                    action_type="click",
-                    action=AgentActionType(root=click_action),
-                    reasoning=f"Extracted click coordinates from natural language: ({x}, {y})",
-                )
-
-        # 2. 如果GLM返回了描述性文字，尝试智能推断操作
-        # 检查是否提到了点击操作
-        if re.search(r"点击|click", message_content, re.IGNORECASE):
-            # 这里可以添加更智能的坐标推断逻辑
-            # 暂时返回None，让系统提示GLM返回正确格式
-            self.logger.warning(
-                f"GLM returned descriptive text instead of action command: {message_content}"
-            )
-            self.logger.warning(
-                "Please check if the system prompt is correctly instructing GLM to return action commands"
+        # 按键指令: "PRESS: keys=Control+A"
+        if parsed.verb == "PRESS":
+            keys = [key.strip() for key in args.get("keys", "").split("+")]
+            keys = [key for key in keys if key]
+            if not keys:
+                return None
+            keypress_action = KeyPressAction(type="keypress", keys=keys)
+            return AgentAction(
+                action_type="keypress",
+                action=AgentActionType(root=keypress_action),
+                reasoning=f"Pressing keys: {'+'.join(keys)}",
             )
 
-        # 3. 检查是否提到了输入操作
-        if re.search(r"输入|input|type", message_content, re.IGNORECASE):
-            # 尝试提取要输入的文本
-            input_patterns = [
-                r"输入[\"']([^\"']+)[\"']",
-                r"输入\s*[:：]\s*([^\n]+)",
-                r"type\s*[:：]\s*([^\n]+)",
-            ]
-
-            for pattern in input_patterns:
-                input_match = re.search(pattern, message_content, re.IGNORECASE)
-                if input_match:
-                    text = input_match.group(1).strip()
-                    type_action = TypeAction(type="type", text=text)
-                    return AgentAction(
-                        action_type="type",
-                        action=AgentActionType(root=type_action),
-                        reasoning=f"Extracted text input from natural language: {text}",
-                    )
-
         return None
 
     def _clean_glm_response_text(self, text: str) -> str:
@@ -669,19 +929,11 @@ class OpenAICUAClient(AgentClient):
         """
         if not text:
             return text
+        # 绝大多数文本不含标记，直接跳过正则替换
+        if "<|" not in text:
+            return text.strip()
 
-        # 定义需要清理的GLM特殊标记模式
-        glm_markers = [
-            r"<\|end_of_box\|>",
-            r"<\|start_of_box\|>",
-            r"<\|end_of_text\|>",
-            r"<\|start_of_text\|>",
-            r"<\|.*?\|>",  # 通用的GLM标记模式
-        ]
-
-        clean_text = text
-        for pattern in glm_markers:
-            clean_text = re.sub(pattern, "", clean_text, flags=re.IGNORECASE)
+        clean_text = _GLM_MARKER_RE.sub("", text)
 
         # 清理多余的空白字符
         clean_text = clean_text.strip()
@@ -1,3 +1,18 @@
+import base64
+import io
+import re
+from collections.abc import Iterator
+from typing import NamedTuple, Optional, Union
+
+import xxhash
+
+# Pillow is optional; without it screenshots are always sent as full frames
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+
 def sanitize_message(msg: dict) -> dict:
     """Return a copy of the message with image_url omitted for computer_call_output messages."""
     if msg.get("type") == "computer_call_output":
@@ -7,3 +22,137 @@ def sanitize_message(msg: dict) -> dict:
             sanitized["output"] = {**output, "image_url": "[omitted]"}
             return sanitized
     return msg
+
+
+# Text action grammar used by CUA prompts, e.g. "CLICK: x=350, y=200" or
+# "TYPE: x=1, y=2, text=admin". Compiled once at import. A command's
+# arguments end at the end of the line or at the next command on that line.
+_VERB = r"(?<![A-Za-z])(?:CLICK|TYPE|SCROLL|WAIT|PRESS)\s*:"
+_ACTION_RE = re.compile(
+    r"(?<![A-Za-z])(?P<verb>CLICK|TYPE|SCROLL|WAIT|PRESS)\s*:\s*"
+    rf"(?P<args>(?:(?!{_VERB})[^\n])*)",
+    re.IGNORECASE,
+)
+_KV_RE = re.compile(r"(\w+)\s*=\s*([^,]*?)\s*(?=,\s*\w+\s*=|$)")
+# text= is always the last argument of its command (it may contain commas)
+_TEXT_ARG_RE = re.compile(r"(?:^|,)\s*text\s*=\s*", re.IGNORECASE)
+
+
+class ParsedAction(NamedTuple):
+    """A single action command: upper-cased verb plus its raw ``key=value`` args."""
+
+    verb: str
+    args: dict[str, str]
+
+
+def iter_actions(text: str) -> Iterator[ParsedAction]:
+    """Lazily yield action commands in order, so callers can stop at the first usable one."""
+    if not text:
+        return
+    for match in _ACTION_RE.finditer(text):
+        # Drop separators left between this command and a following one
+        args_text = match.group("args").rstrip(" \t,;")
+        args = {}
+        text_match = _TEXT_ARG_RE.search(args_text)
+        if text_match:
+            args["text"] = args_text[text_match.end() :].strip()
+            args_text = args_text[: text_match.start()]
+        for key, value in _KV_RE.findall(args_text):
+            args.setdefault(key.lower(), value)
+        yield ParsedAction(match.group("verb").upper(), args)
+
+
+def parse_actions(text: str) -> list[ParsedAction]:
+    """Parse every action command in a model response, in order of appearance."""
+    return list(iter_actions(text))
+
+
+class ScreenshotTiles(NamedTuple):
+    """Per-tile hashes of a decoded screenshot, in row-major order."""
+
+    size: tuple[int, int]
+    tile_size: int
+    hashes: list[int]
+
+
+def hash_screenshot_tiles(image: "Image.Image", tile_size: int = 16) -> ScreenshotTiles:
+    """Hash every ``tile_size`` x ``tile_size`` tile of an image with xxh3_64."""
+    image = image.convert("RGB")
+    width, height = image.size
+    raw = image.tobytes()
+    stride = width * 3
+    hashes = []
+    for top in range(0, height, tile_size):
+        rows = range(top, min(top + tile_size, height))
+        for left in range(0, width, tile_size):
+            start = left * 3
+            end = min(left + tile_size, width) * 3
+            hasher = xxhash.xxh3_64()
+            for row in rows:
+                offset = row * stride
+                hasher.update(raw[offset + start : offset + end])
+            hashes.append(hasher.intdigest())
+    return ScreenshotTiles((width, height), tile_size, hashes)
+
+
+def changed_tile_box(
+    previous: Optional[ScreenshotTiles],
+    current: ScreenshotTiles,
+    max_changed_ratio: float = 0.5,
+) -> Optional[tuple[int, int, int, int]]:
+    """
+    Return the pixel box ``(left, top, right, bottom)`` bounding all changed tiles.
+
+    Returns ``(0, 0, 0, 0)`` when nothing changed and None when a full frame should be
+    sent instead (no comparable previous frame, or too many tiles changed).
+    """
+    if (
+        previous is None
+        or previous.size != current.size
+        or previous.tile_size != current.tile_size
+    ):
+        return None
+    changed = [
+        index
+        for index, (old, new) in enumerate(zip(previous.hashes, current.hashes))
+        if old != new
+    ]
+    if not changed:
+        return (0, 0, 0, 0)
+    if len(changed) > max_changed_ratio * len(current.hashes):
+        return None
+
+    width, height = current.size
+    tile = current.tile_size
+    columns = -(-width // tile)
+    xs = [index % columns for index in changed]
+    ys = [index // columns for index in changed]
+    return (
+        min(xs) * tile,
+        min(ys) * tile,
+        min((max(xs) + 1) * tile, width),
+        min((max(ys) + 1) * tile, height),
+    )
+
+
+def decode_screenshot(screenshot: Union[bytes, str]) -> "Image.Image":
+    """Open a screenshot given as raw image bytes or a base64 string."""
+    if isinstance(screenshot, str):
+        screenshot = base64.b64decode(screenshot)
+    return Image.open(io.BytesIO(screenshot))
+
+
+def encode_screenshot_region(
+    image: "Image.Image",
+    box: tuple[int, int, int, int],
+    image_format: str = "jpeg",
+    quality: int = 85,
+) -> str:
+    """Crop a region of a screenshot and return it base64-encoded."""
+    region = image.crop(box)
+    output = io.BytesIO()
+    if image_format == "jpeg":
+        region.convert("RGB").save(output, format="JPEG", quality=quality)
+    else:
+        region.save(output, format="PNG")
+    return base64.b64encode(output.getvalue()).decode()
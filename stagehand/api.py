@@ -3,7 +3,7 @@ from datetime import datetime
 from importlib.metadata import PackageNotFoundError, version
 from typing import Any
 
-from .utils import convert_dict_keys_to_camel_case
+from .utils import convert_dict_keys_to_camel_case, json_dumps, json_loads
 
 __all__ = ["_create_session", "_execute"]
 
@@ -125,7 +125,7 @@ async def _execute(self, method: str, payload: dict[str, Any]) -> Any:
         async with self._client.stream(
             "POST",
             f"{self.api_url}/sessions/{self.session_id}/{method}",
-            json=modified_payload,
+            content=json_dumps(modified_payload),
             headers=headers,
         ) as response:
             if response.status_code != 200:
@@ -149,7 +149,7 @@ async def _execute(self, method: str, payload: dict[str, Any]) -> Any:
                     if line.startswith("data: "):
                         line = line[len("data: ") :]
 
-                    message = json.loads(line)
+                    message = json_loads(line)
                     # Handle different message types
                     msg_type = message.get("type")
 
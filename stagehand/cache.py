@@ -3,16 +3,304 @@ Stagehand 缓存管理器
 提供智能缓存功能，减少LLM调用，提升性能
 """
 
+import asyncio
+import atexit
+import base64
+import heapq
+import importlib.util
+import itertools
 import json
-import hashlib
-import time
 import os
-from typing import Optional, Dict, Any, List
-from datetime import datetime, timedelta
-import asyncio
+import queue
+import re
+import threading
+import time
+from array import array
+from collections import OrderedDict, defaultdict
+from collections.abc import Iterator
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Callable, Optional, Union
+
+import xxhash
 
-from .schemas import ObserveResult
 from .logging import StagehandLogger
+from .schemas import ObserveResult
+from .utils import json_dumps, json_loads
+
+# 语义匹配为可选功能：pip install 'stagehand[semantic-cache]'
+try:
+    import hnswlib
+except ImportError:
+    hnswlib = None
+
+SEMANTIC_CACHE_AVAILABLE = (
+    hnswlib is not None
+    and importlib.util.find_spec("sentence_transformers") is not None
+)
+_SEMANTIC_MODEL_NAME = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+
+# 指令向量编码函数：输入文本列表，返回等长的向量列表
+EmbeddingEncoder = Callable[[list[str]], list[list[float]]]
+
+# 搜索索引的分词规则：按非字母数字/非中文字符切分
+_TOKEN_SPLIT_PATTERN = re.compile(r"[^0-9a-z\u4e00-\u9fff]+")
+
+
+def _load_sentence_encoder() -> EmbeddingEncoder:
+    """加载默认的多语言句向量模型（首次调用时才导入，避免拖慢模块加载）"""
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(_SEMANTIC_MODEL_NAME)
+    return lambda texts: model.encode(texts, normalize_embeddings=True).tolist()
+
+
+def _quantize_embedding(vector: list[float]) -> dict[str, Any]:
+    """
+    将向量量化为 int8（每个向量一个缩放系数）用于持久化，体积约为浮点列表的 1/6
+
+    存储格式: {"i8": base64编码的int8字节, "scale": 缩放系数}
+    """
+    scale = max((abs(x) for x in vector), default=0.0) / 127 or 1.0
+    quantized = array("b", (round(x / scale) for x in vector))
+    return {"i8": base64.b64encode(quantized.tobytes()).decode("ascii"), "scale": scale}
+
+
+def _dequantize_embedding(stored: Union[dict[str, Any], list[float]]) -> list[float]:
+    """还原持久化的向量；兼容旧格式（浮点列表）"""
+    if isinstance(stored, dict):
+        scale = stored["scale"]
+        return [x * scale for x in array("b", base64.b64decode(stored["i8"]))]
+    return stored
+
+
+def _normalize_timestamps(cache_item: dict[str, Any]) -> None:
+    """将旧格式的ISO时间字符串就地转换为时间戳（秒），加载时只需转换一次"""
+    for field in ("created_at", "last_used"):
+        value = cache_item.get(field)
+        if isinstance(value, str):
+            try:
+                cache_item[field] = datetime.fromisoformat(value).timestamp()
+            except ValueError:
+                # 无法解析的时间视为已过期
+                cache_item[field] = 0.0
+
+
+@lru_cache(maxsize=256)
+def _cache_key(instruction: str, page_url: str, page_title: str) -> str:
+    """
+    计算缓存key；同一次 observe 会先查询再写入，相同指令在页面上也会反复出现，
+    因此按输入记忆化，省去重复的规范化和哈希
+    """
+    # 以 \x1f（单元分隔符）拼接各字段作为规范字节串，省去 JSON 序列化开销
+    canon = "\x1f".join((instruction.strip().lower(), page_url, page_title)).encode(
+        "utf-8"
+    )
+
+    # 内容寻址缓存无需密码学哈希，xxh3 在短输入上远快于 md5/sha
+    return xxhash.xxh3_128(canon).hexdigest()
+
+
+# 缓存文件格式版本：2.0 起 key 为 xxh3(规范字节串)，1.0 为 md5(JSON)
+_CACHE_FORMAT_VERSION = "2.0"
+
+
+def _rekey_entries(caches: dict[str, Any]) -> dict[str, Any]:
+    """按当前算法重新计算每条记录的key（记录中保存了指令、URL和标题）；缺少字段的记录丢弃"""
+    rekeyed = {}
+    for cache_item in caches.values():
+        try:
+            key = _cache_key(
+                cache_item["instruction"],
+                cache_item["page_url"],
+                cache_item.get("page_title") or "",
+            )
+        except (KeyError, TypeError, AttributeError):
+            continue
+        rekeyed[key] = cache_item
+    return rekeyed
+
+
+class _BackgroundWriter:
+    """
+    后台写盘线程：按提交顺序执行WAL追加和快照写入，使 write/fsync 不阻塞事件循环
+
+    所有缓存实例共用一个线程（每个页面的 ObserveHandler 都会创建缓存实例），
+    线程在首次提交时才启动，退出进程前由 atexit 等待队列写完。
+    连续追加到同一WAL的记录会合并为一次写入和一次 fsync。
+    """
+
+    def __init__(self):
+        self._queue: queue.Queue[tuple[Any, ...]] = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def submit(self, *task: Any) -> None:
+        """提交写盘任务：("append", wal路径, 字节, logger) 或 ("snapshot", 快照路径, wal路径, 字节, logger)"""
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(
+                        target=self._run, name="stagehand-cache-writer", daemon=True
+                    )
+                    self._thread.start()
+                    atexit.register(self.flush)
+        self._queue.put_nowait(task)
+
+    def flush(self) -> None:
+        """阻塞直到已提交的写盘任务全部完成"""
+        if self._thread is not None:
+            self._queue.join()
+
+    def _run(self) -> None:
+        pending = None
+        while True:
+            task = pending or self._queue.get()
+            pending = None
+            done = 1
+            try:
+                if task[0] == "append":
+                    _, wal_path, data, logger = task
+                    chunks = [data]
+                    # 合并队列中紧随其后、写同一WAL的记录
+                    while True:
+                        try:
+                            pending = self._queue.get_nowait()
+                        except queue.Empty:
+                            break
+                        if pending[0] != "append" or pending[1] != wal_path:
+                            break
+                        chunks.append(pending[2])
+                        done += 1
+                        pending = None
+                    self._write_wal(wal_path, b"".join(chunks), logger)
+                else:
+                    _, cache_file, wal_path, data, logger = task
+                    self._write_snapshot(cache_file, wal_path, data, logger)
+            finally:
+                for _ in range(done):
+                    self._queue.task_done()
+
+    @staticmethod
+    def _write_wal(
+        wal_path: str, data: bytes, logger: Optional[StagehandLogger]
+    ) -> None:
+        try:
+            with open(wal_path, "ab") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+        except Exception as e:
+            if logger:
+                logger.error(f"❌ 保存缓存文件失败: {e}")
+
+    @staticmethod
+    def _write_snapshot(
+        cache_file: str, wal_path: str, data: bytes, logger: Optional[StagehandLogger]
+    ) -> None:
+        tmp_path = cache_file + ".tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, cache_file)
+
+            # 快照已包含全部数据，截断WAL（之后提交的记录会追加到截断后的WAL）
+            with open(wal_path, "w", encoding="utf-8"):
+                pass
+            if logger:
+                logger.debug("💾 缓存快照压缩完成")
+        except Exception as e:
+            if logger:
+                logger.error(f"❌ 压缩缓存文件失败: {e}")
+
+
+_writer = _BackgroundWriter()
+
+
+class _CountMinSketch:
+    """
+    Count-Min Sketch：以固定内存近似统计每个key的查询频率（含未命中），供 v-LRU 淘汰参考
+
+    采用 TinyLFU 的老化方式：累计写入达到 10 倍宽度后所有计数减半，使频率反映近期热度。
+    """
+
+    def __init__(self, width: int = 1024, depth: int = 4):
+        self._width = width
+        self._rows = [array("I", bytes(4 * width)) for _ in range(depth)]
+        self._additions = 0
+        self._reset_at = 10 * width
+
+    def _slots(self, key: str) -> Iterator[tuple[array, int]]:
+        data = key.encode("utf-8")
+        for seed, row in enumerate(self._rows):
+            yield row, xxhash.xxh3_64_intdigest(data, seed=seed) % self._width
+
+    def add(self, key: str) -> None:
+        for row, slot in self._slots(key):
+            row[slot] += 1
+        self._additions += 1
+        if self._additions >= self._reset_at:
+            for row in self._rows:
+                for slot in range(self._width):
+                    row[slot] >>= 1
+            self._additions //= 2
+
+    def estimate(self, key: str) -> int:
+        return min(row[slot] for row, slot in self._slots(key))
+
+
+class _SemanticIndex:
+    """基于 HNSW 的指令向量近邻索引（余弦距离）"""
+
+    def __init__(self, encoder: EmbeddingEncoder, capacity: int = 1024):
+        self._encoder = encoder
+        self._capacity = capacity
+        self._index = None  # 首次写入时根据向量维度创建
+        self._labels: dict[str, int] = {}
+        self._keys: dict[int, str] = {}
+        self._next_label = 0
+
+    def encode(self, texts: list[str]) -> list[list[float]]:
+        return [list(vector) for vector in self._encoder(texts)]
+
+    def add(self, cache_key: str, vector: list[float]) -> None:
+        if self._index is None:
+            self._index = hnswlib.Index(space="cosine", dim=len(vector))
+            self._index.init_index(
+                max_elements=self._capacity,
+                ef_construction=100,
+                M=16,
+                allow_replace_deleted=True,
+            )
+            self._index.set_ef(16)
+        self.remove(cache_key)
+        if len(self._labels) >= self._index.get_max_elements():
+            self._index.resize_index(self._index.get_max_elements() * 2)
+
+        label = self._next_label
+        self._next_label += 1
+        self._index.add_items([vector], [label], replace_deleted=True)
+        self._labels[cache_key] = label
+        self._keys[label] = cache_key
+
+    def remove(self, cache_key: str) -> None:
+        label = self._labels.pop(cache_key, None)
+        if label is not None:
+            del self._keys[label]
+            self._index.mark_deleted(label)
+
+    def query(self, vector: list[float], k: int) -> list[tuple[str, float]]:
+        """返回最相近的 k 条 (缓存key, 余弦相似度)，按相似度降序"""
+        k = min(k, len(self._labels))
+        if k == 0:
+            return []
+        labels, distances = self._index.knn_query([vector], k=k)
+        return [
+            (self._keys[int(label)], 1.0 - float(distance))
+            for label, distance in zip(labels[0], distances[0])
+        ]
 
 
 class StagehandCache:
@@ -22,6 +310,11 @@ class StagehandCache:
         self,
         cache_file: str = "stagehand_cache.json",
         logger: Optional[StagehandLogger] = None,
+        max_entries: Optional[int] = 2000,
+        eviction_policy: str = "vlru",
+        semantic_threshold: Optional[float] = None,
+        semantic_encoder: Optional[EmbeddingEncoder] = None,
+        default_ttl: Optional[int] = 3600,
     ):
         """
         初始化缓存管理器
@@ -29,46 +322,439 @@ class StagehandCache:
         Args:
             cache_file: 缓存文件路径
             logger: 日志记录器
+            max_entries: 最大缓存条数，超出时按 (命中次数, 最近访问) 淘汰；None 表示不限制
+            eviction_policy: 超出 max_entries 时的淘汰策略。"vlru"：在最久未访问的 10%
+                记录中淘汰近期查询频率（命中次数 + 频率草图估计）最低的；"lfu"：直接淘汰
+                命中次数最少、最久未访问的记录
+            semantic_threshold: 精确未命中时，同一页面下指令余弦相似度超过该值即视为命中；
+                默认 None（关闭）。相近指令可能指向不同元素（如用户名框与密码框），
+                需按自己的指令集选择阈值后显式开启。依赖未安装时自动关闭
+            semantic_encoder: 自定义指令向量编码函数，默认使用多语言 MiniLM 模型
+            default_ttl: 写入时未指定 ttl 的记录的有效期（秒，默认 1 小时），过期后由
+                清理删除；None 表示这些记录不会自动过期
         """
         self.cache_file = cache_file
         self.logger = logger
-        self.cache_data = self._load_cache()
-        self._memory_cache = {}  # 内存缓存，提升性能
+        self.max_entries = max_entries
+        if eviction_policy not in ("vlru", "lfu"):
+            raise ValueError(f"未知的淘汰策略: {eviction_policy}")
+        self.eviction_policy = eviction_policy
+        self.default_ttl = default_ttl
+        self._sketch = _CountMinSketch() if eviction_policy == "vlru" else None
+        self.semantic_threshold = semantic_threshold
+        self._semantic_encoder = semantic_encoder
+        self._semantic_index: Optional[_SemanticIndex] = None
+        self._semantic_enabled = (
+            semantic_threshold is not None
+            and hnswlib is not None
+            and (semantic_encoder is not None or SEMANTIC_CACHE_AVAILABLE)
+        )
+        # 追加写日志（WAL），每次写入只追加一行，避免整文件重写
+        self._wal_path = cache_file + ".wal"
+        self._wal_records = 0
+        # 缓存文件、搜索索引、访问序号均在首次使用时才加载/构建，
+        # 使创建缓存管理器本身为 O(1)（每个页面的 ObserveHandler 都会创建一个）。
+        # cache_data["caches"] 是唯一的记录存储：按最近访问排序的 OrderedDict（最久未访问在前）
+        self._cache_data: Optional[dict[str, Any]] = None
+        # 最近一次 get_cached_result 命中的key（语义命中时为相近指令的key），未命中为 None
+        self.last_hit_key: Optional[str] = None
+        # 单调递增的访问序号，命中时记录，避免每次命中都调用 datetime.now()
+        self._access_clock: Optional[Iterator[int]] = None
+
+        # 搜索索引：分词倒排索引 + 字符3-gram索引（用于子串查询）
+        self._search_text: dict[str, str] = {}
+        self._token_index: dict[str, set[str]] = defaultdict(set)
+        self._gram_index: dict[str, set[str]] = defaultdict(set)
+        self._index_built = False
+        # 命中过的记录对应的 ObserveResult 对象，避免每次命中都重新构造和校验模型；
+        # 只存在于内存中，持久化的记录仍是字典
+        self._result_objects: dict[str, ObserveResult] = {}
+        # 按过期时间排序的最小堆 (expires_at, key)，过期清理只需弹出堆顶；
+        # 删除或重新写入的记录在弹出时按 expires_at 比对后丢弃（惰性删除）
+        self._expiry_heap: Optional[list[tuple[float, str]]] = None
+
+    @property
+    def cache_data(self) -> dict[str, Any]:
+        """缓存数据（首次访问时加载快照并重放WAL）"""
+        if self._cache_data is None:
+            self._cache_data = self._load_cache()
+        return self._cache_data
 
-    def _load_cache(self) -> Dict[str, Any]:
-        """加载缓存文件"""
+    @cache_data.setter
+    def cache_data(self, value: dict[str, Any]) -> None:
+        value["caches"] = self._recency_ordered(value.get("caches", {}))
+        self._cache_data = value
+        self._access_clock = None
+        self._build_index()
+
+    def _next_access_seq(self) -> int:
+        """返回下一个访问序号，首次调用时从已有记录的最大序号继续"""
+        if self._access_clock is None:
+            last_seq = max(
+                (
+                    item.get("access_seq", 0)
+                    for item in self.cache_data["caches"].values()
+                ),
+                default=0,
+            )
+            self._access_clock = itertools.count(last_seq + 1)
+        return next(self._access_clock)
+
+    def _load_cache(self) -> dict[str, Any]:
+        """加载缓存文件：先读取快照，再重放WAL"""
+        # 同一进程内的其他实例可能还有尚未落盘的写入
+        _writer.flush()
+        data = None
         try:
             if os.path.exists(self.cache_file):
-                with open(self.cache_file, "r", encoding="utf-8") as f:
-                    data = json.load(f)
+                with open(self.cache_file, "rb") as f:
+                    data = json_loads(f.read())
                     if self.logger:
                         self.logger.info(
                             f"✅ 加载缓存文件成功，包含 {len(data.get('caches', {}))} 条记录"
                         )
-                    return data
         except Exception as e:
             if self.logger:
-                self.logger.warning(f"⚠️ 加载缓存文件失败: {e}")
+                self.logger.error(f"⚠️ 加载缓存文件失败: {e}")
 
-        # 返回默认缓存结构
-        return {
-            "version": "1.0",
-            "created_at": datetime.now().isoformat(),
-            "caches": {},
-        }
+        if data is None:
+            # 默认缓存结构
+            data = {
+                "version": _CACHE_FORMAT_VERSION,
+                "created_at": datetime.now().isoformat(),
+                "caches": {},
+            }
+        data.setdefault("caches", {})
+
+        self._replay_wal(data["caches"])
+        for cache_item in data["caches"].values():
+            _normalize_timestamps(cache_item)
+        if data.get("version") != _CACHE_FORMAT_VERSION:
+            self._migrate(data)
+        data["caches"] = self._recency_ordered(data["caches"])
+        return data
+
+    def _migrate(self, data: dict[str, Any]) -> None:
+        """
+        将旧版本缓存迁移到当前格式：按当前算法重新计算key，并立即写入新快照
 
-    def _save_cache(self) -> None:
-        """保存缓存到文件"""
+        旧key（md5）永远不会再被查询到，不迁移的话这些记录只会占用容量直到被淘汰
+        """
+        old_count = len(data["caches"])
+        data["caches"] = _rekey_entries(data["caches"])
+        data["version"] = _CACHE_FORMAT_VERSION
+        if self.logger:
+            self.logger.info(
+                f"🔄 缓存已迁移到 {_CACHE_FORMAT_VERSION} 格式，保留 "
+                f"{len(data['caches'])}/{old_count} 条记录"
+            )
         try:
-            self.cache_data["last_updated"] = datetime.now().isoformat()
-            with open(self.cache_file, "w", encoding="utf-8") as f:
-                json.dump(self.cache_data, f, ensure_ascii=False, indent=2)
+            snapshot = json_dumps(data)
+        except Exception as e:
+            if self.logger:
+                self.logger.error(f"❌ 压缩缓存文件失败: {e}")
+            return
+        _writer.submit(
+            "snapshot", self.cache_file, self._wal_path, snapshot, self.logger
+        )
+        self._wal_records = 0
+
+    @staticmethod
+    def _recency_ordered(caches: dict[str, Any]) -> "OrderedDict[str, dict[str, Any]]":
+        """按访问序号重建 OrderedDict，恢复上次运行时的 LRU 顺序"""
+        return OrderedDict(
+            sorted(caches.items(), key=lambda kv: kv[1].get("access_seq", 0))
+        )
+
+    def _replay_wal(self, caches: dict[str, Any]) -> None:
+        """将WAL中的操作按顺序重放到缓存字典上"""
+        if not os.path.exists(self._wal_path):
+            return
+
+        try:
+            with open(self._wal_path, "rb") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        record = json_loads(line)
+                    except json.JSONDecodeError:
+                        # 进程崩溃可能留下半行记录，直接跳过
+                        continue
+
+                    op = record.get("op")
+                    if op == "put":
+                        caches[record["key"]] = record["value"]
+                    elif op == "del":
+                        caches.pop(record["key"], None)
+                    elif op == "hit":
+                        cache_item = caches.get(record["key"])
+                        if cache_item is not None:
+                            cache_item["hit_count"] = record["hit_count"]
+                            cache_item["access_seq"] = record["access_seq"]
+                    elif op == "clear":
+                        caches.clear()
+                    self._wal_records += 1
+        except Exception as e:
             if self.logger:
-                self.logger.debug("💾 缓存文件保存成功")
+                self.logger.error(f"⚠️ 重放缓存WAL失败: {e}")
+            return
+
+        if self.logger and self._wal_records:
+            self.logger.debug(f"📜 已重放 {self._wal_records} 条缓存WAL记录")
+
+    def _append_wal(self, *records: dict[str, Any]) -> None:
+        """
+        向WAL追加记录，超过阈值时触发压缩
+
+        记录在调用线程中立即序列化（之后的命中统计不会影响已提交的内容），
+        写入和 fsync 交给后台线程完成，调用方无需等待磁盘。
+        """
+        data = b"".join(json_dumps(record) + b"\n" for record in records)
+        _writer.submit("append", self._wal_path, data, self.logger)
+        self._wal_records += len(records)
+
+        threshold = max(1024, len(self.cache_data.get("caches", {})) // 4)
+        if self._wal_records > threshold:
+            self._submit_snapshot()
+
+    def _save_cache(self, cache_key: Optional[str] = None, op: str = "put") -> None:
+        """
+        保存缓存
+
+        指定 cache_key 时只向WAL追加一条记录（O(1)写入）；
+        未指定时退化为完整快照写入，等价于 compact()。
+
+        Args:
+            cache_key: 发生变化的缓存key
+            op: 操作类型，"put"、"del" 或 "hit"（只记录命中次数和访问序号）
+        """
+        if cache_key is None:
+            self.compact()
+            return
+
+        try:
+            record = {"op": op, "key": cache_key}
+            if op == "put":
+                record["value"] = self.cache_data["caches"][cache_key]
+            elif op == "hit":
+                cache_item = self.cache_data["caches"][cache_key]
+                record["hit_count"] = cache_item["hit_count"]
+                record["access_seq"] = cache_item["access_seq"]
+            self._append_wal(record)
+            if self.logger:
+                self.logger.debug("💾 缓存WAL已提交写入")
         except Exception as e:
             if self.logger:
                 self.logger.error(f"❌ 保存缓存文件失败: {e}")
 
+    def _submit_snapshot(self) -> None:
+        """序列化当前缓存并交给后台线程写入快照、截断WAL，不等待写盘完成"""
+        try:
+            self.cache_data["last_updated"] = datetime.now().isoformat()
+            # 快照只供程序读取，不缩进（缩进约使写入字节数翻倍）
+            data = json_dumps(self.cache_data)
+        except Exception as e:
+            if self.logger:
+                self.logger.error(f"❌ 压缩缓存文件失败: {e}")
+            return
+        _writer.submit("snapshot", self.cache_file, self._wal_path, data, self.logger)
+        self._wal_records = 0
+
+    def compact(self) -> None:
+        """将内存中的缓存原子写入快照文件，并清空WAL（等待写盘完成）"""
+        self._submit_snapshot()
+        self.flush()
+
+    def flush(self) -> None:
+        """等待所有已提交的缓存写入落盘"""
+        _writer.flush()
+
+    @staticmethod
+    def _trigrams(text: str) -> set[str]:
+        """返回文本的所有字符3-gram"""
+        return {text[i : i + 3] for i in range(len(text) - 2)}
+
+    def _build_index(self) -> None:
+        """丢弃现有搜索索引，下次搜索时按当前缓存数据重建"""
+        # 语义索引同样在下次使用时按需重建
+        self._semantic_index = None
+        self._result_objects.clear()
+        self._expiry_heap = None
+        self._search_text.clear()
+        self._token_index.clear()
+        self._gram_index.clear()
+        self._index_built = False
+
+    def _ensure_index(self) -> None:
+        """首次搜索时构建搜索索引"""
+        if self._index_built:
+            return
+        self._index_built = True
+        for cache_key, cache_item in self.cache_data.get("caches", {}).items():
+            self._index_entry(cache_key, cache_item)
+
+    def _index_entry(self, cache_key: str, cache_item: dict[str, Any]) -> None:
+        """将一条缓存记录加入搜索索引（字段只转小写一次）"""
+        if not self._index_built:
+            # 索引尚未构建，构建时会包含这条记录
+            return
+        self._unindex_entry(cache_key)
+        text = "\n".join(
+            (
+                cache_item.get("instruction", "") or "",
+                cache_item.get("page_url", "") or "",
+                cache_item.get("result", {}).get("description", "") or "",
+            )
+        ).lower()
+        self._search_text[cache_key] = text
+        for token in _TOKEN_SPLIT_PATTERN.split(text):
+            if token:
+                self._token_index[token].add(cache_key)
+        for gram in self._trigrams(text):
+            self._gram_index[gram].add(cache_key)
+
+    def _unindex_entry(self, cache_key: str) -> None:
+        """从搜索索引（及结果对象缓存）中移除一条缓存记录"""
+        self._result_objects.pop(cache_key, None)
+        if self._semantic_index is not None:
+            self._semantic_index.remove(cache_key)
+        text = self._search_text.pop(cache_key, None)
+        if text is None:
+            return
+        for index, terms in (
+            (self._token_index, _TOKEN_SPLIT_PATTERN.split(text)),
+            (self._gram_index, self._trigrams(text)),
+        ):
+            for term in terms:
+                keys = index.get(term)
+                if keys is not None:
+                    keys.discard(cache_key)
+                    if not keys:
+                        del index[term]
+
+    def search(self, keyword: str) -> list[tuple[str, dict[str, Any]]]:
+        """
+        搜索指令、页面URL或描述中包含关键词的缓存记录
+
+        Args:
+            keyword: 搜索关键词（不区分大小写）
+
+        Returns:
+            (缓存key, 缓存记录) 列表
+        """
+        return list(self.iter_search(keyword))
+
+    def iter_search(self, keyword: str) -> Iterator[tuple[str, dict[str, Any]]]:
+        """
+        逐条产出匹配关键词的缓存记录，调用方可边查边处理，无需一次性物化结果
+
+        Args:
+            keyword: 搜索关键词（不区分大小写）
+
+        Yields:
+            (缓存key, 缓存记录)
+        """
+        caches = self.cache_data.get("caches", {})
+        keyword = keyword.lower()
+        if not keyword:
+            yield from caches.items()
+            return
+        self._ensure_index()
+
+        # 完整分词直接命中
+        hits = set(self._token_index.get(keyword, ()))
+
+        # 子串查询：先用3-gram求交集缩小候选范围，再逐条确认
+        if len(keyword) >= 3:
+            posting_lists = sorted(
+                (self._gram_index.get(gram, set()) for gram in self._trigrams(keyword)),
+                key=len,
+            )
+            candidates = set.intersection(*posting_lists)
+        else:
+            candidates = self._search_text.keys()
+        hits.update(key for key in candidates if keyword in self._search_text[key])
+
+        for key in hits:
+            if key in caches:
+                yield key, caches[key]
+
+    def _get_semantic_index(self) -> Optional[_SemanticIndex]:
+        """按需构建语义索引；缺少向量的记录批量编码后补写向量"""
+        if not self._semantic_enabled:
+            return None
+        if self._semantic_index is not None:
+            return self._semantic_index
+
+        try:
+            encoder = self._semantic_encoder or _load_sentence_encoder()
+            index = _SemanticIndex(encoder)
+            caches = self.cache_data.get("caches", {})
+            missing = [key for key, item in caches.items() if "embedding" not in item]
+            if missing:
+                vectors = index.encode([caches[key]["instruction"] for key in missing])
+                for key, vector in zip(missing, vectors):
+                    caches[key]["embedding"] = _quantize_embedding(vector)
+            # 索引中使用反量化后的向量（只在构建索引时反量化一次）
+            for key, item in caches.items():
+                index.add(key, _dequantize_embedding(item["embedding"]))
+        except Exception as e:
+            if self.logger:
+                self.logger.error(f"⚠️ 语义索引初始化失败，已关闭语义匹配: {e}")
+            self._semantic_enabled = False
+            return None
+
+        self._semantic_index = index
+        return index
+
+    async def load_semantic_encoder(self) -> None:
+        """
+        在线程中加载默认句向量模型，避免首次语义匹配时在事件循环中同步加载（耗时数秒）
+
+        未开启语义匹配或已提供编码函数时不做任何事
+        """
+        if not self._semantic_enabled or self._semantic_encoder is not None:
+            return
+        try:
+            self._semantic_encoder = await asyncio.to_thread(_load_sentence_encoder)
+        except Exception as e:
+            if self.logger:
+                self.logger.error(f"⚠️ 语义模型加载失败，已关闭语义匹配: {e}")
+            self._semantic_enabled = False
+
+    def semantic_search(
+        self, query: str, top_k: int = 5, page_url: Optional[str] = None
+    ) -> list[tuple[str, dict[str, Any], float]]:
+        """
+        按语义相似度搜索缓存指令
+
+        Args:
+            query: 查询文本
+            top_k: 最多返回的记录数
+            page_url: 只返回该页面的记录（可选）
+
+        Returns:
+            (缓存key, 缓存记录, 余弦相似度) 列表，按相似度降序；语义匹配不可用时为空
+        """
+        index = self._get_semantic_index()
+        if index is None:
+            return []
+
+        caches = self.cache_data.get("caches", {})
+        # 需要按页面过滤时多取一些候选
+        k = top_k if page_url is None else top_k * 8
+        matches = []
+        for key, similarity in index.query(index.encode([query])[0], k):
+            item = caches.get(key)
+            if item is None or (page_url is not None and item["page_url"] != page_url):
+                continue
+            matches.append((key, item, similarity))
+            if len(matches) >= top_k:
+                break
+        return matches
+
     def _generate_cache_key(
         self, instruction: str, page_url: str, page_title: str = None
     ) -> str:
@@ -83,16 +769,7 @@ class StagehandCache:
         Returns:
             缓存key的哈希值
         """
-        # 创建复合key
-        key_components = {
-            "instruction": instruction.strip().lower(),
-            "page_url": page_url,
-            "page_title": page_title or "",
-        }
-
-        # 生成哈希
-        key_string = json.dumps(key_components, sort_keys=True, ensure_ascii=False)
-        return hashlib.md5(key_string.encode("utf-8")).hexdigest()
+        return _cache_key(instruction, page_url, page_title or "")
 
     def get_cached_result(
         self, instruction: str, page_url: str, page_title: str = None, ttl: int = 3600
@@ -104,40 +781,53 @@ class StagehandCache:
             instruction: 用户指令
             page_url: 页面URL
             page_title: 页面标题
-            ttl: 缓存生存时间（秒）
+            ttl: 本次查询可接受的最大缓存年龄（秒）；只影响本次是否命中，
+                不会删除其他调用方按更长有效期写入的记录
 
         Returns:
             缓存的ObserveResult或None
         """
         cache_key = self._generate_cache_key(instruction, page_url, page_title)
+        if self._sketch is not None:
+            self._sketch.add(cache_key)
 
-        # 先检查内存缓存
-        if cache_key in self._memory_cache:
-            cached_item = self._memory_cache[cache_key]
-            if self._is_cache_valid(cached_item, ttl):
-                if self.logger:
-                    self.logger.info(f"🚀 内存缓存命中: {instruction[:50]}...")
-                self._update_cache_stats(cache_key, hit=True)
-                return self._create_observe_result_from_cache(cached_item["result"])
+        self.last_hit_key = None
+        # 顺带清理少量超过各自有效期的记录，避免过期记录长期堆积
+        for key in self._pop_expired(max_pops=2):
+            self._save_cache(key, op="del")
 
-        # 检查文件缓存
-        caches = self.cache_data.get("caches", {})
-        if cache_key in caches:
-            cached_item = caches[cache_key]
+        caches = self.cache_data["caches"]
+        cached_item = caches.get(cache_key)
+        if cached_item is not None:
             if self._is_cache_valid(cached_item, ttl):
                 if self.logger:
-                    self.logger.info(f"📁 文件缓存命中: {instruction[:50]}...")
-
-                # 加载到内存缓存
-                self._memory_cache[cache_key] = cached_item
+                    self.logger.info(f"🚀 缓存命中: {instruction[:50]}...")
+                self.last_hit_key = cache_key
                 self._update_cache_stats(cache_key, hit=True)
-                return self._create_observe_result_from_cache(cached_item["result"])
-            else:
-                # 缓存过期，删除
+                return self._cached_result(cache_key, cached_item)
+            elif self._is_expired(cached_item, time.time()):
+                # 超过写入时的有效期，删除
                 if self.logger:
                     self.logger.info(f"⏰ 缓存过期，删除: {instruction[:50]}...")
                 del caches[cache_key]
-                self._save_cache()
+                self._unindex_entry(cache_key)
+                self._save_cache(cache_key, op="del")
+
+        # 精确未命中时，尝试同一页面下语义相近的指令
+        for key, cached_item, similarity in self.semantic_search(
+            instruction, top_k=1, page_url=page_url
+        ):
+            if similarity > self.semantic_threshold and self._is_cache_valid(
+                cached_item, ttl
+            ):
+                if self.logger:
+                    self.logger.info(
+                        f"🧠 语义缓存命中 (相似度 {similarity:.3f}): "
+                        f"{instruction[:50]} ≈ {cached_item['instruction'][:50]}"
+                    )
+                self.last_hit_key = key
+                self._update_cache_stats(key, hit=True)
+                return self._cached_result(key, cached_item)
 
         if self.logger:
             self.logger.debug(f"❌ 缓存未命中: {instruction[:50]}...")
@@ -149,6 +839,7 @@ class StagehandCache:
         page_url: str,
         result: ObserveResult,
         page_title: str = None,
+        ttl: Optional[int] = None,
     ) -> None:
         """
         设置缓存
@@ -158,9 +849,11 @@ class StagehandCache:
             page_url: 页面URL
             result: ObserveResult结果
             page_title: 页面标题
+            ttl: 记录的有效期（秒），过期后由清理删除；默认使用 default_ttl
         """
         cache_key = self._generate_cache_key(instruction, page_url, page_title)
 
+        now = time.time()
         cache_item = {
             "instruction": instruction,
             "page_url": page_url,
@@ -172,32 +865,215 @@ class StagehandCache:
                 "arguments": result.arguments,
                 "backend_node_id": result.backend_node_id,
             },
-            "created_at": datetime.now().isoformat(),
-            "last_used": datetime.now().isoformat(),
+            # 时间以时间戳（秒）存储，有效期检查只需一次减法比较
+            "created_at": now,
+            "last_used": now,
             "hit_count": 0,
+            "access_seq": self._next_access_seq(),
         }
+        if ttl is not None:
+            cache_item["ttl"] = ttl
 
-        # 保存到内存和文件缓存
-        self._memory_cache[cache_key] = cache_item
-        self.cache_data["caches"][cache_key] = cache_item
-        self._save_cache()
+        # 写入存储并标记为最近使用，再追加到WAL
+        caches = self.cache_data["caches"]
+        caches[cache_key] = cache_item
+        caches.move_to_end(cache_key)
+        self._push_expiry(cache_key, cache_item)
+        self._index_entry(cache_key, cache_item)
+        # 调用方可能修改返回的结果（如替换变量），保存副本
+        self._result_objects[cache_key] = result.model_copy()
+        # 首次构建语义索引时会顺带编码本条记录，已有向量则无需重复编码
+        semantic_index = self._get_semantic_index()
+        if semantic_index is not None and "embedding" not in cache_item:
+            vector = semantic_index.encode([instruction])[0]
+            cache_item["embedding"] = _quantize_embedding(vector)
+            semantic_index.add(cache_key, vector)
+        self._save_cache(cache_key)
+        self._evict_if_needed(keep_key=cache_key)
 
         if self.logger:
             self.logger.info(f"💾 缓存已保存: {instruction[:50]}...")
 
-    def _is_cache_valid(self, cached_item: Dict[str, Any], ttl: int) -> bool:
+    def invalidate(self, cache_key: str) -> bool:
+        """
+        删除一条缓存记录（如缓存的元素已无法操作）
+
+        Args:
+            cache_key: 缓存key
+
+        Returns:
+            记录是否存在
+        """
+        caches = self.cache_data["caches"]
+        if caches.pop(cache_key, None) is None:
+            return False
+        self._unindex_entry(cache_key)
+        self._save_cache(cache_key, op="del")
+        return True
+
+    def merge_entries(self, entries: dict[str, dict[str, Any]]) -> int:
+        """
+        合并外部缓存记录（如导入文件），已存在的key保持不变
+
+        记录的key按当前算法重新计算，旧版本导出的文件同样可以导入
+
+        Args:
+            entries: 缓存key到缓存记录的映射
+
+        Returns:
+            新增的缓存数量
+        """
+        entries = _rekey_entries(entries)
+        caches = self.cache_data["caches"]
+        new_keys = entries.keys() - caches.keys()
+        if not new_keys:
+            return 0
+
+        caches.update((key, entries[key]) for key in new_keys)
+        for key in new_keys:
+            _normalize_timestamps(caches[key])
+            self._index_entry(key, caches[key])
+            self._push_expiry(key, caches[key])
+        # 导入的记录可能没有向量，语义索引下次使用时重建并补齐
+        self._semantic_index = None
+        try:
+            self._append_wal(
+                *({"op": "put", "key": key, "value": caches[key]} for key in new_keys)
+            )
+        except Exception as e:
+            if self.logger:
+                self.logger.error(f"❌ 保存缓存文件失败: {e}")
+        self._evict_if_needed()
+        return len(new_keys)
+
+    def _evict_if_needed(self, keep_key: Optional[str] = None) -> int:
+        """
+        缓存条数超过 max_entries 时，淘汰命中次数最少、最久未访问的记录
+
+        Args:
+            keep_key: 不参与淘汰的key（通常是刚写入的记录）
+
+        Returns:
+            淘汰的缓存数量
+        """
+        caches = self.cache_data.get("caches", {})
+        if self.max_entries is None or len(caches) <= self.max_entries:
+            return 0
+
+        excess = len(caches) - self.max_entries
+        # 惰性遍历候选记录（记录按最近访问排序，最久未访问的在前），不构建完整列表
+        candidates = (key for key in caches if key != keep_key)
+        if self._sketch is not None:
+            # v-LRU：只在最久未访问的一段记录中挑选，避免刚被访问的记录被淘汰；
+            # 频率同时参考命中次数和查询草图，防止历史热点记录长期占位
+            window = list(itertools.islice(candidates, max(excess, len(caches) // 10)))
+            if len(window) <= excess:
+                # 窗口只有 excess 条时无需比较，直接淘汰最久未访问的这些记录
+                victims = window
+            else:
+                victims = heapq.nsmallest(
+                    excess,
+                    window,
+                    key=lambda key: (
+                        caches[key].get("hit_count", 0) + self._sketch.estimate(key),
+                        caches[key].get("access_seq", 0),
+                    ),
+                )
+        else:
+            victims = heapq.nsmallest(
+                excess,
+                candidates,
+                key=lambda key: (
+                    caches[key].get("hit_count", 0),
+                    caches[key].get("access_seq", 0),
+                ),
+            )
+        for key in victims:
+            del caches[key]
+            self._unindex_entry(key)
+            self._save_cache(key, op="del")
+
+        if self.logger and victims:
+            self.logger.debug(f"🧹 缓存超出上限，已淘汰 {len(victims)} 条记录")
+        return len(victims)
+
+    def _expires_at(self, cache_item: dict[str, Any]) -> Optional[float]:
+        """记录自身的过期时间：写入时的 ttl，否则为 default_ttl；都没有时不过期"""
+        ttl = cache_item.get("ttl", self.default_ttl)
+        if ttl is None:
+            return None
+        return cache_item.get("created_at", 0.0) + ttl
+
+    def _is_expired(self, cache_item: dict[str, Any], now: float) -> bool:
+        """记录是否已超过自身的有效期"""
+        expires_at = self._expires_at(cache_item)
+        return expires_at is not None and expires_at <= now
+
+    def _push_expiry(self, cache_key: str, cache_item: dict[str, Any]) -> None:
+        """记录新写入的记录；堆尚未构建时无需处理（构建时会包含全部记录）"""
+        heap = self._expiry_heap
+        expires_at = self._expires_at(cache_item)
+        if heap is None or expires_at is None:
+            return
+        heapq.heappush(heap, (expires_at, cache_key))
+        # 陈旧项过多时丢弃整个堆，下次使用时重建
+        if len(heap) > 2 * len(self.cache_data["caches"]) + 64:
+            self._expiry_heap = None
+
+    def _pop_expired(self, max_pops: Optional[int] = None) -> list[str]:
+        """
+        从存储中删除超过自身有效期的记录（不写WAL，由调用方负责持久化）
+
+        Args:
+            max_pops: 最多弹出的堆项数，None 表示清理全部过期记录
+
+        Returns:
+            被删除的缓存key
+        """
+        caches = self.cache_data["caches"]
+        if self._expiry_heap is None:
+            entries = ((self._expires_at(item), key) for key, item in caches.items())
+            self._expiry_heap = [entry for entry in entries if entry[0] is not None]
+            heapq.heapify(self._expiry_heap)
+
+        heap = self._expiry_heap
+        now = time.time()
+        expired = []
+        pops = 0
+        while heap and heap[0][0] <= now and (max_pops is None or pops < max_pops):
+            expires_at, key = heapq.heappop(heap)
+            pops += 1
+            item = caches.get(key)
+            if item is None or self._expires_at(item) != expires_at:
+                # 已删除或已重新写入
+                continue
+            del caches[key]
+            self._unindex_entry(key)
+            expired.append(key)
+        return expired
+
+    def _is_cache_valid(self, cached_item: dict[str, Any], ttl: int) -> bool:
         """检查缓存是否有效"""
         try:
-            created_at = datetime.fromisoformat(cached_item["created_at"])
-            return datetime.now() - created_at < timedelta(seconds=ttl)
-        except:
+            return time.time() - cached_item["created_at"] < ttl
+        except (KeyError, TypeError):
             return False
 
+    def _cached_result(
+        self, cache_key: str, cached_item: dict[str, Any]
+    ) -> ObserveResult:
+        """返回命中记录的 ObserveResult：首次命中时从字典构造，之后只做浅拷贝（不重新校验）"""
+        result = self._result_objects.get(cache_key)
+        if result is None:
+            result = self._create_observe_result_from_cache(cached_item["result"])
+            self._result_objects[cache_key] = result
+        return result.model_copy()
+
     def _create_observe_result_from_cache(
-        self, cached_result: Dict[str, Any]
+        self, cached_result: dict[str, Any]
     ) -> ObserveResult:
-        """从缓存数据创建ObserveResult对象"""
-        return ObserveResult(
+        """从缓存数据创建ObserveResult对象（写入缓存时已校验过，跳过 pydantic 校验）"""
+        return ObserveResult.model_construct(
             selector=cached_result["selector"],
             description=cached_result["description"],
             method=cached_result.get("method"),
@@ -206,19 +1082,18 @@ class StagehandCache:
         )
 
     def _update_cache_stats(self, cache_key: str, hit: bool = True) -> None:
-        """更新缓存统计信息"""
-        # 更新内存缓存统计
-        if cache_key in self._memory_cache:
-            if hit:
-                self._memory_cache[cache_key]["hit_count"] += 1
-                self._memory_cache[cache_key]["last_used"] = datetime.now().isoformat()
-
-        # 更新文件缓存统计
-        caches = self.cache_data.get("caches", {})
-        if cache_key in caches:
-            if hit:
-                caches[cache_key]["hit_count"] += 1
-                caches[cache_key]["last_used"] = datetime.now().isoformat()
+        """
+        更新缓存统计信息，命中时移到 LRU 队尾
+
+        命中次数和访问序号决定淘汰顺序，因此同样写入WAL（只含这两个字段），
+        重新加载后统计和 LRU 顺序不会丢失；连续的记录由后台线程合并写盘
+        """
+        caches = self.cache_data["caches"]
+        if hit and cache_key in caches:
+            caches[cache_key]["hit_count"] += 1
+            caches[cache_key]["access_seq"] = self._next_access_seq()
+            caches.move_to_end(cache_key)
+            self._save_cache(cache_key, op="hit")
 
     async def validate_cached_xpath(self, page, xpath: str) -> bool:
         """
@@ -247,30 +1122,29 @@ class StagehandCache:
                 self.logger.debug(f"XPath验证失败: {xpath}, 错误: {e}")
             return False
 
-    def get_cache_stats(self) -> Dict[str, Any]:
+    def get_cache_stats(self) -> dict[str, Any]:
         """获取缓存统计信息"""
         caches = self.cache_data.get("caches", {})
         total_caches = len(caches)
         total_hits = sum(cache.get("hit_count", 0) for cache in caches.values())
 
-        # 计算内存缓存大小
-        memory_cache_size = len(self._memory_cache)
-
         return {
             "total_caches": total_caches,
             "total_hits": total_hits,
-            "memory_cache_size": memory_cache_size,
+            # 所有记录都常驻内存，单一存储
+            "memory_cache_size": total_caches,
             "cache_file": self.cache_file,
             "version": self.cache_data.get("version", "unknown"),
         }
 
-    def clear_cache(self, expired_only: bool = False, ttl: int = 3600) -> int:
+    def clear_cache(self, expired_only: bool = False, ttl: Optional[int] = None) -> int:
         """
         清理缓存
 
         Args:
             expired_only: 是否只清理过期的缓存
-            ttl: 过期时间（秒）
+            ttl: 指定时清理创建时间超过该值（秒）的全部记录；
+                None 表示按每条记录自身的有效期清理
 
         Returns:
             清理的缓存数量
@@ -278,26 +1152,30 @@ class StagehandCache:
         cleared_count = 0
         caches = self.cache_data.get("caches", {})
 
-        if expired_only:
-            # 只清理过期缓存
-            expired_keys = []
-            for key, cached_item in caches.items():
-                if not self._is_cache_valid(cached_item, ttl):
-                    expired_keys.append(key)
-
-            for key in expired_keys:
+        if expired_only and ttl is None:
+            # 按过期时间从堆顶弹出，不扫描未过期的记录
+            cleared_count = len(self._pop_expired())
+        elif expired_only:
+            # 显式的年龄上限与各记录的有效期无关，需要扫描全部记录
+            cutoff = time.time() - ttl
+            stale = [
+                key
+                for key, item in caches.items()
+                if item.get("created_at", 0.0) <= cutoff
+            ]
+            for key in stale:
                 del caches[key]
-                if key in self._memory_cache:
-                    del self._memory_cache[key]
-                cleared_count += 1
+                self._unindex_entry(key)
+            cleared_count = len(stale)
         else:
             # 清理所有缓存
             cleared_count = len(caches)
             caches.clear()
-            self._memory_cache.clear()
+            self._build_index()
 
         if cleared_count > 0:
-            self._save_cache()
+            # 清理会显著缩小缓存，直接重写快照
+            self._submit_snapshot()
             if self.logger:
                 self.logger.info(f"🧹 已清理 {cleared_count} 条缓存记录")
 
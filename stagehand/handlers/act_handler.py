@@ -126,6 +126,21 @@ class ActHandler:
                 self.logger.error(
                     message=f"{str(e)}",
                 )
+                # Cached selectors are not re-validated on hit; if the element came
+                # from the cache, drop the stale entry and observe the page again
+                if (
+                    use_cache
+                    and self.stagehand_page._observe_handler.invalidate_cached_result(
+                        observe_options.instruction
+                    )
+                ):
+                    self.logger.info(
+                        "Cached element failed, invalidating cache and re-observing",
+                        category="act",
+                    )
+                    return await self.act(
+                        options, use_cache=use_cache, cache_ttl=cache_ttl
+                    )
                 return ActResult(
                     success=False,
                     message=f"Failed to perform act: {str(e)}",
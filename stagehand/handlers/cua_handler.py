@@ -1,5 +1,6 @@
 import asyncio
 import base64
+import io
 from typing import Any, Optional
 
 from ..types.agent import (
@@ -7,6 +8,12 @@ from ..types.agent import (
     AgentAction,
 )
 
+# Pillow is optional; without it screenshots are re-encoded but not downscaled
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
 
 class StagehandFunctionName:
     AGENT = "agent"
@@ -25,14 +32,73 @@ class CUAHandler:  # Computer Use Agent Handler
         self.logger = logger
         self.page = page
 
-    async def get_screenshot_base64(self) -> str:
-        """Captures a screenshot of the current page and returns it as a base64 encoded string."""
+    async def get_screenshot_bytes(
+        self,
+        image_format: str = "png",
+        quality: Optional[int] = None,
+        max_size: Optional[tuple[int, int]] = None,
+    ) -> bytes:
+        """
+        Captures a screenshot of the current page and returns the raw encoded image bytes.
+
+        Use this when the image is hashed or written to disk; base64 is only needed
+        where the bytes must travel inside JSON (see get_screenshot_base64).
+
+        Args:
+            image_format: "png" or "jpeg".
+            quality: JPEG quality (0-100); ignored for PNG.
+            max_size: Optional (width, height) bound; larger screenshots are
+                downscaled preserving aspect ratio when Pillow is installed.
+        """
         self.logger.debug(
             "Capturing screenshot for CUA client", category=StagehandFunctionName.AGENT
         )
-        screenshot_bytes = await self.page.screenshot(full_page=False, type="png")
+        if image_format != "jpeg":
+            quality = None
+        screenshot_bytes = await self.page.screenshot(
+            full_page=False, type=image_format, quality=quality
+        )
+        if max_size and Image is not None:
+            screenshot_bytes = self._downscale(
+                screenshot_bytes, max_size, image_format, quality
+            )
+        return screenshot_bytes
+
+    async def get_screenshot_base64(
+        self,
+        image_format: str = "png",
+        quality: Optional[int] = None,
+        max_size: Optional[tuple[int, int]] = None,
+    ) -> str:
+        """
+        Captures a screenshot of the current page and returns it as a base64 encoded string.
+
+        Takes the same arguments as get_screenshot_bytes.
+        """
+        screenshot_bytes = await self.get_screenshot_bytes(
+            image_format=image_format, quality=quality, max_size=max_size
+        )
         return base64.b64encode(screenshot_bytes).decode()
 
+    @staticmethod
+    def _downscale(
+        image_bytes: bytes,
+        max_size: tuple[int, int],
+        image_format: str,
+        quality: Optional[int],
+    ) -> bytes:
+        """Shrink an encoded image to fit within max_size, re-encoding in the same format."""
+        image = Image.open(io.BytesIO(image_bytes))
+        if image.width <= max_size[0] and image.height <= max_size[1]:
+            return image_bytes
+        image.thumbnail(max_size, Image.Resampling.LANCZOS)
+        output = io.BytesIO()
+        if image_format == "jpeg":
+            image.convert("RGB").save(output, format="JPEG", quality=quality or 85)
+        else:
+            image.save(output, format="PNG")
+        return output.getvalue()
+
     async def perform_action(self, action: AgentAction) -> ActionExecutionResult:
         """Execute a single action on the page."""
         self.logger.info(
@@ -1,5 +1,6 @@
 """Observe handler for performing observations of page elements using LLMs."""
 
+import asyncio
 from typing import Any, Optional
 
 from stagehand.a11y.utils import get_accessibility_tree, get_xpath_by_resolved_object_id
@@ -9,6 +10,26 @@ from stagehand.schemas import ObserveOptions, ObserveResult
 from stagehand.utils import draw_observe_overlay
 from stagehand.cache import StagehandCache
 
+# 缓存命中后操作失败的比例超过该值时，改为每次命中都先校验 xpath
+_CACHE_HIT_FAILURE_RATE = 0.05
+# 计算失败率所需的最少命中次数
+_CACHE_HIT_MIN_SAMPLES = 20
+
+# 在页面中安装 MutationObserver（若尚未安装）并返回当前 DOM 变更计数。
+# 新文档会重新从 0 计数，导航由 framenavigated 计数区分。
+_DOM_MUTATION_COUNTER_SCRIPT = """
+(() => {
+  if (typeof window.__stagehandMutationCount !== 'number') {
+    window.__stagehandMutationCount = 0;
+    new MutationObserver(() => { window.__stagehandMutationCount++; }).observe(
+      document,
+      { subtree: true, childList: true, attributes: true, characterData: true }
+    );
+  }
+  return window.__stagehandMutationCount;
+})()
+"""
+
 
 class ObserveHandler:
     """Handler for processing observe operations locally."""
@@ -28,8 +49,25 @@ class ObserveHandler:
         self.stagehand = stagehand_client
         self.logger = stagehand_client.logger
         self.user_provided_instructions = user_provided_instructions
-        # 初始化缓存管理器
-        self.cache_manager = StagehandCache(logger=self.logger)
+        # 缓存管理器由 Stagehand 客户端持有，所有页面的 handler 共享同一份缓存
+        self.cache_manager: StagehandCache = stagehand_client.cache
+        # 缓存命中默认直接返回，不再逐次校验 xpath；由 act 在操作失败时
+        # 调用 invalidate_cached_result 让缓存失效，失败率过高时自动开启校验
+        self.validate_on_hit = False
+        # 指令 -> 最近一次命中的缓存key
+        self._cache_hit_keys: dict[str, str] = {}
+        self._cache_hit_count = 0
+        self._cache_hit_failures = 0
+        # 正在进行中的可访问性树提取任务，并发的 observe 调用共享同一次提取
+        self._tree_task: Optional[asyncio.Task] = None
+        # 最近一次提取的快照: ((frame_id, navigation_id, mutation_count), tree)
+        self._snapshot_cache: Optional[tuple[tuple, dict[str, Any]]] = None
+        self._navigation_id = 0
+        self._snapshot_generation = 0
+        try:
+            self.stagehand_page._page.on("framenavigated", self._on_frame_navigated)
+        except Exception:
+            pass
 
     # TODO: better kwargs
     async def observe(
@@ -76,38 +114,43 @@ class ObserveHandler:
 
         await self.stagehand_page._wait_for_settled_dom()
 
-        # 获取页面信息用于缓存
+        # 缓存key只用URL区分页面（读取 URL 是本地属性；获取标题需要一次浏览器往返）
         page_url = self.stagehand_page._page.url
-        page_title = None
-        try:
-            page_title = await self.stagehand_page._page.title()
-        except:
-            pass
 
         # 检查缓存（如果启用）
         if use_cache:
+            # 开启语义匹配时，模型在线程中加载（只在首次加载）
+            await self.cache_manager.load_semantic_encoder()
             cached_result = self.cache_manager.get_cached_result(
-                instruction, page_url, page_title, cache_ttl
+                instruction, page_url, ttl=cache_ttl
             )
+            cache_key = self.cache_manager.last_hit_key
             if cached_result:
-                # 验证缓存的xpath是否仍然有效
-                is_valid = await self.cache_manager.validate_cached_xpath(
-                    self.stagehand_page, cached_result.selector
+                # 只有失败率过高时才验证缓存的xpath是否仍然有效
+                is_valid = not self.validate_on_hit or (
+                    await self.cache_manager.validate_cached_xpath(
+                        self.stagehand_page, cached_result.selector
+                    )
                 )
                 if is_valid:
                     self.logger.info("🚀 使用缓存结果，跳过LLM调用")
+                    self._cache_hit_keys[instruction] = cache_key
+                    self._cache_hit_count += 1
                     return [cached_result]
                 else:
                     self.logger.info("⚠️ 缓存的xpath已失效，将重新分析")
+        self._cache_hit_keys.pop(instruction, None)
 
         # Get accessibility tree data using our utility function
         self.logger.info("Getting accessibility tree data")
-        tree = await get_accessibility_tree(self.stagehand_page, self.logger)
+        tree = await self._get_shared_accessibility_tree()
         output_string = tree["simplified"]
         iframes = tree.get("iframes", [])
 
         # use inference to call the llm
-        observation_response = observe_inference(
+        # LLM 客户端是同步调用，放到线程中执行，避免阻塞其他并发的 observe
+        observation_response = await asyncio.to_thread(
+            observe_inference,
             instruction=instruction,
             tree_elements=output_string,
             llm_client=self.stagehand.llm,
@@ -155,7 +198,7 @@ class ObserveHandler:
                 # 保存第一个最相关的结果到缓存
                 first_result = elements_with_selectors[0]
                 self.cache_manager.set_cache(
-                    instruction, page_url, first_result, page_title
+                    instruction, page_url, first_result, ttl=cache_ttl
                 )
             except Exception as e:
                 self.logger.warning(f"保存缓存失败: {e}")
@@ -167,6 +210,84 @@ class ObserveHandler:
         # Return the list of results without trying to attach _llm_response
         return elements_with_selectors
 
+    def invalidate_cached_result(self, instruction: str) -> bool:
+        """
+        上一次 observe(instruction) 返回的缓存结果无法操作时调用：删除该缓存记录并
+        统计失败率，失败率超过阈值后改为命中时先校验 xpath。
+
+        Returns:
+            上一次结果是否来自缓存（即重新 observe 是否有意义）
+        """
+        cache_key = self._cache_hit_keys.pop(instruction, None)
+        if cache_key is None:
+            return False
+        self.cache_manager.invalidate(cache_key)
+        self._cache_hit_failures += 1
+        if (
+            not self.validate_on_hit
+            and self._cache_hit_count >= _CACHE_HIT_MIN_SAMPLES
+            and self._cache_hit_failures / self._cache_hit_count
+            > _CACHE_HIT_FAILURE_RATE
+        ):
+            self.validate_on_hit = True
+            self.logger.info("⚠️ 缓存命中后操作失败率过高，改为命中时校验 xpath")
+        return True
+
+    def invalidate_snapshot(self) -> None:
+        """丢弃缓存的可访问性树快照，下次 observe 时重新提取。"""
+        self._snapshot_generation += 1
+        self._snapshot_cache = None
+
+    def _on_frame_navigated(self, frame) -> None:
+        self._navigation_id += 1
+        self.invalidate_snapshot()
+
+    async def _get_snapshot_key(self) -> Optional[tuple]:
+        """计算当前 DOM 状态的快照键，无法获取时返回 None（不使用快照缓存）。"""
+        try:
+            mutation_count = await self.stagehand_page._page.evaluate(
+                _DOM_MUTATION_COUNTER_SCRIPT
+            )
+        except Exception:
+            return None
+        return (self.stagehand_page.frame_id, self._navigation_id, mutation_count)
+
+    async def _get_shared_accessibility_tree(self) -> dict[str, Any]:
+        """
+        获取可访问性树。页面未导航且 DOM 未变更时直接复用上次的快照；
+        若已有提取任务在进行中，则等待并复用其结果，避免并发 observe 时重复遍历 DOM。
+        """
+        task = self._tree_task
+        if task is None or task.done():
+            key = await self._get_snapshot_key()
+            if (
+                key is not None
+                and self._snapshot_cache is not None
+                and self._snapshot_cache[0] == key
+            ):
+                self.logger.debug("复用可访问性树快照", category="observe")
+                return self._snapshot_cache[1]
+            # 等待期间可能已有其他调用方发起提取
+            task = self._tree_task
+            if task is None or task.done():
+                task = asyncio.ensure_future(self._extract_tree(key))
+                self._tree_task = task
+                task.add_done_callback(self._clear_tree_task)
+        # shield: 单个调用方被取消时不影响其他共享该任务的调用方
+        return await asyncio.shield(task)
+
+    async def _extract_tree(self, key: Optional[tuple]) -> dict[str, Any]:
+        generation = self._snapshot_generation
+        tree = await get_accessibility_tree(self.stagehand_page, self.logger)
+        # 提取期间发生导航或失效时不写入快照
+        if key is not None and generation == self._snapshot_generation:
+            self._snapshot_cache = (key, tree)
+        return tree
+
+    def _clear_tree_task(self, task: asyncio.Task) -> None:
+        if self._tree_task is task:
+            self._tree_task = None
+
     async def _add_selectors_to_elements(
         self,
         elements: list[dict[str, Any]],
@@ -180,12 +301,13 @@ class ObserveHandler:
         Returns:
             list of elements with selectors added (xpaths)
         """
-        result = []
-
-        for element in elements:
-            element_id = element.get("element_id")
-            rest = {k: v for k, v in element.items() if k != "element_id"}
+        if not elements:
+            return []
+        cdp_client = await self.stagehand_page.get_cdp_client()
 
+        async def _resolve(
+            element_id: Any, element: dict[str, Any]
+        ) -> Optional[ObserveResult]:
             # Generate xpath for element using CDP
             self.logger.info(
                 "Getting xpath for element",
@@ -200,16 +322,33 @@ class ObserveHandler:
                 self.logger.info(
                     f"Invalid object ID returned for element: {element_id}"
                 )
-                continue
+                return None
 
             # Use our utility function to get the XPath
-            cdp_client = await self.stagehand_page.get_cdp_client()
             xpath = await get_xpath_by_resolved_object_id(cdp_client, object_id)
 
             if not xpath:
                 self.logger.info(f"Empty xpath returned for element: {element_id}")
-                continue
+                return None
 
-            result.append(ObserveResult(**{**rest, "selector": f"xpath={xpath}"}))
+            return ObserveResult(**element, selector=f"xpath={xpath}")
 
+        # The element dicts are not reused by the caller, so element_id is popped
+        # in place instead of copying every element without it
+        element_ids = [element.pop("element_id", None) for element in elements]
+        # Elements are independent, so their CDP round-trips are issued concurrently;
+        # gather keeps the LLM's ordering
+        resolved = await asyncio.gather(
+            *map(_resolve, element_ids, elements), return_exceptions=True
+        )
+
+        result = []
+        for element_id, item in zip(element_ids, resolved):
+            if isinstance(item, BaseException):
+                # Cancellation (and other non-Exception errors) must not be swallowed
+                if not isinstance(item, Exception):
+                    raise item
+                self.logger.info(f"Failed to resolve element {element_id}: {item}")
+            elif item is not None:
+                result.append(item)
         return result
@@ -1,3 +1,4 @@
+from functools import lru_cache
 from typing import Optional
 
 from stagehand.handlers.act_handler_utils import method_handler_map
@@ -21,10 +22,9 @@ User Instructions:
 
 
 # extract
-def build_extract_system_prompt(
-    is_using_text_extract: bool = False,
-    user_provided_instructions: Optional[str] = None,
-) -> ChatMessage:
+@lru_cache(maxsize=2)
+def _extract_system_prompt_base(is_using_text_extract: bool) -> str:
+    """Whitespace-normalized extract system prompt without user instructions."""
     base_content = """You are a JSON data extraction assistant.
 Your task is to extract structured data and return it as valid JSON.
 
@@ -63,24 +63,41 @@ do not miss any important information."""
         )
     )
 
-    user_instructions = build_user_instructions_string(
-        user_provided_instructions,
-    )
-
     content_parts = [
         f"{base_content}{content_detail}",
         instructions,
+        additional_instructions,
     ]
-    if additional_instructions:
-        content_parts.append(additional_instructions)
+    # Join parts with newlines, filter empty strings, then replace multiple spaces
+    return " ".join("\n\n".join(filter(None, content_parts)).split())
+
+
+# User instructions are usually fixed per Stagehand instance, so the finished
+# prompt text is memoized; callers still get a fresh ChatMessage every time
+@lru_cache(maxsize=32)
+def _extract_system_prompt_content(
+    is_using_text_extract: bool, user_provided_instructions: Optional[str]
+) -> str:
+    content = _extract_system_prompt_base(is_using_text_extract)
+    user_instructions = build_user_instructions_string(
+        user_provided_instructions,
+    )
     if user_instructions:
-        content_parts.append(user_instructions)
+        # The whole prompt is whitespace-normalized, user instructions included
+        content = f"{content} {' '.join(user_instructions.split())}"
+    return content
 
-    # Join parts with newlines, filter empty strings, then replace multiple spaces
-    full_content = "\n\n".join(filter(None, content_parts))
-    content = " ".join(full_content.split())
 
-    return ChatMessage(role="system", content=content)
+def build_extract_system_prompt(
+    is_using_text_extract: bool = False,
+    user_provided_instructions: Optional[str] = None,
+) -> ChatMessage:
+    return ChatMessage(
+        role="system",
+        content=_extract_system_prompt_content(
+            is_using_text_extract, user_provided_instructions
+        ),
+    )
 
 
 def build_extract_user_prompt(
@@ -162,17 +179,16 @@ Evaluate if this extraction is complete according to the instruction.
 
 
 # observe
-def build_observe_system_prompt(
-    user_provided_instructions: Optional[str] = None,
-) -> ChatMessage:
-    tree_type_desc = "a hierarchical accessibility tree showing the semantic structure of the page. The tree is a hybrid of the DOM and the accessibility tree."
+# The observe system prompt only depends on the static method map, so it is
+# built and whitespace-normalized once at import
+_OBSERVE_TREE_TYPE_DESC = "a hierarchical accessibility tree showing the semantic structure of the page. The tree is a hybrid of the DOM and the accessibility tree."
 
-    observe_system_prompt_base = f"""
+_observe_system_prompt_base = f"""
 You are helping the user automate the browser by finding elements based on what the user wants to observe in the page.
 
 You will be given:
 1. an instruction of elements to observe
-2. {tree_type_desc}
+2. {_OBSERVE_TREE_TYPE_DESC}
 
 IMPORTANT: You must return a JSON object with this exact format:
 {{
@@ -190,17 +206,25 @@ Return an array of elements that match the instruction if they exist, otherwise
 {", ".join(method_handler_map.keys())}
 
 Always respond with valid JSON only, no explanatory text or markdown code blocks."""
+_OBSERVE_SYSTEM_PROMPT = " ".join(_observe_system_prompt_base.split())
+del _observe_system_prompt_base
 
-    content = " ".join(observe_system_prompt_base.split())
-    user_instructions_str = build_user_instructions_string(user_provided_instructions)
 
-    final_content = content
+@lru_cache(maxsize=32)
+def _observe_system_prompt_content(user_provided_instructions: Optional[str]) -> str:
+    final_content = _OBSERVE_SYSTEM_PROMPT
+    user_instructions_str = build_user_instructions_string(user_provided_instructions)
     if user_instructions_str:
         final_content += "\n\n" + user_instructions_str
+    return final_content
 
+
+def build_observe_system_prompt(
+    user_provided_instructions: Optional[str] = None,
+) -> ChatMessage:
     return ChatMessage(
         role="system",
-        content=final_content,
+        content=_observe_system_prompt_content(user_provided_instructions),
     )
 
 
@@ -629,6 +629,15 @@ class StagehandLogger:
             elif level == 2:
                 logger.debug(log_message)
 
+    def is_enabled(self, level: int) -> bool:
+        """
+        Check whether a message at the given level would be emitted.
+
+        Use this to skip building expensive log messages (e.g. large reprs) that
+        would be dropped anyway.
+        """
+        return self.config.should_log(level)
+
     # Convenience methods
     def error(
         self, message: str, category: str = None, auxiliary: dict[str, Any] = None
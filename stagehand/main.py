@@ -3,6 +3,7 @@ import os
 import signal
 import sys
 import time
+import weakref
 from pathlib import Path
 from typing import Any, Optional
 
@@ -22,6 +23,7 @@ from .browser import (
     connect_browserbase_browser,
     connect_local_browser,
 )
+from .cache import StagehandCache
 from .config import StagehandConfig, default_config
 from .context import StagehandContext
 from .llm import LLMClient
@@ -282,9 +284,14 @@ class Stagehand:
 
         self._initialized = False  # Flag to track if init() has run
         self._closed = False  # Flag to track if resources have been closed
+        self._agents: weakref.WeakSet[Agent] = weakref.WeakSet()
         self._live_page_proxy = None  # Live page proxy
         self._page_switch_lock = asyncio.Lock()  # Lock for page stability
 
+        # Observe cache shared by every page's handlers; the cache file is only
+        # read on first use, so creating it here costs nothing in API mode
+        self.cache = StagehandCache(logger=self.logger)
+
         # Setup LLM client if LOCAL mode
         self.llm = None
         if not self.use_api:
@@ -466,9 +473,10 @@ class Stagehand:
         """
         Return an asyncio.Lock for this session. If one doesn't exist yet, create it.
         """
-        if self.session_id not in self._session_locks:
-            self._session_locks[self.session_id] = asyncio.Lock()
-        return self._session_locks[self.session_id]
+        lock = self._session_locks.get(self.session_id)
+        if lock is None:
+            lock = self._session_locks[self.session_id] = asyncio.Lock()
+        return lock
 
     async def __aenter__(self):
         self.logger.debug("Entering Stagehand context manager (__aenter__)...")
@@ -567,7 +575,10 @@ class Stagehand:
 
         self.logger.debug(f"Creating Agent instance with config: {kwargs}")
         # Pass the required config directly to the Agent constructor
-        return Agent(self, **kwargs)
+        agent = Agent(self, **kwargs)
+        # Tracked so close() can flush their cache writes and release connections
+        self._agents.add(agent)
+        return agent
 
     async def close(self):
         """
@@ -609,6 +620,14 @@ class Stagehand:
                 await self._client.aclose()
                 self._client = None
 
+        # Flush pending agent cache writes and release pooled agent connections
+        for agent in list(self._agents):
+            try:
+                await agent.aclose()
+            except Exception as e:
+                self.logger.error(f"Error closing agent: {str(e)}")
+        self._agents.clear()
+
         # Use the centralized cleanup function for browser resources
         await cleanup_browser_resources(
             self._browser,
@@ -99,6 +99,8 @@ class StagehandPage:
             await self._page.goto(
                 url, referer=referer, timeout=timeout, wait_until=wait_until
             )
+            if hasattr(self, "_observe_handler"):
+                self._observe_handler.invalidate_snapshot()
             return
         options = {}
         if referer is not None:
@@ -146,7 +148,53 @@ class StagehandPage:
             ActResult: The result from the Stagehand server's action execution.
         """
         await self.ensure_injection()
+        payload = self._build_act_payload(action_or_result, **kwargs)
+        return await self._dispatch_act(payload, use_cache, cache_ttl)
 
+    async def act_script(
+        self,
+        steps: list[Union[str, dict]],
+        use_cache: bool = True,
+        cache_ttl: int = 3600 * 24 * 365,
+        stop_on_failure: bool = True,
+    ) -> list[ActResult]:
+        """
+        Execute a sequence of actions in order.
+
+        Each step is resolved against the page as left by the previous step, so
+        cached steps replay without LLM calls while injection and handler setup
+        happen once for the whole script.
+
+        Args:
+            steps (list[Union[str, dict]]): Action strings, or dicts with an
+                ``action`` key plus per-step ``use_cache``/``cache_ttl`` overrides
+                and other ActOptions fields.
+            use_cache (bool): Default caching behaviour for steps.
+            cache_ttl (int): Default cache time-to-live in seconds for steps.
+            stop_on_failure (bool): Stop at the first step that does not succeed.
+
+        Returns:
+            list[ActResult]: One result per executed step.
+        """
+        await self.ensure_injection()
+        results = []
+        for step in steps:
+            step_use_cache, step_cache_ttl = use_cache, cache_ttl
+            if isinstance(step, dict):
+                step = dict(step)
+                step_use_cache = step.pop("use_cache", use_cache)
+                step_cache_ttl = step.pop("cache_ttl", cache_ttl)
+            payload = self._build_act_payload(step)
+            result = await self._dispatch_act(payload, step_use_cache, step_cache_ttl)
+            results.append(result)
+            if stop_on_failure and not getattr(result, "success", False):
+                break
+        return results
+
+    def _build_act_payload(
+        self, action_or_result: Union[str, ObserveResult, dict], **kwargs
+    ) -> dict:
+        """Normalize the accepted act inputs into a request payload."""
         payload: dict
         # Check if it's an ObserveResult for direct execution
         if isinstance(action_or_result, ObserveResult):
@@ -175,6 +223,12 @@ class StagehandPage:
                 "Invalid arguments for 'act'. Expected str, ObserveResult, or ActOptions."
             )
 
+        return payload
+
+    async def _dispatch_act(
+        self, payload: dict, use_cache: bool, cache_ttl: int
+    ) -> ActResult:
+        """Run an act payload locally or through the Stagehand server."""
         # TODO: Temporary until we move api based logic to client
         if not self._stagehand.use_api:
             # TODO: revisit passing user_provided_instructions
@@ -193,6 +247,8 @@ class StagehandPage:
             result = await self._act_handler.act(
                 payload, use_cache=use_cache, cache_ttl=cache_ttl
             )
+            # The action may have mutated the DOM; drop the cached a11y snapshot
+            self._observe_handler.invalidate_snapshot()
             return result
 
         # Add frame ID if available
@@ -283,11 +339,12 @@ class StagehandPage:
             result = await self._stagehand._execute("observe", payload)
 
         # Convert raw result to list of ObserveResult models
+        # (the server already validated them, so skip pydantic validation)
         if isinstance(result, list):
-            return [ObserveResult(**item) for item in result]
+            return [ObserveResult.from_trusted(item) for item in result]
         elif isinstance(result, dict):
             # If single dict, wrap in list (should ideally be list from server)
-            return [ObserveResult(**result)]
+            return [ObserveResult.from_trusted(result)]
         # Handle unexpected return types
         self._stagehand.logger.info(
             f"Unexpected result type from observe: {type(result)}"
@@ -430,7 +487,7 @@ class StagehandPage:
                     self._stagehand.logger.error(
                         f"Failed to validate extracted data against schema {schema_to_validate_with.__name__}: {e}. Keeping raw data dict in .data field."
                     )
-            return ExtractResult(data=processed_data_payload).data
+            return ExtractResult.from_trusted({"data": processed_data_payload}).data
         # Handle unexpected return types
         self._stagehand.logger.info(
             f"Unexpected result type from extract: {type(result_dict)}"
@@ -1,5 +1,8 @@
+import copy
+import weakref
 from enum import Enum
-from typing import Any, Optional, Union
+from functools import cache
+from typing import Any, ClassVar, Optional, Union
 
 from pydantic import BaseModel, ConfigDict, Field, field_serializer
 
@@ -10,6 +13,33 @@ DEFAULT_EXTRACT_SCHEMA = {
     "required": ["extraction"],
 }
 
+# Sentinel for __getitem__ lookups (None is a valid field value)
+_MISSING = object()
+
+
+def _lookup(model: BaseModel, key: Any) -> Any:
+    """Field or extra-field value of a model for item access, or _MISSING"""
+    # Fields live in __dict__, extra fields in __pydantic_extra__
+    value = model.__dict__.get(key, _MISSING)
+    if value is _MISSING and model.__pydantic_extra__:
+        value = model.__pydantic_extra__.get(key, _MISSING)
+    return value
+
+
+# Dereferenced JSON schema per Pydantic model class. Generating and inlining the
+# schema is far more expensive than copying it, and extract is typically called
+# with the same model over and over. Weak keys let dynamically created models go.
+_RESOLVED_SCHEMA_CACHE: "weakref.WeakKeyDictionary[type[BaseModel], dict[str, Any]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+# JSON schema keywords whose value maps names to subschemas, and keywords whose
+# value is data rather than schema; both matter when stripping metadata keys
+_SCHEMA_NAME_MAPPINGS = frozenset(
+    {"properties", "patternProperties", "$defs", "definitions"}
+)
+_SCHEMA_LITERAL_KEYS = frozenset({"default", "const", "enum", "examples", "required"})
+
 
 # TODO: Remove this
 class AvailableModel(str, Enum):
@@ -21,15 +51,19 @@ class AvailableModel(str, Enum):
     GEMINI_2_0_FLASH = "gemini-2.0-flash"
 
 
+@cache
+def _to_camel(field_name: str) -> str:
+    """Convert a snake_case field name to camelCase (memoized across models)."""
+    head, *tail = field_name.split("_")
+    return head + "".join(word[:1].upper() + word[1:] for word in tail)
+
+
 class StagehandBaseModel(BaseModel):
     """Base model for all Stagehand models with camelCase conversion support"""
 
     model_config = ConfigDict(
         populate_by_name=True,  # Allow accessing fields by their Python name
-        alias_generator=lambda field_name: "".join(
-            [field_name.split("_")[0]]
-            + [word.capitalize() for word in field_name.split("_")[1:]]
-        ),  # snake_case to camelCase
+        alias_generator=_to_camel,  # snake_case to camelCase
     )
 
 
@@ -92,8 +126,10 @@ class ExtractOptions(StagehandBaseModel):
     selector: Optional[str] = None
     # IMPORTANT: If using a Pydantic model for schema_definition, please call its .model_json_schema() method
     # to convert it to a JSON serializable dictionary before sending it with the extract command.
+    # The default schema is shared rather than deep-copied per instance (pydantic
+    # copies mutable defaults); treat schema_definition as read-only
     schema_definition: Union[dict[str, Any], type[BaseModel]] = Field(
-        default=DEFAULT_EXTRACT_SCHEMA,
+        default_factory=lambda: DEFAULT_EXTRACT_SCHEMA,
         description="A JSON schema or Pydantic model that defines the structure of the expected data.",
     )
     use_text_extract: Optional[bool] = None
@@ -101,59 +137,119 @@ class ExtractOptions(StagehandBaseModel):
     model_client_options: Optional[dict[Any, Any]] = None
     iframes: Optional[bool] = None
 
+    # Keys dropped from generated model schemas before they are sent. Titles are
+    # pydantic boilerplate; descriptions and examples are kept because they guide
+    # the LLM. Read when a model's schema is first resolved (and then cached).
+    _STRIP_SCHEMA_METADATA: ClassVar[bool] = True
+    _SCHEMA_METADATA_KEYS: ClassVar[frozenset[str]] = frozenset({"title"})
+
     @field_serializer("schema_definition")
     def serialize_schema_definition(
         self, schema_definition: Union[dict[str, Any], type[BaseModel]]
     ) -> dict[str, Any]:
         """Serialize schema_definition to a JSON schema if it's a Pydantic model"""
-        if isinstance(schema_definition, type) and issubclass(
-            schema_definition, BaseModel
-        ):
-            # Get the JSON schema using default ref_template ('#/$defs/{model}')
-            schema = schema_definition.model_json_schema()
-
-            defs_key = "$defs"
-            if defs_key not in schema:
-                defs_key = "definitions"
-                if defs_key not in schema:
-                    return schema
-
-            definitions = schema.get(defs_key, {})
-            if definitions:
-                self._resolve_references(schema, definitions, f"#/{defs_key}/")
-                schema.pop(defs_key, None)
-
-            return schema
-
-        elif isinstance(schema_definition, dict):
+        if isinstance(schema_definition, dict):
             return schema_definition
 
-        raise TypeError("schema_definition must be a Pydantic model or a dict")
-
-    def _resolve_references(self, obj: Any, definitions: dict, ref_prefix: str) -> None:
-        """Recursively resolve $ref references in a schema using definitions."""
-        if isinstance(obj, dict):
-            if "$ref" in obj and obj["$ref"].startswith(ref_prefix):
-                ref_name = obj["$ref"][len(ref_prefix) :]  # Get name after prefix
-                if ref_name in definitions:
-                    original_keys = {k: v for k, v in obj.items() if k != "$ref"}
-                    resolved_definition = definitions[ref_name].copy()  # Use a copy
-                    self._resolve_references(
-                        resolved_definition, definitions, ref_prefix
-                    )
-
-                    obj.clear()
-                    obj.update(resolved_definition)
-                    obj.update(original_keys)
-            else:
-                # Recursively process all values in the dictionary
-                for _, value in obj.items():
-                    self._resolve_references(value, definitions, ref_prefix)
-
-        elif isinstance(obj, list):
-            # Process all items in the list
-            for item in obj:
-                self._resolve_references(item, definitions, ref_prefix)
+        # Only Pydantic model classes are ever cached, so a hit skips the type checks
+        try:
+            schema = _RESOLVED_SCHEMA_CACHE.get(schema_definition)
+        except TypeError:  # not weak-referenceable, so not a class
+            schema = None
+        if schema is None:
+            if not (
+                isinstance(schema_definition, type)
+                and issubclass(schema_definition, BaseModel)
+            ):
+                raise TypeError("schema_definition must be a Pydantic model or a dict")
+            schema = ExtractOptions._resolve_model_schema(schema_definition)
+            _RESOLVED_SCHEMA_CACHE[schema_definition] = schema
+        # Callers may mutate the serialized payload; the cached schema stays intact
+        return copy.deepcopy(schema)
+
+    @staticmethod
+    def _resolve_model_schema(model: type[BaseModel]) -> dict[str, Any]:
+        """Build the JSON schema for a Pydantic model with all $defs inlined."""
+        # Get the JSON schema using default ref_template ('#/$defs/{model}')
+        schema = model.model_json_schema()
+
+        defs_key = "$defs" if "$defs" in schema else "definitions"
+        # Detach the definitions so the walk never enters (or rewrites) them
+        definitions = schema.pop(defs_key, None)
+        if definitions:
+            unresolved = ExtractOptions._resolve_references(
+                schema, definitions, f"#/{defs_key}/"
+            )
+            if unresolved:
+                # Recursive models keep $refs, which must still point somewhere
+                schema[defs_key] = definitions
+
+        if ExtractOptions._STRIP_SCHEMA_METADATA:
+            ExtractOptions._strip_metadata(schema, ExtractOptions._SCHEMA_METADATA_KEYS)
+        return schema
+
+    @staticmethod
+    def _resolve_references(obj: Any, definitions: dict, ref_prefix: str) -> bool:
+        """Resolve $ref references in a schema in place using definitions.
+
+        Walks the schema with an explicit stack instead of recursion. Each frame
+        carries the definitions already inlined on its path, so a self-referencing
+        model keeps its inner $ref rather than expanding forever. Definitions are
+        copied before being inlined and are never modified.
+
+        Returns:
+            True if any $ref was left in place because it is recursive.
+        """
+        unresolved = False
+        stack: list[tuple[Any, frozenset]] = [(obj, frozenset())]
+        while stack:
+            cur, expanding = stack.pop()
+            if isinstance(cur, dict):
+                ref = cur.get("$ref")
+                if isinstance(ref, str) and ref.startswith(ref_prefix):
+                    ref_name = ref[len(ref_prefix) :]  # Get name after prefix
+                    if ref_name in expanding:
+                        unresolved = True
+                    elif ref_name in definitions:
+                        original_keys = {k: v for k, v in cur.items() if k != "$ref"}
+                        cur.clear()
+                        cur.update(copy.deepcopy(definitions[ref_name]))
+                        cur.update(original_keys)
+                        # Revisit the merged dict to resolve refs inside the definition
+                        stack.append((cur, expanding | {ref_name}))
+                else:
+                    # Process all values in the dictionary
+                    stack.extend((value, expanding) for value in cur.values())
+
+            elif isinstance(cur, list):
+                # Process all items in the list
+                stack.extend((item, expanding) for item in cur)
+
+        return unresolved
+
+    @staticmethod
+    def _strip_metadata(schema: dict[str, Any], keys: frozenset[str]) -> None:
+        """Delete metadata keys from every schema node in place.
+
+        Mappings of property names are walked without stripping, so a field that
+        is itself called e.g. "title" survives. Literal values (defaults, enums,
+        examples) are never descended into.
+        """
+        stack: list[Any] = [schema]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, list):
+                stack.extend(node)
+                continue
+            if not isinstance(node, dict):
+                continue
+            for key in keys & node.keys():
+                del node[key]
+            for key, value in node.items():
+                if key in _SCHEMA_NAME_MAPPINGS and isinstance(value, dict):
+                    stack.extend(value.values())
+                elif key not in _SCHEMA_LITERAL_KEYS:
+                    stack.append(value)
 
     model_config = ConfigDict(arbitrary_types_allowed=True)
 
@@ -176,7 +272,37 @@ class ExtractResult(StagehandBaseModel):
         Enable dictionary-style access to attributes.
         This allows usage like result["selector"] in addition to result.selector
         """
-        return getattr(self, key)
+        value = _lookup(self, key)
+        if value is not _MISSING:
+            return value
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __contains__(self, key) -> bool:
+        """Whether a field (or extra field) named key is set, like dict membership"""
+        return _lookup(self, key) is not _MISSING
+
+    def get(self, key, default=None):
+        """Return the field value for key, or default if there is no such field"""
+        value = _lookup(self, key)
+        return default if value is _MISSING else value
+
+    @classmethod
+    def from_trusted(cls, data: dict[str, Any]) -> "ExtractResult":
+        """
+        Build a result from a payload produced by the Stagehand server without
+        running pydantic validation. Field aliases are honored and extra keys are
+        kept so item access still works.
+
+        Args:
+            data: The already-validated result payload
+
+        Returns:
+            The constructed result
+        """
+        return cls.model_construct(**data)
 
 
 class ObserveOptions(StagehandBaseModel):
@@ -226,7 +352,36 @@ class ObserveResult(StagehandBaseModel):
         Enable dictionary-style access to attributes.
         This allows usage like result["selector"] in addition to result.selector
         """
-        return getattr(self, key)
+        value = _lookup(self, key)
+        if value is not _MISSING:
+            return value
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __contains__(self, key) -> bool:
+        """Whether a field (or extra field) named key is set, like dict membership"""
+        return _lookup(self, key) is not _MISSING
+
+    def get(self, key, default=None):
+        """Return the field value for key, or default if there is no such field"""
+        value = _lookup(self, key)
+        return default if value is _MISSING else value
+
+    @classmethod
+    def from_trusted(cls, data: dict[str, Any]) -> "ObserveResult":
+        """
+        Build a result from a payload produced by the Stagehand server without
+        running pydantic validation. Field aliases are honored.
+
+        Args:
+            data: The already-validated result payload
+
+        Returns:
+            The constructed result
+        """
+        return cls.model_construct(**data)
 
 
 class AgentProvider(str, Enum):
@@ -11,12 +11,15 @@ class AgentConfig(BaseModel):
         model (Optional[str]): The model name to use.
         instructions (Optional[str]): Custom instructions for the agent (system prompt).
         options (Optional[dict[str, Any]]): Additional provider-specific options.
+        cache_lookup_timeout_s (Optional[float]): Time budget for the local agent cache
+            lookup before falling back to the LLM. Defaults to 1 second.
     """
 
     model: Optional[str] = None
     instructions: Optional[str] = None
     options: Optional[dict[str, Any]] = None
     max_steps: Optional[int] = 20
+    cache_lookup_timeout_s: Optional[float] = None
 
 
 class ClickAction(BaseModel):
@@ -167,9 +170,12 @@ class AgentExecuteOptions(BaseModel):
         auto_screenshot (Optional[bool]): Whether to automatically capture screenshots after each action. False will let the agent choose when to capture screenshots. Defaults to True.
         wait_between_actions (Optional[int]): Milliseconds to wait between actions.
         context (Optional[str]): Additional context for the agent.
+        instructions (Optional[list[str]]): Ordered plan of sub-steps to run in a single
+            multi-turn request. When set without `instruction`, the instruction is built from the plan.
     """
 
     instruction: str
+    instructions: Optional[list[str]] = None
     max_steps: Optional[int] = 15
     auto_screenshot: Optional[bool] = True
     wait_between_actions: Optional[int] = 1000
@@ -2,6 +2,18 @@ from typing import Any, Optional, Union
 
 from pydantic import BaseModel, Field
 
+# Sentinel for __getitem__ lookups (None is a valid field value)
+_MISSING = object()
+
+
+def _lookup(model: BaseModel, key: Any) -> Any:
+    """Field or extra-field value of a model for item access, or _MISSING"""
+    # Fields live in __dict__, extra fields in __pydantic_extra__
+    value = model.__dict__.get(key, _MISSING)
+    if value is _MISSING and model.__pydantic_extra__:
+        value = model.__pydantic_extra__.get(key, _MISSING)
+    return value
+
 
 # Ignore linting error for this class name since it's used as a constant
 # ruff: noqa: N801
@@ -111,7 +123,22 @@ class ObserveResult(BaseModel):
         Enable dictionary-style access to attributes.
         This allows usage like result["selector"] in addition to result.selector
         """
-        return getattr(self, key)
+        value = _lookup(self, key)
+        if value is not _MISSING:
+            return value
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __contains__(self, key) -> bool:
+        """Whether a field (or extra field) named key is set, like dict membership"""
+        return _lookup(self, key) is not _MISSING
+
+    def get(self, key, default=None):
+        """Return the field value for key, or default if there is no such field"""
+        value = _lookup(self, key)
+        return default if value is _MISSING else value
 
 
 class ExtractOptions(BaseModel):
@@ -159,4 +186,19 @@ class ExtractResult(BaseModel):
         Enable dictionary-style access to attributes.
         This allows usage like result["selector"] in addition to result.selector
         """
-        return getattr(self, key)
+        value = _lookup(self, key)
+        if value is not _MISSING:
+            return value
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __contains__(self, key) -> bool:
+        """Whether a field (or extra field) named key is set, like dict membership"""
+        return _lookup(self, key) is not _MISSING
+
+    def get(self, key, default=None):
+        """Return the field value for key, or default if there is no such field"""
+        value = _lookup(self, key)
+        return default if value is _MISSING else value
@@ -1,4 +1,5 @@
 import inspect
+import json
 from typing import Any, Union, get_args, get_origin
 
 from pydantic import AnyUrl, BaseModel, Field, HttpUrl, create_model
@@ -6,6 +7,31 @@ from pydantic.fields import FieldInfo
 
 from stagehand.types.a11y import AccessibilityNode
 
+# orjson is optional (pip install 'stagehand[fast-json]'); fall back to json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def json_dumps(obj: Any, indent: bool = False) -> bytes:
+    """Serialize to UTF-8 JSON bytes, leaving non-ASCII characters unescaped."""
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, option=option)
+    return json.dumps(obj, ensure_ascii=False, indent=2 if indent else None).encode(
+        "utf-8"
+    )
+
+
+def json_loads(data: Union[bytes, str]) -> Any:
+    """Parse JSON bytes or text; raises json.JSONDecodeError on invalid input."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
 
 def snake_to_camel(snake_str: str) -> str:
     """
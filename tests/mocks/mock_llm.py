@@ -1,6 +1,6 @@
 """Mock LLM client for testing without actual API calls"""
 
-import asyncio
+import time
 from typing import Any, Dict, List, Optional, Union
 from unittest.mock import MagicMock
 
@@ -95,7 +95,7 @@ class MockLLMClient:
             "messages": messages,
             "model": self.last_model,
             "kwargs": kwargs,
-            "timestamp": asyncio.get_event_loop().time()
+            "timestamp": time.monotonic()
         }
         self.call_history.append(call_info)
         
@@ -287,7 +287,7 @@ class MockLLMClient:
             "model": self.last_model,
             "kwargs": kwargs,
             "function_name": function_name,
-            "timestamp": asyncio.get_event_loop().time()
+            "timestamp": time.monotonic()
         }
         self.call_history.append(call_info)
         
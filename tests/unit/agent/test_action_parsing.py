@@ -0,0 +1,82 @@
+"""Test parsing of the CUA text action grammar"""
+
+from unittest.mock import MagicMock
+
+from stagehand.agent.openai_cua import OpenAICUAClient
+from stagehand.agent.utils import ParsedAction, iter_actions, parse_actions
+from stagehand.types.agent import AgentConfig
+
+
+class TestParseActions:
+    """Test parse_actions on typical model responses"""
+
+    def test_click(self):
+        assert parse_actions("CLICK: x=350, y=200") == [
+            ParsedAction("CLICK", {"x": "350", "y": "200"})
+        ]
+
+    def test_command_embedded_in_prose(self):
+        actions = parse_actions("好的，点击登录按钮。click: x=350, y=200")
+        assert actions == [ParsedAction("CLICK", {"x": "350", "y": "200"})]
+
+    def test_type_text_runs_to_end_of_line(self):
+        actions = parse_actions(
+            "TYPE: x=100, y=200, text=hello, world\nWAIT: milliseconds=500"
+        )
+        assert actions == [
+            ParsedAction("TYPE", {"x": "100", "y": "200", "text": "hello, world"}),
+            ParsedAction("WAIT", {"milliseconds": "500"}),
+        ]
+
+    def test_type_text_stops_at_next_command(self):
+        actions = parse_actions("TYPE: x=1, y=2, text=admin, CLICK: x=3, y=4")
+        assert actions == [
+            ParsedAction("TYPE", {"x": "1", "y": "2", "text": "admin"}),
+            ParsedAction("CLICK", {"x": "3", "y": "4"}),
+        ]
+
+    def test_first_command_wins_regardless_of_verb(self):
+        client = OpenAICUAClient(
+            model="glm-4.5v",
+            config=AgentConfig(options={"apiKey": "test-key"}),
+            logger=MagicMock(),
+        )
+        client.handler = MagicMock()
+        client.handler.page.viewport_size = {"width": 1000, "height": 1000}
+
+        action = client._parse_action_from_response(
+            "TYPE: x=100, y=200, text=admin CLICK: x=300, y=400"
+        )
+
+        assert action.action_type == "type"
+        assert action.action.root.text == "admin"
+
+    def test_scroll_with_signed_offsets(self):
+        actions = parse_actions("SCROLL: x=500, y=300, scroll_y=-100")
+        assert actions[0].args == {"x": "500", "y": "300", "scroll_y": "-100"}
+
+    def test_no_command(self):
+        assert parse_actions("我需要先观察页面") == []
+        assert parse_actions("") == []
+
+    def test_iter_actions_is_lazy(self):
+        actions = iter_actions("CLICK: x=1, y=2\nWAIT: milliseconds=500")
+        assert next(actions) == ParsedAction("CLICK", {"x": "1", "y": "2"})
+        assert next(actions).verb == "WAIT"
+
+
+class TestNaturalLanguageFallback:
+    """Test prose fallbacks when no action command is present"""
+
+    def test_quoted_input_text_extracted(self):
+        client = OpenAICUAClient(
+            model="glm-4.5v",
+            config=AgentConfig(options={"apiKey": "test-key"}),
+            logger=MagicMock(),
+        )
+
+        action = client._parse_action_from_response("我将点击用户名框并输入'admin'")
+
+        assert action.action_type == "type"
+        assert action.action.root.text == "admin"
+        client.logger.warning.assert_called()
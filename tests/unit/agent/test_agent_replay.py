@@ -0,0 +1,337 @@
+"""Test cached-action replay, cache writes and batch execution in Agent"""
+
+import asyncio
+import threading
+import time
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from stagehand.agent.agent import Agent
+from stagehand.types.agent import AgentConfig, AgentResult
+
+
+def make_action(action_type):
+    # Replay only inspects action_type; the handler is mocked
+    return MagicMock(action_type=action_type)
+
+
+@pytest.fixture
+def agent():
+    agent = Agent.__new__(Agent)
+    agent.logger = MagicMock()
+    agent.stagehand = MagicMock()
+    agent.stagehand.page._page.wait_for_load_state = AsyncMock()
+    agent.cua_handler = MagicMock()
+    agent._pending_cache_writes = set()
+    agent._cache_lock = threading.Lock()
+    agent._cache_io_lock = asyncio.Lock()
+    return agent
+
+
+class TestReplayCachedActions:
+    """Test grouping and settling of cached action replay"""
+
+    async def test_screenshots_run_concurrently(self, agent):
+        running = 0
+        peak = 0
+
+        async def perform_action(action):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            return {"success": True}
+
+        agent.cua_handler.perform_action = perform_action
+        await agent._replay_cached_actions(
+            [
+                make_action("click"),
+                make_action("screenshot"),
+                make_action("screenshot"),
+                make_action("click"),
+            ]
+        )
+
+        assert peak == 2
+        # Settle only after the first click; the last action needs no wait
+        agent.stagehand.page._page.wait_for_load_state.assert_awaited_once()
+
+    async def test_back_to_back_waits_run_sequentially(self, agent):
+        running = 0
+        peak = 0
+        order = []
+
+        async def perform_action(action):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            order.append(action.action_type)
+            return {"success": True}
+
+        agent.cua_handler.perform_action = perform_action
+        await agent._replay_cached_actions(
+            [
+                make_action("click"),
+                make_action("wait"),
+                make_action("wait"),
+                make_action("click"),
+            ]
+        )
+
+        # Waits must add up rather than overlap
+        assert peak == 1
+        assert order == ["click", "wait", "wait", "click"]
+        # Waits do not change the page, so only the first click settles
+        agent.stagehand.page._page.wait_for_load_state.assert_awaited_once()
+
+    async def test_failure_stops_replay(self, agent):
+        agent.cua_handler.perform_action = AsyncMock(
+            side_effect=[{"success": False, "error": "boom"}, {"success": True}]
+        )
+
+        with pytest.raises(Exception, match="boom"):
+            await agent._replay_cached_actions(
+                [make_action("click"), make_action("click")]
+            )
+        assert agent.cua_handler.perform_action.await_count == 1
+
+
+class TestCapturePageContext:
+    """Test the page context used for agent cache lookups and saves"""
+
+    async def test_screenshot_and_title_fetched_together(self, agent):
+        page = agent.stagehand.page._page
+        page.url = "https://example.com/login"
+        page.title = AsyncMock(return_value="Login")
+        agent.cua_handler.get_screenshot_base64 = AsyncMock(return_value="abc")
+        agent.viewport = {"width": 1280, "height": 720}
+
+        screenshot, context = await agent._capture_page_context()
+
+        assert screenshot == "abc"
+        assert context == {
+            "url": "https://example.com/login",
+            "title": "Login",
+            "viewport": {"width": 1280, "height": 720},
+        }
+
+    async def test_title_reused_when_url_unchanged(self, agent):
+        page = agent.stagehand.page._page
+        page.url = "https://example.com/login"
+        page.title = AsyncMock(return_value="Changed")
+        agent.cua_handler.get_screenshot_base64 = AsyncMock(return_value="abc")
+        agent.viewport = None
+
+        _, same_page = await agent._capture_page_context(
+            {"url": "https://example.com/login", "title": "Login"}
+        )
+        _, other_page = await agent._capture_page_context(
+            {"url": "https://example.com/", "title": "Home"}
+        )
+
+        assert same_page["title"] == "Login"
+        assert other_page["title"] == "Changed"
+        page.title.assert_awaited_once()
+
+
+class TestBackgroundCacheWrite:
+    """Test that agent cache saves run off the return path"""
+
+    async def test_aclose_waits_for_pending_writes(self, agent):
+        agent.cache = MagicMock()
+
+        agent._schedule_cache_write(instruction="login", actions=[])
+        assert agent._pending_cache_writes
+
+        await agent.aclose()
+
+        agent.cache.set_cached_actions.assert_called_once_with(
+            instruction="login", actions=[]
+        )
+        assert not agent._pending_cache_writes
+
+    async def test_close_flushes_pending_write(self, agent):
+        from stagehand import Stagehand, StagehandConfig
+
+        written = []
+
+        def slow_write(**kwargs):
+            time.sleep(0.05)
+            written.append(kwargs)
+
+        agent.cache = MagicMock()
+        agent.cache.set_cached_actions = slow_write
+        stagehand = Stagehand(config=StagehandConfig(env="LOCAL"))
+        stagehand._agents.add(agent)
+
+        agent._schedule_cache_write(instruction="login", actions=[])
+        with patch("stagehand.main.cleanup_browser_resources", new=AsyncMock()):
+            await stagehand.close()
+
+        assert written == [{"instruction": "login", "actions": []}]
+        assert not agent._pending_cache_writes
+
+    async def test_lookup_waits_for_inflight_write(self, agent):
+        events = []
+
+        def slow_write(**kwargs):
+            time.sleep(0.05)
+            events.append("write")
+
+        async def lookup(**kwargs):
+            events.append("lookup")
+
+        agent.cache = MagicMock()
+        agent.cache.set_cached_actions = slow_write
+        agent.cache.get_cached_actions = lookup
+        agent._capture_page_context = AsyncMock(return_value=("", {}))
+
+        agent._schedule_cache_write(instruction="login", actions=[])
+        await asyncio.sleep(0)
+        await agent._try_cached("login", {})
+
+        assert events == ["write", "lookup"]
+
+
+class TestCreateAgentActionFromDict:
+    """Test rebuilding AgentAction objects from cached action dicts"""
+
+    def test_known_action_type(self, agent):
+        action = agent._create_agent_action_from_dict(
+            {"type": "keypress", "keys": ["Enter"]}
+        )
+
+        assert action.action_type == "keypress"
+        assert action.action.root.keys == ["Enter"]
+
+    def test_identical_dicts_reuse_one_model(self, agent):
+        action_dict = {"type": "function", "name": "goto", "arguments": {"url": "/a"}}
+
+        first = agent._create_agent_action_from_dict(action_dict)
+        second = agent._create_agent_action_from_dict(dict(action_dict))
+
+        assert first is second
+        assert first.action.root.arguments.url == "/a"
+
+    def test_unknown_action_type(self, agent):
+        assert agent._create_agent_action_from_dict({"type": "teleport"}) is None
+
+
+class TestExecuteBatch:
+    """Test sequential batch execution"""
+
+    async def test_results_are_positional(self, agent):
+        async def execute(options):
+            if options == "fail":
+                raise RuntimeError("boom")
+            return options
+
+        agent.execute = execute
+        results = await agent.execute_batch(["a", "fail", "b"])
+
+        assert results[0] == "a"
+        assert results[1].message == "Error: boom"
+        assert results[2] == "b"
+
+    async def test_local_mode_runs_one_at_a_time(self, agent):
+        agent.stagehand.use_api = False
+        running = []
+
+        async def execute(options):
+            running.append(options)
+            assert len(running) == 1
+            await asyncio.sleep(0)
+            running.remove(options)
+            return options
+
+        agent.execute = execute
+        assert await agent.execute_batch(["a", "b", "c"]) == ["a", "b", "c"]
+
+
+class TestCacheLookupHedging:
+    """Test hedging between the agent cache lookup and the LLM run"""
+
+    async def test_slow_lookup_falls_back_to_llm(self, agent):
+        agent.stagehand.use_api = False
+        agent.config = AgentConfig(cache_lookup_timeout_s=0.01)
+        agent.cache_enabled = True
+        agent.cache = MagicMock()
+
+        async def slow_lookup(instruction, options_dict):
+            await asyncio.sleep(1)
+
+        agent._try_cached = slow_lookup
+        agent.client = MagicMock()
+        agent.client.run_task = AsyncMock(
+            return_value=AgentResult(
+                actions=[],
+                message="done",
+                completed=False,
+                usage={"input_tokens": 0, "output_tokens": 0, "inference_time_ms": 0},
+            )
+        )
+
+        result = await agent.execute("login")
+
+        assert result.message == "done"
+        agent.client.run_task.assert_awaited_once()
+
+    async def test_fast_cache_hit_skips_llm_run(self, agent):
+        agent.stagehand.use_api = False
+        agent.config = AgentConfig()
+        agent.cache_enabled = True
+        agent.cache = MagicMock()
+        agent.cua_handler.perform_action = AsyncMock(return_value={"success": True})
+        agent._try_cached = AsyncMock(
+            return_value=([{"type": "wait", "miliseconds": 0}], {"title": "Login"})
+        )
+
+        started = False
+
+        async def run_task(**kwargs):
+            nonlocal started
+            started = True
+
+        agent.client = MagicMock()
+        agent.client.run_task = run_task
+
+        result = await agent.execute("login")
+
+        assert result.message == "成功执行缓存的操作序列"
+        # A lookup that answers within the grace period never starts inference
+        assert not started
+        assert agent.client.action_gate is None
+
+    async def test_slow_cache_hit_cancels_speculative_llm_run(self, agent):
+        agent.stagehand.use_api = False
+        agent.config = AgentConfig(cache_lookup_timeout_s=2)
+        agent.cache_enabled = True
+        agent.cache = MagicMock()
+        agent.cua_handler.perform_action = AsyncMock(return_value={"success": True})
+
+        async def slow_lookup(instruction, options_dict):
+            await asyncio.sleep(0.3)
+            return [{"type": "wait", "miliseconds": 0}], {"title": "Login"}
+
+        agent._try_cached = slow_lookup
+        started = acted = False
+
+        async def run_task(**kwargs):
+            nonlocal started, acted
+            started = True
+            # Page actions are held back until the cache lookup misses
+            await agent.client.action_gate.wait()
+            acted = True
+
+        agent.client = MagicMock()
+        agent.client.run_task = run_task
+
+        result = await agent.execute("login")
+
+        assert result.message == "成功执行缓存的操作序列"
+        assert started
+        assert not acted
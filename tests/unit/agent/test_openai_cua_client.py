@@ -0,0 +1,361 @@
+"""Test OpenAICUAClient connection sharing and screenshot formatting"""
+
+import asyncio
+import base64
+import io
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, PropertyMock
+
+import httpx
+import pytest
+from openai import BadRequestError
+
+from stagehand.agent import openai_cua
+from stagehand.agent.openai_cua import OpenAICUAClient
+from stagehand.types.agent import AgentConfig, AgentResult
+
+
+@pytest.fixture(autouse=True)
+async def _reset_pool():
+    openai_cua._SHARED_HTTP_CLIENTS.clear()
+    yield
+    for entry in openai_cua._SHARED_HTTP_CLIENTS.values():
+        await entry.client.aclose()
+    openai_cua._SHARED_HTTP_CLIENTS.clear()
+
+
+def make_client(base_url="https://glm.example.com/v1", handler=None):
+    config = AgentConfig(options={"apiKey": "test-key", "baseURL": base_url})
+    return OpenAICUAClient(
+        model="glm-4.5v", config=config, logger=MagicMock(), handler=handler
+    )
+
+
+def make_screenshot(Image, patch_color=None):
+    image = Image.new("RGB", (320, 160), "white")
+    if patch_color:
+        image.paste(patch_color, (32, 48, 64, 80))
+    output = io.BytesIO()
+    image.save(output, format="PNG")
+    return base64.b64encode(output.getvalue()).decode()
+
+
+class TestSharedHttpClient:
+    """Test that agent clients reuse one pooled HTTP client per endpoint"""
+
+    def test_same_endpoint_shares_http_client(self):
+        first = make_client("https://glm.example.com/v1")
+        second = make_client("https://glm.example.com/v1")
+        other = make_client("https://other.example.com/v1")
+
+        assert first.openai_sdk_client._client is second.openai_sdk_client._client
+        assert first.openai_sdk_client._client is not other.openai_sdk_client._client
+
+    async def test_last_release_closes_pooled_client(self):
+        first = make_client("https://glm.example.com/v1")
+        second = make_client("https://glm.example.com/v1")
+        http_client = first.openai_sdk_client._client
+
+        await first.aclose()
+        await first.aclose()  # idempotent
+        # Still in use by the other client
+        assert not http_client.is_closed
+
+        await second.aclose()
+        assert http_client.is_closed
+        assert not openai_cua._SHARED_HTTP_CLIENTS
+        assert make_client("https://glm.example.com/v1").openai_sdk_client._client is not http_client
+
+    def test_pool_is_keyed_by_event_loop(self):
+        async def build():
+            return make_client("https://glm.example.com/v1").openai_sdk_client._client
+
+        first = asyncio.run(build())
+        second = asyncio.run(build())
+
+        # A client opened on a finished loop is never handed out again
+        assert first is not second
+        assert len(openai_cua._SHARED_HTTP_CLIENTS) == 1
+
+
+class TestScreenshotDelta:
+    """Test that follow-up screenshots only carry the changed region"""
+
+    @pytest.fixture
+    def Image(self):
+        return pytest.importorskip("PIL.Image")
+
+    @pytest.fixture
+    def client(self):
+        handler = MagicMock()
+        handler.page.url = "https://example.com/login"
+        return make_client(handler=handler)
+
+    def test_changed_region_sent_as_patch(self, client, Image):
+        client._screenshot_content(make_screenshot(Image))
+        content, full_frame = client._screenshot_content(
+            make_screenshot(Image, patch_color="red"), allow_delta=True
+        )
+
+        assert not full_frame
+        assert len(content) == 2
+        assert "(100, 300) to (200, 500)" in content[0]["text"]
+        patch = base64.b64decode(content[1]["image_url"]["url"].split(",", 1)[1])
+        assert Image.open(io.BytesIO(patch)).size == (32, 32)
+
+    def test_raw_bytes_encoded_once_for_full_frame(self, client, Image):
+        screenshot = make_screenshot(Image)
+        content, full_frame = client._screenshot_content(base64.b64decode(screenshot))
+
+        assert full_frame
+        assert content[0]["image_url"]["url"] == f"data:image/jpeg;base64,{screenshot}"
+
+    def test_unchanged_screen_sends_no_image(self, client, Image):
+        client._screenshot_content(make_screenshot(Image))
+        content, _ = client._screenshot_content(make_screenshot(Image), allow_delta=True)
+
+        assert [item["type"] for item in content] == ["text"]
+
+    def test_url_change_sends_full_frame(self, client, Image):
+        client._screenshot_content(make_screenshot(Image))
+        client.handler.page.url = "https://example.com/dashboard"
+        content, full_frame = client._screenshot_content(
+            make_screenshot(Image, patch_color="red"), allow_delta=True
+        )
+
+        assert full_frame
+        assert [item["type"] for item in content] == ["image_url"]
+
+
+class TestJsonPayloads:
+    """Test function-call argument parsing and feedback serialization"""
+
+    @staticmethod
+    def function_call_response(arguments):
+        item = MagicMock(type="function_call", arguments=arguments, status="completed")
+        item.name = "goto"
+        item.model_dump.return_value = {"type": "function_call"}
+        return MagicMock(output=[item])
+
+    def test_function_arguments_parsed(self):
+        action, _, task_completed, _ = make_client()._process_provider_response(
+            self.function_call_response('{"url": "https://example.com/登录"}')
+        )
+
+        assert not task_completed
+        assert action.action.root.arguments.url == "https://example.com/登录"
+        assert action.step is None
+
+    def test_step_trace_opt_in(self):
+        config = AgentConfig(options={"apiKey": "test-key", "storeStepTrace": True})
+        client = OpenAICUAClient(model="glm-4.5v", config=config, logger=MagicMock())
+
+        action, _, _, _ = client._process_provider_response(
+            self.function_call_response('{"url": "https://example.com"}')
+        )
+
+        assert action.step == [{"type": "function_call"}]
+
+    def test_invalid_function_arguments_reported(self):
+        action, _, task_completed, message = make_client()._process_provider_response(
+            self.function_call_response('{"url": ')
+        )
+
+        assert action is None
+        assert task_completed
+        assert "Invalid JSON arguments" in message
+
+    def test_feedback_output_is_text(self):
+        feedback = make_client()._format_action_feedback(
+            "goto", "call_1", {"success": False, "error": "页面超时"}
+        )
+
+        assert isinstance(feedback[0]["output"], str)
+        assert "页面超时" in feedback[0]["output"]
+
+    def test_glm_markers_stripped_from_text(self):
+        client = make_client()
+
+        assert client._clean_glm_response_text("<|begin_of_box|>张三<|end_of_box|> ") == "张三"
+        assert client._clean_glm_response_text(" 李四 ") == "李四"
+        client.logger.info.reset_mock()
+        client._clean_glm_response_text("王五")
+        client.logger.info.assert_not_called()
+
+
+class TestViewportConversion:
+    """Test per-mille to pixel coordinate conversion"""
+
+    def test_viewport_read_once(self):
+        handler = MagicMock()
+        type(handler.page).viewport_size = viewport = PropertyMock(
+            return_value={"width": 1280, "height": 720}
+        )
+        client = make_client(handler=handler)
+
+        assert client._to_viewport_pixels(500, 500) == (640, 360)
+        assert client._to_viewport_pixels(1000, 0) == (1280, 0)
+        viewport.assert_called_once()
+
+
+class TestChatMessages:
+    """Test incremental construction of the Chat Completions conversation"""
+
+    def test_only_latest_full_frame_keeps_its_image(self):
+        client = make_client()
+        frames = iter([True, True, False])
+        client._screenshot_content = lambda b64, allow_delta=False: (
+            [client.format_screenshot(b64)],
+            next(frames),
+        )
+
+        messages = client._format_initial_messages("Step 1/3", "AAAA")
+        messages.append({"role": "assistant", "content": "CLICK: x=1, y=2"})
+        client._append_user_message(messages, "Step 2/3", "BBBB", allow_delta=True)
+        messages.append({"role": "assistant", "content": "CLICK: x=3, y=4"})
+        client._append_user_message(messages, "Step 3/3", "CCCC", allow_delta=True)
+
+        image_turns = [
+            [c["type"] for c in m["content"]] for m in messages if m["role"] == "user"
+        ]
+        assert image_turns == [["text", "text"], ["text", "image_url"], ["text", "image_url"]]
+        assert messages[0]["content"][1]["text"] == client.OMITTED_SCREENSHOT_TEXT
+
+
+    def test_system_message_built_once(self):
+        config = AgentConfig(options={"apiKey": "test-key"})
+        client = OpenAICUAClient(
+            model="glm-4.5v", instructions="你是浏览器助手", config=config, logger=MagicMock()
+        )
+
+        first = client._format_initial_messages("任务一", None)
+        second = client._format_initial_messages("任务二", None)
+
+        assert first[0] is second[0]
+        assert first[0] == {"role": "system", "content": "你是浏览器助手"}
+
+
+class TestPromptCacheKey:
+    """Test that prompt_cache_key is only sent to backends that accept it"""
+
+    def make_client(self, base_url=None, **options):
+        config = AgentConfig(options={"apiKey": "test-key", "baseURL": base_url, **options})
+        client = OpenAICUAClient(
+            model="glm-4.5v", instructions="你是浏览器助手", config=config, logger=MagicMock()
+        )
+        client.openai_sdk_client = MagicMock()
+        client.openai_sdk_client.chat.completions.create = AsyncMock()
+        return client
+
+    def test_sent_only_to_openai_by_default(self):
+        assert self.make_client()._prompt_cache_key
+        assert self.make_client("https://api.openai.com/v1")._prompt_cache_key
+        assert self.make_client("https://glm.example.com/v1")._prompt_cache_key is None
+
+    def test_option_opts_other_backends_in(self):
+        client = self.make_client("https://glm.example.com/v1", promptCacheKey=True)
+        assert client._prompt_cache_key
+        assert self.make_client(promptCacheKey=False)._prompt_cache_key is None
+
+    async def test_rejected_key_is_dropped_and_retried(self):
+        client = self.make_client()
+        request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+        rejected = BadRequestError(
+            "unknown parameter", response=httpx.Response(400, request=request), body=None
+        )
+        create = client.openai_sdk_client.chat.completions.create
+        create.side_effect = [rejected, "response", "response"]
+
+        assert await client._create_completion([]) == "response"
+        assert await client._create_completion([]) == "response"
+
+        assert "extra_body" in create.await_args_list[0].kwargs
+        assert all("extra_body" not in call.kwargs for call in create.await_args_list[1:])
+        assert client._prompt_cache_key is None
+
+
+class TestRunTask:
+    """Test the run_task step loop"""
+
+    async def test_final_step_skips_post_action_screenshot(self):
+        handler = MagicMock()
+        handler.page.url = "https://example.com"
+        handler.page.viewport_size = {"width": 1280, "height": 720}
+        handler.inject_cursor = AsyncMock()
+        handler.get_screenshot_bytes = AsyncMock(return_value=b"\xff\xd8")
+        handler.perform_action = AsyncMock(return_value={"success": True, "error": None})
+        client = make_client(handler=handler)
+        client._screenshot_content = lambda screenshot, allow_delta=False: (
+            [client._full_frame(screenshot)],
+            True,
+        )
+        message = MagicMock(content="CLICK: x=500, y=500")
+        client.openai_sdk_client = MagicMock()
+        client.openai_sdk_client.chat.completions.create = AsyncMock(
+            return_value=MagicMock(choices=[MagicMock(message=message)], usage=None)
+        )
+
+        result = await client.run_task("点击按钮")
+
+        assert result.completed
+        handler.get_screenshot_bytes.assert_awaited_once()
+        handler.inject_cursor.assert_awaited_once()
+
+    def test_usage_tokens_accept_both_naming_schemes(self):
+        chat_usage = SimpleNamespace(prompt_tokens=12, completion_tokens=3)
+        responses_usage = SimpleNamespace(input_tokens=7, output_tokens=2)
+
+        assert openai_cua._usage_tokens(chat_usage) == (12, 3)
+        assert openai_cua._usage_tokens(responses_usage) == (7, 2)
+        assert openai_cua._usage_tokens(SimpleNamespace()) == (0, 0)
+
+
+class TestRunMany:
+    """Test concurrent runs across independent pages"""
+
+    async def test_results_are_positional_and_bounded(self, monkeypatch):
+        running = 0
+        peak = 0
+
+        async def fake_run_task(self, instruction, max_steps=20, options=None):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            if instruction == "boom":
+                raise RuntimeError("page crashed")
+            return AgentResult(
+                message=instruction,
+                completed=True,
+                actions=[],
+                usage={"input_tokens": 0, "output_tokens": 0, "inference_time_ms": 0},
+            )
+
+        monkeypatch.setattr(OpenAICUAClient, "run_task", fake_run_task)
+        config = AgentConfig(options={"apiKey": "test-key"})
+        tasks = [(name, MagicMock()) for name in ("a", "boom", "c", "d")]
+
+        results = await OpenAICUAClient.run_many(
+            tasks, concurrency=2, model="glm-4.5v", config=config, logger=MagicMock()
+        )
+
+        assert [r.message for r in results] == ["a", "Error: page crashed", "c", "d"]
+        assert peak == 2
+
+    async def test_timeout_becomes_error_result(self, monkeypatch):
+        async def slow_run_task(self, instruction, max_steps=20, options=None):
+            await asyncio.sleep(1)
+
+        monkeypatch.setattr(OpenAICUAClient, "run_task", slow_run_task)
+        config = AgentConfig(options={"apiKey": "test-key"})
+
+        results = await OpenAICUAClient.run_many(
+            [("slow", MagicMock())],
+            timeout=0.01,
+            model="glm-4.5v",
+            config=config,
+            logger=MagicMock(),
+        )
+
+        assert results[0].message == "Error: TimeoutError"
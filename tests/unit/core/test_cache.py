@@ -0,0 +1,533 @@
+"""Test StagehandCache persistence (snapshot + write-ahead log)"""
+
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime
+
+import pytest
+
+from stagehand import cache as cache_module
+from stagehand import utils as utils_module
+from stagehand.cache import StagehandCache
+from stagehand.schemas import ObserveResult
+
+
+def make_result(selector="xpath=//button[@id='login']"):
+    return ObserveResult(
+        selector=selector,
+        description="Login button",
+        method="click",
+        arguments=[],
+    )
+
+
+@pytest.fixture
+def cache_file(tmp_path):
+    return str(tmp_path / "stagehand_cache.json")
+
+
+class TestCachePersistence:
+    """Test that cache writes go through the WAL and survive reloads"""
+
+    def test_set_cache_appends_to_wal(self, cache_file):
+        cache = StagehandCache(cache_file=cache_file)
+        cache.set_cache("click login", "https://example.com", make_result())
+        cache.flush()
+
+        # Only the WAL is written on the hot path, not the snapshot
+        assert not os.path.exists(cache_file)
+        with open(cache_file + ".wal", encoding="utf-8") as f:
+            records = [json.loads(line) for line in f]
+        assert len(records) == 1
+        assert records[0]["op"] == "put"
+
+    def test_reload_replays_wal(self, cache_file):
+        cache = StagehandCache(cache_file=cache_file)
+        cache.set_cache("click login", "https://example.com", make_result())
+        cache.set_cache("click logout", "https://example.com", make_result())
+
+        reloaded = StagehandCache(cache_file=cache_file)
+        result = reloaded.get_cached_result("click login", "https://example.com")
+
+        assert reloaded.get_cache_stats()["total_caches"] == 2
+        assert result is not None
+        assert result.selector == "xpath=//button[@id='login']"
+
+    def test_compact_writes_snapshot_and_truncates_wal(self, cache_file):
+        cache = StagehandCache(cache_file=cache_file)
+        cache.set_cache("click login", "https://example.com", make_result())
+        cache.compact()
+
+        with open(cache_file, encoding="utf-8") as f:
+            raw = f.read()
+        snapshot = json.loads(raw)
+        assert len(snapshot["caches"]) == 1
+        assert "\n" not in raw
+        assert os.path.getsize(cache_file + ".wal") == 0
+
+        reloaded = StagehandCache(cache_file=cache_file)
+        assert reloaded.get_cache_stats()["total_caches"] == 1
+
+    def test_merge_entries_only_adds_missing_keys(self, cache_file):
+        source = StagehandCache(cache_file=cache_file + ".src")
+        source.set_cache("click login", "https://example.com", make_result())
+        source.set_cache("click logout", "https://example.com", make_result())
+
+        cache = StagehandCache(cache_file=cache_file)
+        cache.set_cache("click login", "https://example.com", make_result())
+        merged = cache.merge_entries(source.cache_data["caches"])
+
+        assert merged == 1
+        assert cache.search("logout")
+        reloaded = StagehandCache(cache_file=cache_file)
+        assert reloaded.get_cache_stats()["total_caches"] == 2
+
+    def test_clear_cache_persists(self, cache_file):
+        cache = StagehandCache(cache_file=cache_file)
+        cache.set_cache("click login", "https://example.com", make_result())
+        assert cache.clear_cache() == 1
+
+        reloaded = StagehandCache(cache_file=cache_file)
+        assert reloaded.get_cache_stats()["total_caches"] == 0
+
+    def test_truncated_wal_line_is_ignored(self, cache_file):
+        cache = StagehandCache(cache_file=cache_file)
+        cache.set_cache("click login", "https://example.com", make_result())
+        cache.flush()
+        with open(cache_file + ".wal", "a", encoding="utf-8") as f:
+            f.write('{"op": "put", "key": "abc"')
+
+        reloaded = StagehandCache(cache_file=cache_file)
+        assert reloaded.get_cache_stats()["total_caches"] == 1
+
+    def test_background_writes_keep_submission_order(self, cache_file):
+        cache = StagehandCache(cache_file=cache_file)
+        for i in range(50):
+            cache.set_cache(f"click item {i}", "https://example.com", make_result())
+        # In-memory reads don't wait for the writer thread
+        assert cache.get_cached_result("click item 49", "https://example.com")
+        cache.flush()
+
+        with open(cache_file + ".wal", encoding="utf-8") as f:
+            records = [json.loads(line) for line in f]
+        assert [r["value"]["instruction"] for r in records if r["op"] == "put"] == [
+            f"click item {i}" for i in range(50)
+        ]
+        assert records[-1]["op"] == "hit"
+
+    def test_hit_stats_survive_reload(self, cache_file):
+        cache = StagehandCache(cache_file=cache_file)
+        cache.set_cache("click login", "https://example.com", make_result())
+        cache.set_cache("click logout", "https://example.com", make_result())
+        for _ in range(3):
+            assert cache.get_cached_result("click login", "https://example.com")
+        cache.set_cache("click help", "https://example.com", make_result())
+
+        reloaded = StagehandCache(cache_file=cache_file)
+        assert reloaded.get_cache_stats()["total_hits"] == 3
+        # The hit entry is more recent than the one written before it
+        order = [item["instruction"] for item in reloaded.cache_data["caches"].values()]
+        assert order == ["click logout", "click login", "click help"]
+
+    def test_stdlib_json_fallback_round_trip(self, cache_file, monkeypatch):
+        monkeypatch.setattr(utils_module, "orjson", None)
+        cache = StagehandCache(cache_file=cache_file)
+        cache.set_cache("找到登录按钮", "https://example.com", make_result())
+        cache.compact()
+
+        with open(cache_file, encoding="utf-8") as f:
+            assert "找到登录按钮" in f.read()
+        reloaded = StagehandCache(cache_file=cache_file)
+        assert reloaded.get_cached_result("找到登录按钮", "https://example.com")
+
+
+    def test_legacy_iso_timestamps_converted_on_load(self, cache_file):
+        cache = StagehandCache(cache_file=cache_file)
+        cache.set_cache("click login", "https://example.com", make_result())
+        item = next(iter(cache.cache_data["caches"].values()))
+        assert isinstance(item["created_at"], float)
+
+        item["created_at"] = datetime.now().isoformat()
+        item["last_used"] = "not a date"
+        cache.compact()
+
+        reloaded = StagehandCache(cache_file=cache_file)
+        item = next(iter(reloaded.cache_data["caches"].values()))
+        assert isinstance(item["created_at"], float)
+        assert item["last_used"] == 0.0
+        assert reloaded.get_cached_result("click login", "https://example.com")
+
+    def test_legacy_md5_keys_are_migrated(self, cache_file):
+        instruction, page_url = "Click Login", "https://example.com"
+        legacy_key = hashlib.md5(
+            json.dumps(
+                {
+                    "instruction": instruction.strip().lower(),
+                    "page_url": page_url,
+                    "page_title": "",
+                },
+                sort_keys=True,
+                ensure_ascii=False,
+            ).encode("utf-8")
+        ).hexdigest()
+        item = {
+            "instruction": instruction,
+            "page_url": page_url,
+            "page_title": "",
+            "result": make_result().model_dump(),
+            "created_at": datetime.now().isoformat(),
+            "last_used": datetime.now().isoformat(),
+            "hit_count": 2,
+        }
+        with open(cache_file, "w", encoding="utf-8") as f:
+            json.dump({"version": "1.0", "caches": {legacy_key: item}}, f)
+
+        cache = StagehandCache(cache_file=cache_file)
+        assert cache.get_cached_result(instruction, page_url)
+        assert legacy_key not in cache.cache_data["caches"]
+        cache.flush()
+
+        with open(cache_file, encoding="utf-8") as f:
+            snapshot = json.load(f)
+        assert snapshot["version"] == cache.get_cache_stats()["version"] != "1.0"
+        assert list(snapshot["caches"]) == [
+            cache._generate_cache_key(instruction, page_url)
+        ]
+
+
+class TestCacheSearch:
+    """Test keyword search over the cache index"""
+
+    def test_search_matches_substrings_case_insensitively(self, cache_file):
+        cache = StagehandCache(cache_file=cache_file)
+        cache.set_cache("找到用户名输入框", "https://example.com/Login", make_result())
+        cache.set_cache("找到密码输入框", "https://example.com/other", make_result())
+
+        assert len(cache.search("用户名")) == 1
+        assert len(cache.search("输入框")) == 2
+        assert len(cache.search("/login")) == 1
+        assert len(cache.search("EXAMPLE.COM")) == 2
+        assert cache.search("不存在的关键词") == []
+
+    def test_search_index_tracks_removals(self, cache_file):
+        cache = StagehandCache(cache_file=cache_file)
+        cache.set_cache("click login", "https://example.com", make_result())
+        cache.clear_cache()
+
+        assert cache.search("login") == []
+
+
+class TestCachedResults:
+    """Test the ObserveResult objects handed out on cache hits"""
+
+    def test_hits_return_independent_copies(self, cache_file):
+        cache = StagehandCache(cache_file=cache_file)
+        stored = make_result()
+        cache.set_cache("click login", "https://example.com", stored)
+        stored.arguments = ["mutated by caller"]
+
+        first = cache.get_cached_result("click login", "https://example.com")
+        first.arguments = ["substituted variable"]
+        second = cache.get_cached_result("click login", "https://example.com")
+
+        assert second is not first
+        assert second.arguments == []
+        assert second.selector == "xpath=//button[@id='login']"
+
+    def test_reloaded_entries_are_hydrated_from_dicts(self, cache_file):
+        StagehandCache(cache_file=cache_file).set_cache(
+            "click login", "https://example.com", make_result()
+        )
+
+        result = StagehandCache(cache_file=cache_file).get_cached_result(
+            "click login", "https://example.com"
+        )
+        assert result == make_result()
+
+
+class TestCacheExpiry:
+    """Test heap-ordered expiry sweeps"""
+
+    def test_expired_only_skips_rewritten_entries(self, cache_file):
+        cache = StagehandCache(cache_file=cache_file)
+        cache.set_cache("old", "https://example.com", make_result(), ttl=50)
+        cache.set_cache("rewritten", "https://example.com", make_result(), ttl=50)
+        for item in cache.cache_data["caches"].values():
+            item["created_at"] -= 100
+        # Build the heap with the backdated timestamps, then rewrite one entry
+        assert cache._pop_expired(max_pops=0) == []
+        cache.set_cache("rewritten", "https://example.com", make_result(), ttl=50)
+
+        assert cache.clear_cache(expired_only=True) == 1
+        assert cache.get_cached_result("rewritten", "https://example.com")
+        assert cache.get_cached_result("old", "https://example.com", ttl=1000) is None
+
+    def test_explicit_ttl_clears_by_age(self, cache_file):
+        cache = StagehandCache(cache_file=cache_file)
+        cache.set_cache("old", "https://example.com", make_result())
+        cache.set_cache("new", "https://example.com", make_result())
+        cache.cache_data["caches"][cache._generate_cache_key("old", "https://example.com")][
+            "created_at"
+        ] -= 100
+
+        assert cache.clear_cache(expired_only=True, ttl=50) == 1
+        assert cache.get_cached_result("new", "https://example.com")
+
+    def test_lookups_sweep_a_few_expired_entries(self, cache_file):
+        cache = StagehandCache(cache_file=cache_file)
+        for i in range(3):
+            cache.set_cache(f"stale {i}", "https://example.com", make_result(), ttl=50)
+        for item in cache.cache_data["caches"].values():
+            item["created_at"] -= 100
+
+        cache.get_cached_result("missing", "https://example.com")
+        assert cache.get_cache_stats()["total_caches"] == 1
+
+    def test_short_lookup_ttl_keeps_longer_lived_entries(self, cache_file):
+        cache = StagehandCache(cache_file=cache_file)
+        cache.set_cache("long lived", "https://example.com", make_result(), ttl=3600)
+        cache.set_cache("other", "https://example.com", make_result(), ttl=3600)
+        for item in cache.cache_data["caches"].values():
+            item["created_at"] -= 100
+
+        # Too old for this caller, but still within the TTL it was stored with
+        assert cache.get_cached_result("long lived", "https://example.com", ttl=60) is None
+        assert cache.get_cached_result("other", "https://example.com", ttl=60) is None
+        assert cache.get_cache_stats()["total_caches"] == 2
+        assert cache.get_cached_result("long lived", "https://example.com")
+
+    def test_default_cache_clears_hour_old_entries(self, cache_file):
+        cache = StagehandCache(cache_file=cache_file)
+        cache.set_cache("stale", "https://example.com", make_result())
+        cache.set_cache("fresh", "https://example.com", make_result())
+        cache.cache_data["caches"][cache._generate_cache_key("stale", "https://example.com")][
+            "created_at"
+        ] -= 3601
+
+        assert cache.clear_cache(expired_only=True) == 1
+        assert cache.get_cached_result("fresh", "https://example.com")
+
+    def test_default_ttl_applies_to_entries_without_ttl(self, cache_file):
+        cache = StagehandCache(cache_file=cache_file, default_ttl=50)
+        cache.set_cache("stale", "https://example.com", make_result())
+        cache.set_cache("pinned", "https://example.com", make_result(), ttl=3600)
+        for item in cache.cache_data["caches"].values():
+            item["created_at"] -= 100
+
+        assert cache.clear_cache(expired_only=True) == 1
+        assert cache.get_cached_result("pinned", "https://example.com")
+
+
+class TestCacheKey:
+    """Test cache key generation"""
+
+    def test_key_normalizes_instruction(self, cache_file):
+        cache = StagehandCache(cache_file=cache_file)
+        key = cache._generate_cache_key("Click Login ", "https://example.com", "Home")
+
+        assert key == cache._generate_cache_key("click login", "https://example.com", "Home")
+        assert len(key) == 32
+
+    def test_key_separates_fields(self, cache_file):
+        cache = StagehandCache(cache_file=cache_file)
+
+        assert cache._generate_cache_key("a", "b") != cache._generate_cache_key("a", "b", "c")
+        assert cache._generate_cache_key("a", "bc") != cache._generate_cache_key("ab", "c")
+
+
+class TestCacheEviction:
+    """Test the max_entries cap"""
+
+    def test_evicts_least_used_entry(self, cache_file):
+        cache = StagehandCache(cache_file=cache_file, max_entries=2)
+        cache.set_cache("first", "https://example.com", make_result())
+        cache.set_cache("second", "https://example.com", make_result())
+        assert cache.get_cached_result("first", "https://example.com")
+
+        cache.set_cache("third", "https://example.com", make_result())
+
+        assert cache.get_cache_stats()["total_caches"] == 2
+        assert cache.get_cached_result("second", "https://example.com") is None
+        assert cache.get_cached_result("first", "https://example.com")
+        assert cache.get_cached_result("third", "https://example.com")
+        assert cache.search("second") == []
+
+    def test_eviction_persists(self, cache_file):
+        cache = StagehandCache(cache_file=cache_file, max_entries=1)
+        cache.set_cache("first", "https://example.com", make_result())
+        cache.set_cache("second", "https://example.com", make_result())
+
+        reloaded = StagehandCache(cache_file=cache_file, max_entries=1)
+        assert reloaded.get_cache_stats()["total_caches"] == 1
+        assert reloaded.get_cached_result("second", "https://example.com")
+
+
+    def test_hit_updates_single_store_in_lru_order(self, cache_file):
+        cache = StagehandCache(cache_file=cache_file)
+        cache.set_cache("first", "https://example.com", make_result())
+        cache.set_cache("second", "https://example.com", make_result())
+        assert cache.get_cached_result("first", "https://example.com")
+
+        caches = cache.cache_data["caches"]
+        first_key = cache._generate_cache_key("first", "https://example.com")
+        assert caches[first_key]["hit_count"] == 1
+        assert cache.get_cache_stats()["total_hits"] == 1
+        # The hit moves the entry to the most-recently-used end
+        assert list(caches)[-1] == first_key
+
+
+    @pytest.mark.parametrize("policy, survivor", [("vlru", "fresh"), ("lfu", "stale")])
+    def test_eviction_policy(self, cache_file, policy, survivor):
+        cache = StagehandCache(
+            cache_file=cache_file, max_entries=2, eviction_policy=policy
+        )
+        cache.set_cache("stale", "https://example.com", make_result())
+        for _ in range(3):
+            cache.get_cached_result("stale", "https://example.com")
+        cache.set_cache("fresh", "https://example.com", make_result())
+        cache.get_cached_result("fresh", "https://example.com")
+
+        cache.set_cache("newest", "https://example.com", make_result())
+
+        # v-LRU only considers the least recently used tail; LFU keeps the old hot entry
+        assert cache.get_cached_result(survivor, "https://example.com")
+        assert cache.get_cache_stats()["total_caches"] == 2
+
+    @pytest.mark.parametrize("policy", ["vlru", "lfu"])
+    def test_eviction_skips_keep_key(self, cache_file, policy):
+        cache = StagehandCache(cache_file=cache_file, eviction_policy=policy)
+        for name in ("oldest", "middle", "newest"):
+            cache.set_cache(name, "https://example.com", make_result())
+        keep_key = cache._generate_cache_key("oldest", "https://example.com")
+        cache.max_entries = 2
+
+        assert cache._evict_if_needed(keep_key=keep_key) == 1
+
+        caches = cache.cache_data["caches"]
+        assert keep_key in caches
+        assert cache._generate_cache_key("middle", "https://example.com") not in caches
+
+    def test_unknown_eviction_policy_rejected(self, cache_file):
+        with pytest.raises(ValueError):
+            StagehandCache(cache_file=cache_file, eviction_policy="random")
+
+
+class TestSemanticMatch:
+    """Test approximate instruction matching on exact-key misses"""
+
+    @staticmethod
+    def encoder(texts):
+        # Instructions mentioning the same field map to the same direction
+        vectors = []
+        for text in texts:
+            if "用户名" in text:
+                vectors.append([1.0, 0.05, 0.0])
+            elif "密码" in text:
+                vectors.append([0.0, 1.0, 0.05])
+            else:
+                vectors.append([0.05, 0.0, 1.0])
+        return vectors
+
+    def test_near_duplicate_instruction_hits(self, cache_file):
+        pytest.importorskip("hnswlib")
+        cache = StagehandCache(
+            cache_file=cache_file, semantic_threshold=0.92, semantic_encoder=self.encoder
+        )
+        cache.set_cache("找到用户名输入框", "https://example.com/login", make_result())
+        cache.set_cache("找到密码输入框", "https://example.com/login", make_result("xpath=//input"))
+
+        result = cache.get_cached_result("找到登录用户名框", "https://example.com/login")
+        assert result is not None
+        assert result.selector == "xpath=//button[@id='login']"
+
+        # Same instruction on another page does not match
+        assert cache.get_cached_result("找到登录用户名框", "https://example.com/other") is None
+
+    def test_embeddings_persist_quantized(self, cache_file):
+        pytest.importorskip("hnswlib")
+        cache = StagehandCache(
+            cache_file=cache_file, semantic_threshold=0.92, semantic_encoder=self.encoder
+        )
+        cache.set_cache("找到用户名输入框", "https://example.com/login", make_result())
+
+        stored = next(iter(cache.cache_data["caches"].values()))["embedding"]
+        assert set(stored) == {"i8", "scale"}
+
+        reloaded = StagehandCache(
+            cache_file=cache_file, semantic_threshold=0.92, semantic_encoder=self.encoder
+        )
+        assert reloaded.get_cached_result("找到登录用户名框", "https://example.com/login")
+
+    def test_removed_entries_leave_semantic_index(self, cache_file):
+        pytest.importorskip("hnswlib")
+        cache = StagehandCache(
+            cache_file=cache_file, semantic_threshold=0.92, semantic_encoder=self.encoder
+        )
+        cache.set_cache("找到用户名输入框", "https://example.com/login", make_result())
+        cache.clear_cache()
+
+        assert cache.semantic_search("找到登录用户名框") == []
+        assert cache.get_cached_result("找到登录用户名框", "https://example.com/login") is None
+
+    def test_disabled_without_threshold(self, cache_file):
+        cache = StagehandCache(
+            cache_file=cache_file, semantic_threshold=None, semantic_encoder=self.encoder
+        )
+        cache.set_cache("找到用户名输入框", "https://example.com/login", make_result())
+
+        assert "embedding" not in cache.cache_data["caches"].popitem()[1]
+        assert cache.semantic_search("找到登录用户名框") == []
+
+    def test_disabled_by_default(self, cache_file):
+        cache = StagehandCache(cache_file=cache_file, semantic_encoder=self.encoder)
+        cache.set_cache("找到用户名输入框", "https://example.com/login", make_result())
+
+        assert cache.get_cached_result("找到登录用户名框", "https://example.com/login") is None
+
+    async def test_default_model_loads_off_the_event_loop(self, cache_file, monkeypatch):
+        pytest.importorskip("hnswlib")
+        monkeypatch.setattr(cache_module, "SEMANTIC_CACHE_AVAILABLE", True)
+        loader_threads = []
+
+        def load():
+            loader_threads.append(threading.current_thread())
+            return self.encoder
+
+        monkeypatch.setattr(cache_module, "_load_sentence_encoder", load)
+        cache = StagehandCache(cache_file=cache_file, semantic_threshold=0.92)
+        await cache.load_semantic_encoder()
+        await cache.load_semantic_encoder()
+
+        assert len(loader_threads) == 1
+        assert loader_threads[0] is not threading.main_thread()
+        cache.set_cache("找到用户名输入框", "https://example.com/login", make_result())
+        assert cache.get_cached_result("找到登录用户名框", "https://example.com/login")
+
+
+class TestCacheLazyLoading:
+    """Test that the cache file and indexes are only loaded when used"""
+
+    def test_construction_does_not_read_file(self, cache_file):
+        cache = StagehandCache(cache_file=cache_file)
+        cache.set_cache("click login", "https://example.com", make_result())
+        cache.compact()
+
+        reloaded = StagehandCache(cache_file=cache_file)
+        assert reloaded._cache_data is None
+
+        assert reloaded.get_cache_stats()["total_caches"] == 1
+        assert not reloaded._index_built
+        assert len(reloaded.search("login")) == 1
+        assert reloaded._index_built
+
+    def test_writes_before_first_search_are_indexed(self, cache_file):
+        cache = StagehandCache(cache_file=cache_file)
+        cache.set_cache("click login", "https://example.com", make_result())
+        cache.set_cache("click logout", "https://example.com", make_result())
+        cache.clear_cache(expired_only=True, ttl=-1)
+
+        assert cache.search("click") == []
+        cache.set_cache("click login", "https://example.com", make_result())
+        assert len(cache.search("login")) == 1
@@ -1,8 +1,10 @@
 """Test StagehandPage wrapper functionality and AI primitives"""
 
+import threading
+
 import pytest
 from unittest.mock import AsyncMock, MagicMock, patch
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 from stagehand.page import StagehandPage
 from stagehand.schemas import (
@@ -115,6 +117,32 @@ class TestActFunctionality:
         assert "clicked" in result.message
         mock_act_handler.act.assert_called_once()
 
+    @pytest.mark.asyncio
+    async def test_act_script_runs_steps_in_order(self, mock_stagehand_page):
+        """Test act_script() runs each step and stops at the first failure"""
+        mock_act_handler = MagicMock()
+        mock_act_handler.act = AsyncMock(side_effect=[
+            ActResult(success=True, message="ok", action="click menu"),
+            ActResult(success=False, message="not found", action="click user"),
+            ActResult(success=True, message="ok", action="click add"),
+        ])
+        mock_stagehand_page._act_handler = mock_act_handler
+
+        results = await mock_stagehand_page.act_script([
+            "click menu",
+            {"action": "click user", "use_cache": False},
+            "click add",
+        ])
+
+        assert [result.success for result in results] == [True, False]
+        assert mock_act_handler.act.call_count == 2
+        first_call, second_call = mock_act_handler.act.call_args_list
+        assert first_call.args[0]["action"] == "click menu"
+        assert first_call.kwargs["use_cache"] is True
+        assert second_call.args[0]["action"] == "click user"
+        assert second_call.kwargs["use_cache"] is False
+        mock_stagehand_page.ensure_injection.assert_called_once()
+
 
 class TestObserveFunctionality:
     """Test the observe() method for AI-powered element observation"""
@@ -165,3 +193,81 @@ class TestExtractFunctionality:
         
         assert result == {"title": "Sample Title", "description": "Sample description"}
         mock_extract_handler.extract.assert_called_once()
+
+
+class TestResultItemAccess:
+    """Test dict-style access on result models"""
+
+    def test_observe_result_item_access(self):
+        """Missing keys raise KeyError and support 'in' and get()"""
+        result = ObserveResult(selector="xpath=//button", description="Submit")
+
+        assert result["selector"] == "xpath=//button"
+        assert "selector" in result
+        assert "missing" not in result
+        assert result.get("description") == "Submit"
+        assert result.get("missing", "fallback") == "fallback"
+        with pytest.raises(KeyError):
+            result["missing"]
+
+    def test_extract_result_extra_fields(self):
+        """Extra fields are reachable through item access"""
+        result = ExtractResult(title="Sample Title")
+
+        assert result["title"] == "Sample Title"
+        assert "title" in result
+        assert result.get("title") == "Sample Title"
+        assert result.get("missing") is None
+        with pytest.raises(KeyError):
+            result["missing"]
+
+
+class TestExtractOptionsSchema:
+    """Test schema serialization for extract options"""
+
+    def test_model_schema_titles_stripped(self):
+        """Generated titles are dropped, descriptions and field names are kept"""
+
+        class Article(BaseModel):
+            title: str = Field(description="Headline of the article")
+            tags: list[str] = []
+
+        schema = ExtractOptions(
+            instruction="extract the article", schema_definition=Article
+        ).model_dump()["schema_definition"]
+
+        assert "title" not in schema
+        assert set(schema["properties"]) == {"title", "tags"}
+        assert schema["properties"]["title"] == {
+            "description": "Headline of the article",
+            "type": "string",
+        }
+        assert "title" not in schema["properties"]["tags"]
+
+    def test_recursive_model_schema_terminates(self):
+        """A self-referencing model keeps its inner $ref and its $defs"""
+
+        class Node(BaseModel):
+            name: str
+            children: list["Node"] = []
+
+        class Tree(BaseModel):
+            root: Node
+
+        result = {}
+
+        def serialize():
+            result["schema"] = ExtractOptions(
+                instruction="extract the tree", schema_definition=Tree
+            ).model_dump()["schema_definition"]
+
+        worker = threading.Thread(target=serialize, daemon=True)
+        worker.start()
+        worker.join(timeout=5)
+        assert not worker.is_alive(), "schema resolution did not terminate"
+
+        schema = result["schema"]
+        root = schema["properties"]["root"]
+        assert root["properties"]["name"] == {"type": "string"}
+        assert root["properties"]["children"]["items"] == {"$ref": "#/$defs/Node"}
+        assert "children" in schema["$defs"]["Node"]["properties"]
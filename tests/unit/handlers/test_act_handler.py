@@ -67,4 +67,30 @@ class TestActExecution:
         assert result.action == "Submit button"
     
 
-    
\ No newline at end of file
+    @pytest.mark.asyncio
+    async def test_act_reobserves_when_cached_element_fails(self, mock_stagehand_page):
+        """Test that a failing cached element is invalidated and observed again"""
+        mock_client = MagicMock()
+        mock_client.logger = MagicMock()
+
+        handler = ActHandler(mock_stagehand_page, mock_client, "", True)
+
+        stale = ObserveResult(
+            selector="xpath=//button[@id='old']", description="Old button", method="click", arguments=[]
+        )
+        fresh = ObserveResult(
+            selector="xpath=//button[@id='new']", description="New button", method="click", arguments=[]
+        )
+        mock_stagehand_page._observe_handler = MagicMock()
+        mock_stagehand_page._observe_handler.observe = AsyncMock(side_effect=[[stale], [fresh]])
+        mock_stagehand_page._observe_handler.invalidate_cached_result = MagicMock(return_value=True)
+        handler._perform_playwright_method = AsyncMock(
+            side_effect=[Exception("element not found"), None]
+        )
+
+        result = await handler.act({"action": "click the button"})
+
+        assert result.success is True
+        assert result.action == "New button"
+        mock_stagehand_page._observe_handler.invalidate_cached_result.assert_called_once()
+        assert mock_stagehand_page._observe_handler.observe.await_count == 2
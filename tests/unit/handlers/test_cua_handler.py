@@ -0,0 +1,55 @@
+"""Test CUAHandler screenshot capture"""
+
+import base64
+import io
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from stagehand.handlers.cua_handler import CUAHandler
+
+
+def make_handler(screenshot_bytes=b"image-bytes"):
+    page = MagicMock()
+    page.screenshot = AsyncMock(return_value=screenshot_bytes)
+    return CUAHandler(stagehand=MagicMock(), page=page, logger=MagicMock()), page
+
+
+class TestScreenshotCapture:
+    """Test screenshot encoding options"""
+
+    @pytest.mark.asyncio
+    async def test_png_by_default(self):
+        handler, page = make_handler()
+
+        result = await handler.get_screenshot_base64()
+
+        assert base64.b64decode(result) == b"image-bytes"
+        page.screenshot.assert_called_once_with(full_page=False, type="png", quality=None)
+
+    @pytest.mark.asyncio
+    async def test_raw_bytes_skip_base64(self):
+        handler, _ = make_handler()
+
+        assert await handler.get_screenshot_bytes() == b"image-bytes"
+
+    @pytest.mark.asyncio
+    async def test_jpeg_quality_is_forwarded(self):
+        handler, page = make_handler()
+
+        await handler.get_screenshot_base64(image_format="jpeg", quality=85)
+
+        page.screenshot.assert_called_once_with(full_page=False, type="jpeg", quality=85)
+
+    @pytest.mark.asyncio
+    async def test_downscales_to_max_size(self):
+        Image = pytest.importorskip("PIL.Image")
+        buffer = io.BytesIO()
+        Image.new("RGB", (1920, 1080)).save(buffer, format="JPEG")
+        handler, _ = make_handler(buffer.getvalue())
+
+        result = await handler.get_screenshot_base64(
+            image_format="jpeg", quality=85, max_size=(1280, 720)
+        )
+
+        assert Image.open(io.BytesIO(base64.b64decode(result))).size == (1280, 720)
@@ -1,8 +1,11 @@
 """Test ObserveHandler functionality for AI-powered element observation"""
 
+import asyncio
+
 import pytest
 from unittest.mock import AsyncMock, MagicMock, patch
 
+from stagehand.cache import StagehandCache
 from stagehand.handlers.observe_handler import ObserveHandler
 from stagehand.schemas import ObserveOptions, ObserveResult
 from tests.mocks.mock_llm import MockLLMClient
@@ -44,10 +47,11 @@ class TestObserveExecution:
     
     @pytest.mark.smoke
     @pytest.mark.asyncio
-    async def test_observe_single_element(self, mock_stagehand_page):
+    async def test_observe_single_element(self, mock_stagehand_page, tmp_path):
         """Test observing a single element"""
         # Set up mock client with proper LLM response
         mock_client = MagicMock()
+        mock_client.cache = StagehandCache(cache_file=str(tmp_path / "cache.json"))
         mock_client.logger = MagicMock()
         mock_client.logger.info = MagicMock()
         mock_client.logger.debug = MagicMock()
@@ -101,3 +105,197 @@ class TestObserveExecution:
         
         # Verify that LLM was called
         assert mock_llm.call_count == 1
+
+    @pytest.mark.asyncio
+    async def test_concurrent_observes_share_tree_extraction(self, mock_stagehand_page):
+        """Test that concurrent observe calls share one accessibility tree extraction"""
+        mock_client = MagicMock()
+        mock_client.logger = MagicMock()
+        mock_client.update_metrics = MagicMock()
+
+        mock_llm = MockLLMClient()
+        mock_client.llm = mock_llm
+        mock_llm.set_custom_response("observe", [
+            {
+                "element_id": 1,
+                "description": "Input field",
+                "method": "fill",
+                "arguments": []
+            }
+        ])
+
+        async def slow_tree(*args, **kwargs):
+            await asyncio.sleep(0.01)
+            return {"simplified": "[1] textbox: Username", "iframes": []}
+
+        with patch('stagehand.handlers.observe_handler.get_accessibility_tree', side_effect=slow_tree) as mock_get_tree, \
+             patch('stagehand.handlers.observe_handler.get_xpath_by_resolved_object_id') as mock_get_xpath:
+            mock_get_xpath.return_value = "//input[@id='username']"
+            mock_stagehand_page.send_cdp = AsyncMock(return_value={
+                "object": {"objectId": "mock-object-id"}
+            })
+            mock_stagehand_page.get_cdp_client = AsyncMock(return_value=AsyncMock())
+
+            handler = ObserveHandler(mock_stagehand_page, mock_client, "")
+            results = await asyncio.gather(
+                handler.observe(ObserveOptions(instruction="find username"), use_cache=False),
+                handler.observe(ObserveOptions(instruction="find password"), use_cache=False),
+            )
+
+        assert all(len(result) == 1 for result in results)
+        assert mock_get_tree.call_count == 1
+        assert mock_llm.call_count == 2
+
+    @pytest.mark.asyncio
+    async def test_snapshot_reused_until_invalidated(self, mock_stagehand_page):
+        """Test that an unchanged page reuses the cached accessibility tree"""
+        mock_client = MagicMock()
+        mock_client.logger = MagicMock()
+        mock_client.update_metrics = MagicMock()
+
+        mock_llm = MockLLMClient()
+        mock_client.llm = mock_llm
+        mock_llm.set_custom_response("observe", [
+            {
+                "element_id": 1,
+                "description": "Submit button",
+                "method": "click",
+                "arguments": []
+            }
+        ])
+
+        with patch('stagehand.handlers.observe_handler.get_accessibility_tree') as mock_get_tree, \
+             patch('stagehand.handlers.observe_handler.get_xpath_by_resolved_object_id') as mock_get_xpath:
+            mock_get_tree.return_value = {"simplified": "[1] button: Submit", "iframes": []}
+            mock_get_xpath.return_value = "//button[@id='submit']"
+            mock_stagehand_page.send_cdp = AsyncMock(return_value={
+                "object": {"objectId": "mock-object-id"}
+            })
+            mock_stagehand_page.get_cdp_client = AsyncMock(return_value=AsyncMock())
+            # DOM mutation counter stays unchanged
+            mock_stagehand_page._page.evaluate = AsyncMock(return_value=0)
+
+            handler = ObserveHandler(mock_stagehand_page, mock_client, "")
+            options = ObserveOptions(instruction="find the submit button")
+            await handler.observe(options, use_cache=False)
+            await handler.observe(options, use_cache=False)
+            assert mock_get_tree.call_count == 1
+
+            # A DOM mutation changes the snapshot key
+            mock_stagehand_page._page.evaluate = AsyncMock(return_value=3)
+            await handler.observe(options, use_cache=False)
+            assert mock_get_tree.call_count == 2
+
+            handler.invalidate_snapshot()
+            await handler.observe(options, use_cache=False)
+            assert mock_get_tree.call_count == 3
+
+            handler._on_frame_navigated(MagicMock())
+            await handler.observe(options, use_cache=False)
+            assert mock_get_tree.call_count == 4
+
+
+class TestAddSelectorsToElements:
+    """Test xpath resolution for observed elements"""
+
+    @pytest.mark.asyncio
+    async def test_resolves_concurrently_and_keeps_order(self, mock_stagehand_page):
+        mock_client = MagicMock()
+        mock_client.logger = MagicMock()
+        handler = ObserveHandler(mock_stagehand_page, mock_client, "")
+        in_flight = 0
+        peak = 0
+
+        async def send_cdp(method, params):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            if params["backendNodeId"] == 2:
+                raise RuntimeError("node detached")
+            return {"object": {"objectId": f"obj-{params['backendNodeId']}"}}
+
+        mock_stagehand_page.send_cdp = send_cdp
+        mock_stagehand_page.get_cdp_client = AsyncMock()
+        elements = [
+            {"element_id": node_id, "description": f"element {node_id}", "method": "click"}
+            for node_id in (1, 2, 3)
+        ]
+
+        with patch(
+            "stagehand.handlers.observe_handler.get_xpath_by_resolved_object_id",
+            AsyncMock(side_effect=lambda client, object_id: f"//*[@id='{object_id}']"),
+        ):
+            results = await handler._add_selectors_to_elements(elements)
+
+        assert [r.selector for r in results] == [
+            "xpath=//*[@id='obj-1']",
+            "xpath=//*[@id='obj-3']",
+        ]
+        assert peak == 3
+
+    @pytest.mark.asyncio
+    async def test_cancelled_resolution_is_reraised(self, mock_stagehand_page):
+        mock_client = MagicMock()
+        mock_client.logger = MagicMock()
+        handler = ObserveHandler(mock_stagehand_page, mock_client, "")
+
+        async def send_cdp(method, params):
+            if params["backendNodeId"] == 2:
+                raise asyncio.CancelledError()
+            return {"object": {"objectId": f"obj-{params['backendNodeId']}"}}
+
+        mock_stagehand_page.send_cdp = send_cdp
+        mock_stagehand_page.get_cdp_client = AsyncMock()
+        elements = [
+            {"element_id": node_id, "description": f"element {node_id}", "method": "click"}
+            for node_id in (1, 2)
+        ]
+
+        with patch(
+            "stagehand.handlers.observe_handler.get_xpath_by_resolved_object_id",
+            AsyncMock(side_effect=lambda client, object_id: f"//*[@id='{object_id}']"),
+        ):
+            with pytest.raises(asyncio.CancelledError):
+                await handler._add_selectors_to_elements(elements)
+
+
+class TestCachedResults:
+    """Test that cache hits skip validation until cached actions start failing"""
+
+    @pytest.mark.asyncio
+    async def test_failed_cache_hits_enable_validation(self, mock_stagehand_page, tmp_path):
+        mock_client = MagicMock()
+        mock_client.logger = MagicMock()
+        mock_client.cache = StagehandCache(cache_file=str(tmp_path / "cache.json"))
+        handler = ObserveHandler(mock_stagehand_page, mock_client, "")
+        handler.cache_manager.validate_cached_xpath = AsyncMock(return_value=True)
+        mock_stagehand_page._wait_for_settled_dom = AsyncMock()
+
+        page_url = mock_stagehand_page._page.url
+        result = ObserveResult(
+            selector="xpath=//button", description="Button", method="click", arguments=[]
+        )
+        options = ObserveOptions(instruction="click the button")
+
+        for _ in range(20):
+            handler.cache_manager.set_cache("click the button", page_url, result)
+            assert await handler.observe(options) == [result]
+        handler.cache_manager.validate_cached_xpath.assert_not_called()
+
+        # Failures within the 5% budget only drop the stale entry
+        assert handler.invalidate_cached_result("click the button") is True
+        assert handler.cache_manager.get_cache_stats()["total_caches"] == 0
+        assert handler.validate_on_hit is False
+        # Nothing left to invalidate until the next cache hit
+        assert handler.invalidate_cached_result("click the button") is False
+
+        handler.cache_manager.set_cache("click the button", page_url, result)
+        await handler.observe(options)
+        assert handler.invalidate_cached_result("click the button") is True
+        assert handler.validate_on_hit is True
+
+        handler.cache_manager.set_cache("click the button", page_url, result)
+        await handler.observe(options)
+        handler.cache_manager.validate_cached_xpath.assert_awaited_once()
@@ -228,3 +228,20 @@ class TestClientInitialization:
         # Call _create_session and expect error
         with pytest.raises(RuntimeError, match="Invalid response format"):
             await client._create_session()
+
+    @pytest.mark.asyncio
+    @mock.patch.dict(os.environ, {}, clear=True)
+    async def test_close_closes_created_agents(self):
+        """Test that close() releases the resources of agents it created."""
+        client = Stagehand(config=StagehandConfig(env="LOCAL"))
+        agent = mock.MagicMock()
+        agent.aclose = mock.AsyncMock()
+        client._agents.add(agent)
+
+        with mock.patch(
+            "stagehand.main.cleanup_browser_resources", new=mock.AsyncMock()
+        ):
+            await client.close()
+
+        agent.aclose.assert_awaited_once()
+        assert not client._agents